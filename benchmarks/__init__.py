@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Draw Things client.
+
+Run ``python -m benchmarks --help`` for options.
+"""
@@ -0,0 +1,99 @@
+"""
+Per-call CPU cost of encoding requests and decoding responses.
+
+Encoding compares rebuilding and serializing the payload on every call with
+the standard library (what ``generate_images`` does) against
+``RequestTemplate.encode`` with each installed codec. Decoding compares
+``json.loads`` on the decoded text against each codec parsing the raw
+response bytes, for a response holding one image of ``image_size`` bytes.
+No server is involved.
+"""
+
+import argparse
+import base64
+import json
+import os
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+
+from draw_things.core.codec import available_codecs, get_codec
+from draw_things.core.image_generator import ImageGenerator
+
+PROMPT = "A beautiful sunset over mountains, highly detailed"
+
+
+def _best_us(call: Callable[[], Any], iterations: int, repeat: int = 5) -> float:
+    """Return the best per-call time of call, in microseconds."""
+    timings = timeit.Timer(call).repeat(repeat=repeat, number=iterations)
+    return round(min(timings) / iterations * 1e6, 3)
+
+
+def measure_encode(iterations: int = 2000, codecs: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Measure the per-call cost of producing a txt2img request body.
+
+    Returns:
+        ``baseline_us`` for rebuilding and serializing with the standard
+        library, and for each codec its template ``us`` and ``saved_us``
+    """
+    generator = ImageGenerator("http://127.0.0.1:9/api/v1/txt2img")
+    seeds = iter(range(10 ** 9))
+
+    def rebuild():
+        payload = generator.build_payload(prompt=PROMPT, seed=next(seeds))
+        return json.dumps(payload).encode("utf-8")
+
+    baseline = _best_us(rebuild, iterations)
+    results: Dict[str, Any] = {"baseline_us": baseline}
+    for name in codecs or available_codecs():
+        template = ImageGenerator(
+            "http://127.0.0.1:9/api/v1/txt2img", codec=get_codec(name)
+        ).template()
+        us = _best_us(lambda: template.encode(prompt=PROMPT, seed=next(seeds)), iterations)
+        results[name] = {"us": us, "saved_us": round(baseline - us, 3)}
+    return results
+
+
+def measure_decode(
+    image_size: int = 4 * 1024 * 1024,
+    iterations: int = 20,
+    codecs: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Measure the per-call cost of parsing a txt2img response.
+
+    Args:
+        image_size: Decoded bytes of the single image in the response
+
+    Returns:
+        ``baseline_us`` for ``json.loads`` on the decoded text, and for each
+        codec its ``us`` and ``saved_us``
+    """
+    image = base64.b64encode(os.urandom(image_size)).decode("ascii")
+    body = json.dumps({"images": [image]}).encode("utf-8")
+    baseline = _best_us(lambda: json.loads(body.decode("utf-8")), iterations)
+    results: Dict[str, Any] = {"baseline_us": baseline}
+    for name in codecs or available_codecs():
+        codec = get_codec(name)
+        us = _best_us(lambda: codec.loads(body), iterations)
+        results[name] = {"us": us, "saved_us": round(baseline - us, 3)}
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point: ``python -m benchmarks.codec``."""
+    parser = argparse.ArgumentParser(description="Measure request encoding and response decoding cost")
+    parser.add_argument("--image-size", type=int, default=4 * 1024 * 1024, help="Bytes per image in the decoded response")
+    parser.add_argument("--encode-iterations", type=int, default=2000, help="Calls per encode timing")
+    parser.add_argument("--decode-iterations", type=int, default=20, help="Calls per decode timing")
+    parser.add_argument("--codec", action="append", choices=available_codecs(), help="Codec to measure (repeatable; default: all installed)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "image_size": args.image_size,
+        "encode": measure_encode(args.encode_iterations, args.codec),
+        "decode": measure_decode(args.image_size, args.decode_iterations, args.codec),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Startup-time regression checks.
+
+Each check runs one statement in a fresh interpreter under
+``python -X importtime`` and reports the import time it adds on top of a
+bare interpreter, along with the modules it pulls in. Short command-line
+runs such as ``generate_images_cli.py --models`` are dominated by this cost,
+so every check has a time budget and a list of modules it must not import.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Check name -> (statement, budget in milliseconds, modules it must not import)
+CHECKS: Dict[str, Tuple[str, float, Tuple[str, ...]]] = {
+    "package": (
+        "import draw_things",
+        30.0,
+        ("draw_things.api", "draw_things.core", "asyncio", "http.client",
+         "concurrent.futures"),
+    ),
+    "client": (
+        "from draw_things import DrawThingsClient",
+        150.0,
+        ("asyncio", "http.server", "concurrent.futures", "draw_things.core.batching",
+         "draw_things.core.model_catalog", "draw_things.core.pipeline"),
+    ),
+    "cli": (
+        "import sandbox.scripts.generate_images_cli",
+        175.0,
+        ("asyncio", "http.server", "concurrent.futures", "draw_things.core.sweep"),
+    ),
+}
+
+
+def _importtime(statement: str) -> List[Tuple[str, int, bool]]:
+    """Run statement in a fresh interpreter under ``-X importtime``.
+
+    Returns:
+        ``(module, cumulative microseconds, top level)`` for every module
+        imported, in the order the imports finished
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.join(ROOT, "src"), ROOT, env.get("PYTHONPATH")])
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():  # skip the header line
+            imports.append((name.strip(), int(cumulative), not name[1:].startswith(" ")))
+    return imports
+
+
+def measure(statement: str, runs: int = 5) -> Dict[str, Any]:
+    """Measure the imports statement adds to a bare interpreter.
+
+    Args:
+        statement: Python code to run, typically an import
+        runs: Fresh interpreters to measure in; the median is reported
+
+    Returns:
+        Median milliseconds, every run's milliseconds and the modules
+        imported beyond those of a bare interpreter
+    """
+    baseline = {name for name, _, _ in _importtime("pass")}
+    timings: List[float] = []
+    modules = set()
+    for _ in range(runs):
+        imports = _importtime(statement)
+        timings.append(sum(
+            us for name, us, top in imports if top and name not in baseline
+        ) / 1000)
+        modules.update(name for name, _, _ in imports if name not in baseline)
+    return {
+        "ms": round(statistics.median(timings), 3),
+        "runs_ms": [round(ms, 3) for ms in timings],
+        "modules": sorted(modules),
+    }
+
+
+def run_checks(
+    checks: Optional[List[str]] = None,
+    runs: int = 5,
+    scale: float = 1.0
+) -> Dict[str, Any]:
+    """Measure each check and compare it with its budget.
+
+    Args:
+        checks: Check names to run, keys of ``CHECKS`` (defaults to all)
+        runs: Fresh interpreters per check
+        scale: Multiplier for every budget, for slow machines
+
+    Returns:
+        One result per check, with its measurement, ``budget_ms``, the
+        ``forbidden`` modules it imported and whether it ``passed``
+    """
+    results: Dict[str, Any] = {}
+    for name in checks or list(CHECKS):
+        statement, budget, forbidden = CHECKS[name]
+        result = measure(statement, runs)
+        imported = set(result["modules"])
+        result["budget_ms"] = budget * scale
+        result["forbidden"] = sorted(
+            module for module in imported
+            if any(module == f or module.startswith(f + ".") for f in forbidden)
+        )
+        result["passed"] = result["ms"] <= result["budget_ms"] and not result["forbidden"]
+        results[name] = result
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point: ``python -m benchmarks.importtime``.
+
+    Exits with status 1 if any check is over budget or imports a module it
+    should not.
+    """
+    parser = argparse.ArgumentParser(description="Check Draw Things import time against budgets")
+    parser.add_argument("--check", action="append", choices=list(CHECKS), help="Check to run (repeatable; default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per check")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget by this factor")
+    args = parser.parse_args(argv)
+
+    results = run_checks(args.check, runs=args.runs, scale=args.scale)
+    print(json.dumps(results, indent=2))
+    if not all(result["passed"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Benchmark scenarios and the runner that measures them.
+
+Every scenario runs against a local ``MockDrawThingsServer`` in the same
+process, so the numbers are the client's own overhead: HTTP handling, JSON
+and base64 decoding, and disk writes, with whatever latency the mock server
+is told to add.
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from unittest import mock
+
+from draw_things import __version__
+from draw_things.api.client import DrawThingsClient
+from draw_things.config.settings import settings
+from draw_things.core.image_generator import ImageGenerator
+from tests.mock_server import MockDrawThingsServer
+
+Call = Callable[[], Any]
+
+PROMPT = "benchmark"
+BATCH_IMAGES = 8
+COMPARED_METRICS = ("rps", "ips", "p50_ms", "p95_ms", "p99_ms", "peak_memory_bytes")
+
+
+@contextlib.contextmanager
+def _generate_images(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    with ImageGenerator(server.url) as generator:
+        yield lambda: generator.generate_images(prompt=PROMPT)
+
+
+@contextlib.contextmanager
+def _save_images(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    images = server.images
+    with ImageGenerator(server.url) as generator:
+        yield lambda: generator.save_images(images, "benchmark", output_dir)
+
+
+@contextlib.contextmanager
+def _generate_image(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    with DrawThingsClient(server.url) as client:
+        yield lambda: client.generate_image(PROMPT, output_dir=output_dir)
+
+
+@contextlib.contextmanager
+def _generate_image_stream(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    with DrawThingsClient(server.url, stream=True) as client:
+        yield lambda: client.generate_image(PROMPT, output_dir=output_dir)
+
+
+@contextlib.contextmanager
+def _generate_batch(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    # Requests differing only in seed go out as one batched server call
+    requests = [{"prompt": PROMPT, "seed": seed} for seed in range(BATCH_IMAGES)]
+    with DrawThingsClient(server.url) as client:
+        yield lambda: client.generate_batch(requests, output_dir=output_dir)
+
+
+@contextlib.contextmanager
+def _generate_unbatched(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    # The same images as _generate_batch, one server call each
+    def call():
+        for seed in range(BATCH_IMAGES):
+            client.generate_image(PROMPT, seed=seed, output_dir=output_dir)
+
+    with DrawThingsClient(server.url) as client:
+        yield call
+
+
+@contextlib.contextmanager
+def _cli(server: MockDrawThingsServer, output_dir: str, *args: str) -> Iterator[Call]:
+    from sandbox.scripts import generate_images_cli
+
+    runs = itertools.count()
+
+    def call():
+        # A fresh directory per run, so sweeps never resume each other
+        run_dir = os.path.join(output_dir, str(next(runs)))
+        with mock.patch.object(sys, "argv", ["generate_images_cli.py", *args, "--output-dir", run_dir]):
+            generate_images_cli.main()
+
+    with mock.patch.object(settings, "API_URL", server.url), \
+            contextlib.redirect_stdout(io.StringIO()):
+        yield call
+
+
+@contextlib.contextmanager
+def _cli_generate(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    with _cli(server, output_dir, "--prompt", PROMPT) as call:
+        yield call
+
+
+@contextlib.contextmanager
+def _cli_models_test(server: MockDrawThingsServer, output_dir: str) -> Iterator[Call]:
+    with _cli(server, output_dir, "--models-test", "--prompt", PROMPT) as call:
+        yield call
+
+
+SCENARIOS: Dict[str, Callable[[MockDrawThingsServer, str], "contextlib.AbstractContextManager[Call]"]] = {
+    "generate_images": _generate_images,
+    "save_images": _save_images,
+    "generate_image": _generate_image,
+    "generate_image_stream": _generate_image_stream,
+    "generate_batch": _generate_batch,
+    "generate_unbatched": _generate_unbatched,
+    "cli": _cli_generate,
+    "cli_models_test": _cli_models_test,
+}
+
+# Images each call of a scenario produces, where not one
+IMAGES_PER_CALL = {
+    "generate_batch": BATCH_IMAGES,
+    "generate_unbatched": BATCH_IMAGES,
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of values (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _run_calls(call: Call, requests: int, concurrency: int) -> List[Optional[float]]:
+    """Run call requests times; return each latency, or None for failures."""
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, range(requests)))
+
+
+def run_scenario(
+    name: str,
+    server: MockDrawThingsServer,
+    requests: int = 100,
+    concurrency: int = 1,
+    memory_requests: Optional[int] = None
+) -> Dict[str, Any]:
+    """Measure one scenario.
+
+    The timed run and the memory run are separate, since tracing allocations
+    slows everything down.
+
+    Args:
+        name: Scenario name, a key of ``SCENARIOS``
+        server: Running mock server to send requests to
+        requests: Calls in the timed run
+        concurrency: Calls in flight at once
+        memory_requests: Calls in the run traced for peak memory (defaults
+            to two per concurrent caller)
+
+    Returns:
+        Throughput in calls (``rps``) and images (``ips``) per second,
+        latency percentiles in milliseconds, bytes received from the server
+        and written to disk per call, and peak traced memory
+    """
+    memory_requests = memory_requests or min(requests, 2 * concurrency)
+    with tempfile.TemporaryDirectory() as output_dir, \
+            SCENARIOS[name](server, output_dir) as call:
+        call()  # warm up imports and connections
+
+        sent, written = server.bytes_sent, _directory_size(output_dir)
+        start = time.perf_counter()
+        latencies = _run_calls(call, requests, concurrency)
+        elapsed = time.perf_counter() - start
+        received = server.bytes_sent - sent
+        written = _directory_size(output_dir) - written
+
+        tracemalloc.start()
+        try:
+            _run_calls(call, memory_requests, concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    succeeded = [latency * 1000 for latency in latencies if latency is not None]
+    images = IMAGES_PER_CALL.get(name, 1)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": requests - len(succeeded),
+        "seconds": round(elapsed, 4),
+        "rps": round(len(succeeded) / elapsed, 2) if elapsed else 0.0,
+        "images_per_call": images,
+        "ips": round(len(succeeded) * images / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(succeeded, 50), 3),
+        "p95_ms": round(percentile(succeeded, 95), 3),
+        "p99_ms": round(percentile(succeeded, 99), 3),
+        "max_ms": round(max(succeeded, default=0.0), 3),
+        "bytes_received_per_request": received // requests,
+        "bytes_written_per_request": written // requests,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_suite(
+    scenarios: Optional[List[str]] = None,
+    requests: int = 100,
+    concurrency: int = 1,
+    latency: float = 0.0,
+    image_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """Start a mock server and measure each scenario against it.
+
+    Args:
+        scenarios: Scenario names to run (defaults to all)
+        requests: Calls per scenario
+        concurrency: Calls in flight at once
+        latency: Seconds the mock server waits before each txt2img response
+        image_size: Bytes per generated image (defaults to a 1x1 PNG)
+
+    Returns:
+        Run metadata and one result per scenario, ready to dump as JSON
+    """
+    scenarios = scenarios or list(SCENARIOS)
+    results: Dict[str, Any] = {}
+    with MockDrawThingsServer() as server:
+        server.latency = latency
+        if image_size:
+            server.image_size = image_size
+        for name in scenarios:
+            results[name] = run_scenario(name, server, requests, concurrency)
+    return {
+        "meta": {
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "latency": latency,
+            "image_size": image_size,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare two suite runs scenario by scenario.
+
+    Returns:
+        For every scenario in both runs, each compared metric's baseline and
+        current value and the relative change
+    """
+    changes: Dict[str, Any] = {}
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        changes[name] = {}
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            changes[name][metric] = {
+                "baseline": old,
+                "current": new,
+                "change": round((new - old) / old, 4) if old else None,
+            }
+    return changes
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command-line entry point: ``python -m benchmarks``."""
+    parser = argparse.ArgumentParser(description="Benchmark the Draw Things client against a mock server")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=100, help="Calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server seconds per txt2img request")
+    parser.add_argument("--image-size", type=int, help="Bytes per generated image")
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", type=str, help="Baseline results file to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        scenarios=args.scenario,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        latency=args.latency,
+        image_size=args.image_size
+    )
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -12,16 +12,38 @@ Example:
 
     Test all available models:
         $ python generate_images_cli.py --models-test
+
+    Sweep two prompts over every model and three seeds, four requests at a time:
+        $ python generate_images_cli.py --models-test --prompt "A cat" --prompt "A dog" \
+            --seeds 1 2 3 --workers 4
+
+    Resume a sweep that crashed:
+        $ python generate_images_cli.py --models-test --resume models-tests/2024-01-01T12:00:00
+
+    Run a JSON-lines job file, eight requests at a time, logging results:
+        $ python generate_images_cli.py --jobs prompts.jsonl --workers 8 --results results.jsonl
+
+    Generate 16 variations of a prompt at seeds 100-115, batched on the server:
+        $ python generate_images_cli.py --prompt "A cat" --seed 100 --seed-sweep 16
+
+    Rerun it after a crash, skipping every job already saved:
+        $ python generate_images_cli.py --jobs prompts.jsonl --workers 8 --manifest runs.db
 """
 
 import argparse
+import json
 import os
+import sys
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, TextIO
 
 from draw_things import DrawThingsClient, settings
 
+if TYPE_CHECKING:
+    from draw_things.core.manifest import ResultManifest
+
 # Default parameters
 DEFAULT_PROMPT = "A beautiful woman with long hair and a red corset"
 DEFAULT_WIDTH = settings.DEFAULT_WIDTH
@@ -38,10 +60,21 @@ def generate_images_for_models(
     height: int,
     steps: int,
     seed: int,
-    loras: List[str]
+    loras: List[str],
+    prompts: Optional[List[str]] = None,
+    seeds: Optional[List[int]] = None,
+    samplers: Optional[List[str]] = None,
+    workers: int = 1,
+    output_dir: Optional[str] = None,
+    manifest: Optional["ResultManifest"] = None
 ) -> List[str]:
     """Generate images using all available models.
 
+    Runs a prompt x model x seed x sampler sweep on a worker pool, one model
+    at a time. Progress is checkpointed in the output directory and a
+    manifest.json of every job is written at the end; passing the directory
+    of a crashed sweep as output_dir resumes it.
+
     Args:
         client: DrawThingsClient instance
         prompt: Text prompt for image generation
@@ -50,34 +83,111 @@ def generate_images_for_models(
         steps: Number of diffusion steps
         seed: Random seed (-1 for random)
         loras: List of LoRA models to apply
+        prompts: Prompts to sweep instead of the single prompt
+        seeds: Seeds to sweep instead of the single seed
+        samplers: Samplers to sweep (default sampler if omitted)
+        workers: Maximum requests in flight at once
+        output_dir: Directory to write into (a new timestamped directory
+            under models-tests/ if omitted)
+        manifest: Index of finished jobs shared across runs; jobs it holds
+            are not generated again
 
     Returns:
         List of paths to generated images
     """
+    from draw_things.core.sweep import SweepRunner, build_grid
+
     # Create output directory with timestamp
-    output_dir = Path("models-tests") / datetime.now().isoformat()
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if output_dir is None:
+        output_dir = str(Path("models-tests") / datetime.now().isoformat())
 
-    saved_paths = []
-    models = client.get_available_models()
+    jobs = build_grid(
+        prompts=prompts or [prompt],
+        models=client.get_available_models(),
+        seeds=seeds or [seed],
+        samplers=samplers or [None],
+        loras=loras,
+        width=width,
+        height=height,
+        steps=steps
+    )
 
-    for model in models:
+    def report(record):
+        if record["status"] != "ok":
+            print(f"Error generating image for model {record['job']['model']}: {record['error']}")
+
+    runner = SweepRunner(
+        client, output_dir, workers=workers, on_result=report, manifest=manifest
+    )
+    records = runner.run(jobs)
+    return [path for record in records for path in record["paths"]]
+
+def read_jobs(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse job specs from JSON lines, one line at a time.
+
+    Blank lines are skipped, as are lines that are not JSON objects, with a
+    warning on stderr.
+
+    Args:
+        lines: Lines of JSON objects with ``generate_image`` arguments
+            (prompt, model, seed, width, height, loras, sampler, ...)
+
+    Yields:
+        One job spec per line
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
         try:
-            paths = client.generate_image(
-                prompt=prompt,
-                width=width,
-                height=height,
-                steps=steps,
-                seed=seed,
-                model=model,
-                loras=loras,
-                output_dir=str(output_dir)
-            )
-            saved_paths.extend(paths)
-        except Exception as e:
-            print(f"Error generating image for model {model}: {e}")
+            job = json.loads(line)
+        except ValueError as e:
+            print(f"Skipping line {number}: {e}", file=sys.stderr)
+            continue
+        if not isinstance(job, dict):
+            print(f"Skipping line {number}: not a JSON object", file=sys.stderr)
+            continue
+        yield job
 
-    return saved_paths
+def run_jobs(
+    client: DrawThingsClient,
+    lines: Iterable[str],
+    results: TextIO,
+    workers: int = 1,
+    output_dir: Optional[str] = None,
+    manifest: Optional["ResultManifest"] = None
+) -> Dict[str, int]:
+    """Run every job in a JSON-lines stream, writing a result line for each.
+
+    Lines are read lazily and run through the client's pipeline with
+    ``workers`` requests in flight, so memory stays flat however long the
+    input is. Results are written in completion order as they arrive.
+
+    Args:
+        client: DrawThingsClient instance
+        lines: JSON-lines job specs, such as an open file or stdin
+        results: Stream to write one JSON result record per job to
+        workers: Maximum requests in flight at once
+        output_dir: Directory to save images
+        manifest: Index of finished jobs shared across runs; jobs it holds
+            are reported with ``resumed: True`` instead of being run
+
+    Returns:
+        Number of jobs that ``succeeded``, ``failed`` and were ``resumed``
+        from the manifest, and the elapsed ``seconds``
+    """
+    totals = {"succeeded": 0, "failed": 0, "resumed": 0}
+    start = time.monotonic()
+    for record in client.generate_pipelined(
+        read_jobs(lines), output_dir=output_dir, workers=workers, manifest=manifest
+    ):
+        if record.get("resumed"):
+            totals["resumed"] += 1
+        else:
+            totals["succeeded" if record["status"] == "ok" else "failed"] += 1
+        results.write(json.dumps(record) + "\n")
+        results.flush()
+    totals["seconds"] = round(time.monotonic() - start, 3)
+    return totals
 
 def main():
     """Main entry point."""
@@ -85,47 +195,106 @@ def main():
     parser.add_argument("--models", action="store_true", help="Return a list of models")
     parser.add_argument("--model", type=str, help="Model to use for image generation", default=DEFAULT_MODEL)
     parser.add_argument("--models-test", action="store_true", help="Generate images with each model available")
-    parser.add_argument("--prompt", type=str, help="Text prompt for image generation", default=DEFAULT_PROMPT)
+    parser.add_argument("--prompt", type=str, action="append", help="Text prompt for image generation (repeat to sweep several with --models-test)")
     parser.add_argument("--width", type=int, help="Image width", default=DEFAULT_WIDTH)
     parser.add_argument("--height", type=int, help="Image height", default=DEFAULT_HEIGHT)
     parser.add_argument("--steps", type=int, help="Number of diffusion steps", default=DEFAULT_STEPS)
     parser.add_argument("--seed", type=int, help="Random seed (-1 for random)", default=DEFAULT_SEED)
     parser.add_argument("--output-dir", type=str, help="Output directory for images")
+    parser.add_argument("--seeds", type=int, nargs="+", help="Seeds to sweep with --models-test")
+    parser.add_argument("--samplers", type=str, nargs="+", help="Samplers to sweep with --models-test")
+    parser.add_argument("--workers", type=int, default=1, help="Requests in flight at once for --models-test and --jobs")
+    parser.add_argument("--resume", type=str, help="Resume the --models-test sweep in this directory")
+    parser.add_argument("--jobs", type=str, help="JSON-lines file of generation specs to run, or - for stdin")
+    parser.add_argument("--results", type=str, help="Write --jobs result records to this JSON-lines file (default: stdout)")
+    parser.add_argument("--seed-sweep", type=int, metavar="N", help="Generate N variations at consecutive seeds from --seed (0 if random)")
+    parser.add_argument("--max-batch-size", type=int, help="Largest server-side batch for --seed-sweep")
+    parser.add_argument("--manifest", type=str, help="SQLite index of finished jobs; reruns of --jobs and --models-test skip what it holds")
 
     args = parser.parse_args()
+    prompts = args.prompt or [DEFAULT_PROMPT]
     client = DrawThingsClient()
+    manifest = None
+    try:
+        if args.models:  # List available models
+            models = client.get_available_models()
+            if models:
+                print("Available models:", models)
+            else:
+                print("No models available")
+            return
 
-    if args.models:  # List available models
-        models = client.get_available_models()
-        if models:
-            print("Available models:", models)
-        else:
-            print("No models available")
-        return
-
-    if args.models_test:  # Generate images for each model
-        saved_paths = generate_images_for_models(
-            client=client,
-            prompt=args.prompt,
-            width=args.width,
-            height=args.height,
-            steps=args.steps,
-            seed=args.seed,
-            loras=DEFAULT_LORAS
-        )
-        print(f"Generated {len(saved_paths)} images")
-    else:  # Generate a single image
-        saved_paths = client.generate_image(
-            prompt=args.prompt,
-            width=args.width,
-            height=args.height,
-            steps=args.steps,
-            seed=args.seed,
-            model=args.model,
-            loras=DEFAULT_LORAS,
-            output_dir=args.output_dir
-        )
-        print(f"Generated images saved to: {saved_paths}")
+        if args.manifest:
+            from draw_things.core.manifest import ResultManifest
+            manifest = ResultManifest(args.manifest)
+
+        if args.jobs:  # Run a job file
+            source = sys.stdin if args.jobs == "-" else open(args.jobs, "r", encoding="utf-8")
+            results = open(args.results, "w", encoding="utf-8") if args.results else sys.stdout
+            try:
+                totals = run_jobs(
+                    client, source, results,
+                    workers=args.workers, output_dir=args.output_dir, manifest=manifest
+                )
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+                if results is not sys.stdout:
+                    results.close()
+            print(
+                f"Ran {totals['succeeded'] + totals['failed']} jobs in {totals['seconds']}s: "
+                f"{totals['succeeded']} succeeded, {totals['failed']} failed, "
+                f"{totals['resumed']} already done",
+                file=sys.stderr
+            )
+        elif args.seed_sweep:  # Generate variations over consecutive seeds
+            start = max(args.seed, 0)
+            saved_paths = client.seed_sweep(
+                prompt=prompts[-1],
+                seeds=range(start, start + args.seed_sweep),
+                output_dir=args.output_dir,
+                max_batch_size=args.max_batch_size,
+                width=args.width,
+                height=args.height,
+                steps=args.steps,
+                model=args.model,
+                loras=DEFAULT_LORAS
+            )
+            for seed, path in zip(range(start, start + args.seed_sweep), saved_paths):
+                print(f"Seed {seed}: {path}")
+        elif args.models_test:  # Generate images for each model
+            saved_paths = generate_images_for_models(
+                client=client,
+                prompt=prompts[0],
+                width=args.width,
+                height=args.height,
+                steps=args.steps,
+                seed=args.seed,
+                loras=DEFAULT_LORAS,
+                prompts=prompts,
+                seeds=args.seeds,
+                samplers=args.samplers,
+                workers=args.workers,
+                output_dir=args.resume or args.output_dir,
+                manifest=manifest
+            )
+            print(f"Generated {len(saved_paths)} images")
+        else:  # Generate a single image
+            saved_paths = client.generate_image(
+                prompt=prompts[-1],
+                width=args.width,
+                height=args.height,
+                steps=args.steps,
+                seed=args.seed,
+                model=args.model,
+                loras=DEFAULT_LORAS,
+                output_dir=args.output_dir
+            )
+            print(f"Generated images saved to: {saved_paths}")
+    finally:
+        if manifest is not None:
+            manifest.close()
+        client.close()
 
 if __name__ == "__main__":
     main()
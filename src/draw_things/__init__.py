@@ -1,10 +1,51 @@
 """
 Draw Things - A Python package for generating and manipulating images.
+
+Public names are imported on first access (PEP 562), so ``import draw_things``
+stays cheap for short-lived command-line tools.
 """
 
-from .api.client import DrawThingsClient
-from .core.image_generator import ImageGenerationError
-from .config.settings import settings
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .api.async_client import AsyncDrawThingsClient
+    from .api.client import DrawThingsClient
+    from .config.settings import settings
+    from .core.admission import AdmissionController, PriorityClass
+    from .core.image_generator import (
+        AdmissionRejectedError, CircuitOpenError, DeadlineExceededError,
+        GenerationCancelledError, ImageGenerationError, UnknownModelError
+    )
 
 __version__ = "0.1.0"
-__all__ = ["DrawThingsClient", "ImageGenerationError", "settings"]
\ No newline at end of file
+
+# Public name -> module that defines it
+_LAZY = {
+    "AdmissionController": ".core.admission",
+    "AdmissionRejectedError": ".core.image_generator",
+    "AsyncDrawThingsClient": ".api.async_client",
+    "CircuitOpenError": ".core.image_generator",
+    "DeadlineExceededError": ".core.image_generator",
+    "DrawThingsClient": ".api.client",
+    "GenerationCancelledError": ".core.image_generator",
+    "ImageGenerationError": ".core.image_generator",
+    "PriorityClass": ".core.admission",
+    "UnknownModelError": ".core.image_generator",
+    "settings": ".config.settings",
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
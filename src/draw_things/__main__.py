@@ -0,0 +1,98 @@
+"""
+Command-line entry point: ``python -m draw_things`` (or ``draw-things``).
+
+Subcommands:
+    worker   Run a long-lived worker that drains a job queue
+    enqueue  Add jobs, one JSON object per line, to a job queue
+    status   Print the number of jobs in each state
+
+A queue is a SQLite database (a path with a file extension, such as
+``jobs.db``) or a spool directory of JSON job files. Each job holds
+``generate_image`` keyword arguments, for example
+``{"prompt": "A cat", "model": "sd_v1.5.ckpt", "seed": 42}``.
+
+Example:
+    $ python -m draw_things worker jobs.db --concurrency 4 &
+    $ echo '{"prompt": "A cat"}' | python -m draw_things enqueue jobs.db
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+
+def _worker(args: argparse.Namespace):
+    from .api.client import DrawThingsClient
+    from .core.job_queue import open_queue
+    from .core.worker import Worker
+
+    def report(record):
+        print(json.dumps(record), flush=True)
+
+    with open_queue(args.queue) as queue, DrawThingsClient(args.api_url) as client:
+        if args.recover:
+            requeued = queue.recover()
+            if requeued:
+                print(f"Requeued {requeued} interrupted jobs", file=sys.stderr)
+        worker = Worker(
+            client, queue,
+            concurrency=args.concurrency,
+            poll_interval=args.poll_interval,
+            output_dir=args.output_dir,
+            on_result=report
+        )
+        worker.install_signal_handlers()
+        totals = worker.run(drain=args.drain)
+    print(f"Worker stopped: {totals['succeeded']} succeeded, {totals['failed']} failed",
+          file=sys.stderr)
+
+
+def _enqueue(args: argparse.Namespace):
+    from .core.job_queue import open_queue
+
+    source = open(args.file, "r", encoding="utf-8") if args.file else sys.stdin
+    with source, open_queue(args.queue) as queue:
+        for line in source:
+            if line.strip():
+                print(queue.put(json.loads(line)))
+
+
+def _status(args: argparse.Namespace):
+    from .core.job_queue import open_queue
+
+    with open_queue(args.queue) as queue:
+        print(json.dumps(queue.counts()))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Parse arguments and run a subcommand."""
+    parser = argparse.ArgumentParser(prog="draw-things", description="Draw Things job queue tools")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    worker = subparsers.add_parser("worker", help="Run jobs from a queue until stopped")
+    worker.add_argument("queue", help="SQLite database or spool directory")
+    worker.add_argument("--api-url", type=str, help="Draw Things API URL")
+    worker.add_argument("--concurrency", type=int, help="Jobs in flight at once")
+    worker.add_argument("--poll-interval", type=float, help="Seconds between polls of an empty queue")
+    worker.add_argument("--output-dir", type=str, help="Directory for images of jobs that do not name one")
+    worker.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+    worker.add_argument("--recover", action="store_true", help="Requeue jobs left running by a worker that died (only when no other worker is running)")
+    worker.set_defaults(func=_worker)
+
+    enqueue = subparsers.add_parser("enqueue", help="Add JSON-lines jobs to a queue and print their ids")
+    enqueue.add_argument("queue", help="SQLite database or spool directory")
+    enqueue.add_argument("file", nargs="?", help="JSON-lines file (default: stdin)")
+    enqueue.set_defaults(func=_enqueue)
+
+    status = subparsers.add_parser("status", help="Print job counts by status")
+    status.add_argument("queue", help="SQLite database or spool directory")
+    status.set_defaults(func=_status)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""
+Asyncio interface for Draw Things.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from ..config.settings import settings
+from ..core.cache import ResultCache
+from ..core.instrumentation import Instrumentation
+from ..core.output import OutputSink
+from ..core.retry import RetryPolicy
+from .client import DrawThingsClient
+
+if TYPE_CHECKING:
+    from ..core.admission import AdmissionController
+    from ..core.progress import Progress
+    from ..core.template import RequestTemplate
+
+class AsyncDrawThingsClient:
+    """Asyncio counterpart of DrawThingsClient with bounded concurrency.
+
+    Each call runs the blocking client on a worker thread, so up to
+    ``max_concurrency`` requests are in flight against the server at once
+    while the event loop stays free.
+
+    It mirrors the ``DrawThingsClient`` API, with two exceptions.
+    ``generate_pipelined`` has no async counterpart; use ``generate_many``.
+    Progress is watched with ``generate_with_progress`` instead of ``watch``.
+    """
+
+    def __init__(
+        self,
+        api_url: Optional[Union[str, Sequence[str]]] = None,
+        max_concurrency: Optional[int] = None,
+        pool_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        stream: bool = False,
+        backend_policy: Optional[str] = None,
+        backend_max_in_flight: Optional[int] = None,
+        admission: Optional["AdmissionController"] = None,
+        cache: Optional[ResultCache] = None,
+        coalesce: bool = False,
+        validate_models: bool = False,
+        catalog_ttl: Optional[float] = None,
+        sink: Optional[OutputSink] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None
+    ):
+        """Initialize the client.
+
+        Args:
+            api_url: Optional custom API URL, or a list of URLs to balance
+                requests across several servers
+            max_concurrency: Maximum number of requests in flight at once
+            pool_size: Maximum idle keep-alive connections per host
+                (defaults to at least ``max_concurrency``)
+            idle_timeout: Seconds before an idle connection is discarded
+            stream: Decode responses incrementally straight to disk
+            backend_policy: Routing policy across several servers
+            backend_max_in_flight: Requests in flight per server
+            admission: Admission controller that queues generations by
+                priority class; calls still count towards ``max_concurrency``
+                while they wait for admission
+            cache: Opt-in cache of fixed-seed results
+            coalesce: Share one upstream call between concurrent identical
+                fixed-seed requests
+            validate_models: Check the model against the cached model
+                catalog before sending a request
+            catalog_ttl: Seconds the model catalog is cached
+            sink: Where images are saved (defaults to a ``FileSystemSink``)
+            instrumentation: Receives per-stage timings, byte counts and
+                errors, e.g. a ``Metrics`` collector
+            timeout: Socket timeout in seconds for each connect or read
+            retry: Retry policy for fixed-seed requests
+        """
+        self.max_concurrency = max_concurrency or settings.MAX_CONCURRENCY
+        self._client = DrawThingsClient(
+            api_url=api_url,
+            pool_size=pool_size or max(settings.POOL_SIZE, self.max_concurrency),
+            idle_timeout=idle_timeout,
+            stream=stream,
+            backend_policy=backend_policy,
+            backend_max_in_flight=backend_max_in_flight,
+            admission=admission,
+            cache=cache,
+            coalesce=coalesce,
+            validate_models=validate_models,
+            catalog_ttl=catalog_ttl,
+            sink=sink,
+            instrumentation=instrumentation,
+            timeout=timeout,
+            retry=retry
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="draw-things"
+        )
+        # Created lazily so it binds to the loop that first uses it
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _run(self, func, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def generate_image(self, prompt: str, **kwargs) -> List[str]:
+        """Generate and save an image.
+
+        Accepts the same arguments as ``DrawThingsClient.generate_image``.
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.generate_image, prompt, **kwargs)
+
+    async def img2img(self, init_image: Any, prompt: str, **kwargs) -> List[str]:
+        """Generate and save images starting from an existing image.
+
+        Accepts the same arguments as ``DrawThingsClient.img2img``.
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.img2img, init_image, prompt, **kwargs)
+
+    async def inpaint(self, init_image: Any, mask: Any, prompt: str, **kwargs) -> List[str]:
+        """Regenerate the masked areas of an image.
+
+        Accepts the same arguments as ``DrawThingsClient.inpaint``.
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.inpaint, init_image, mask, prompt, **kwargs)
+
+    async def generate_batch(self, requests: List[Dict[str, Any]], **kwargs) -> List[List[str]]:
+        """Generate and save images for several requests in few round trips.
+
+        Accepts the same arguments as ``DrawThingsClient.generate_batch``.
+
+        Returns:
+            List of paths to saved images for each request, in request order
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.generate_batch, requests, **kwargs)
+
+    async def seed_sweep(self, prompt: str, seeds: Sequence[int], **kwargs) -> List[str]:
+        """Generate variations of one prompt over fixed seeds.
+
+        Accepts the same arguments as ``DrawThingsClient.seed_sweep``.
+
+        Returns:
+            Path of the saved image for each seed, in the order of seeds
+
+        Raises:
+            ValueError: If a seed is negative
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.seed_sweep, prompt, seeds, **kwargs)
+
+    def template(self, fields: Optional[Sequence[str]] = None, **params: Any) -> "RequestTemplate":
+        """Build a reusable template for requests sharing most parameters.
+
+        Makes no server call; see ``DrawThingsClient.template``.
+
+        Returns:
+            Template for ``generate_from_template``
+        """
+        return self._client.template(fields, **params)
+
+    async def generate_from_template(self, template: "RequestTemplate", **kwargs) -> List[str]:
+        """Generate and save images for one request built from a template.
+
+        Accepts the same arguments as ``DrawThingsClient.generate_from_template``.
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return await self._run(self._client.generate_from_template, template, **kwargs)
+
+    def generate_with_progress(
+        self,
+        prompt: str,
+        preview: bool = False,
+        **kwargs
+    ) -> "AsyncGeneration":
+        """Start generating an image, with progress reports and cancellation.
+
+        Must be called from a running event loop. Accepts the same arguments
+        as ``DrawThingsClient.generate_image``.
+
+        Example:
+            generation = client.generate_with_progress("A cat", steps=32)
+            async for progress in generation:
+                print(f"{progress.step}/{progress.steps}, {progress.eta:.0f}s left")
+            paths = await generation
+
+        Args:
+            prompt: Text prompt for image generation
+            preview: Include a preview of the image so far in each report
+
+        Returns:
+            The generation in flight
+        """
+        return AsyncGeneration(self, prompt, preview, kwargs)
+
+    async def generate_many(
+        self,
+        jobs: Iterable[Dict[str, Any]],
+        return_exceptions: bool = False
+    ) -> List[Any]:
+        """Generate images for several jobs concurrently.
+
+        Args:
+            jobs: Keyword-argument dicts for ``generate_image``, one per job
+            return_exceptions: Return failures in place of results instead of
+                raising the first one, as with ``asyncio.gather``
+
+        Returns:
+            One list of saved paths (or exception) per job, in job order
+
+        Raises:
+            ImageGenerationError: If a job fails and ``return_exceptions`` is False
+        """
+        return await asyncio.gather(
+            *(self.generate_image(**job) for job in jobs),
+            return_exceptions=return_exceptions
+        )
+
+    async def get_available_models(self) -> List[str]:
+        """Get list of available models.
+
+        Returns:
+            List of available model names
+
+        Raises:
+            ImageGenerationError: If model list retrieval fails
+        """
+        return await self._run(self._client.get_available_models)
+
+    async def aclose(self):
+        """Close pooled connections and worker threads."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        self._client.close()
+
+    async def __aenter__(self) -> "AsyncDrawThingsClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
+class AsyncGeneration:
+    """An image generation in flight on an ``AsyncDrawThingsClient``.
+
+    Iterate over it for ``Progress`` reports until the generation ends,
+    await it for the saved paths, and ``cancel`` it to stop the server
+    working on it.
+    """
+
+    def __init__(
+        self,
+        client: AsyncDrawThingsClient,
+        prompt: str,
+        preview: bool,
+        kwargs: Dict[str, Any]
+    ):
+        loop = asyncio.get_running_loop()
+        self._updates: "asyncio.Queue[Optional[Progress]]" = asyncio.Queue()
+        self._finished = False
+
+        def report(progress: "Progress"):
+            loop.call_soon_threadsafe(self._updates.put_nowait, progress)
+
+        self.watcher = client._client.watch(on_progress=report, preview=preview)
+        self._task = asyncio.ensure_future(
+            client._run(client._client.generate_image, prompt, progress=self.watcher, **kwargs)
+        )
+        self._task.add_done_callback(lambda task: self._updates.put_nowait(None))
+
+    def __aiter__(self) -> "AsyncGeneration":
+        return self
+
+    async def __anext__(self) -> "Progress":
+        if not self._finished:
+            progress = await self._updates.get()
+            if progress is not None:
+                return progress
+            self._finished = True
+        raise StopAsyncIteration
+
+    def __await__(self):
+        """Wait for the saved paths; raises what the generation raised."""
+        return self._task.__await__()
+
+    def done(self) -> bool:
+        """Whether the generation has finished, failed or been cancelled."""
+        return self._task.done()
+
+    async def cancel(self):
+        """Cancel the generation, interrupting it on the server if running.
+
+        Awaiting the generation then raises ``GenerationCancelledError``.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.watcher.cancel)
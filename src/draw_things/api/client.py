@@ -2,20 +2,101 @@
 Public API interface for Draw Things.
 """
 
-from typing import List, Optional
-from ..core.image_generator import ImageGenerator, ImageGenerationError
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+from ..core.cache import ResultCache, payload_key
+from ..core.instrumentation import Instrumentation
+from ..core.output import OutputSink
+from ..core.retry import RetryPolicy
+from ..core.image_generator import GenerationCancelledError, ImageGenerator, ImageGenerationError
 from ..config.settings import settings
 
+if TYPE_CHECKING:
+    from ..core.admission import AdmissionController
+    from ..core.manifest import ResultManifest
+    from ..core.progress import Progress, ProgressWatcher
+    from ..core.sources import Source
+    from ..core.template import RequestTemplate
+
 class DrawThingsClient:
     """Public API interface for Draw Things."""
 
-    def __init__(self, api_url: Optional[str] = None):
+    def __init__(
+        self,
+        api_url: Optional[Union[str, Sequence[str]]] = None,
+        pool_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        stream: bool = False,
+        backend_policy: Optional[str] = None,
+        backend_max_in_flight: Optional[int] = None,
+        admission: Optional["AdmissionController"] = None,
+        cache: Optional[ResultCache] = None,
+        coalesce: bool = False,
+        validate_models: bool = False,
+        catalog_ttl: Optional[float] = None,
+        sink: Optional[OutputSink] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None
+    ):
         """Initialize the client.
 
+        All calls made through the client share one pool of keep-alive
+        connections owned by its image generator.
+
         Args:
-            api_url: Optional custom API URL
+            api_url: Optional custom API URL, or a list of URLs to balance
+                requests across several servers
+            pool_size: Maximum idle keep-alive connections per host
+            idle_timeout: Seconds before an idle connection is discarded
+            stream: Decode responses incrementally straight to disk instead
+                of holding whole images in memory
+            backend_policy: Routing policy across several servers,
+                ``least_outstanding`` or ``latency``
+            backend_max_in_flight: Requests in flight per server
+            admission: Admission controller that queues generations by
+                priority class; see ``AdmissionController``
+            cache: Opt-in cache that serves repeated fixed-seed generations
+                from disk; not consulted in streaming mode
+            coalesce: Share one upstream call between concurrent identical
+                fixed-seed requests
+            validate_models: Check the model against the cached model
+                catalog before sending a request, raising
+                ``UnknownModelError`` for models the server doesn't have
+            catalog_ttl: Seconds the model catalog is cached
+            sink: Where images are saved (defaults to a ``FileSystemSink``)
+            instrumentation: Receives per-stage timings, byte counts and
+                errors, e.g. a ``Metrics`` collector
+            timeout: Socket timeout in seconds for each connect or read
+            retry: Retry policy for fixed-seed requests
         """
-        self._generator = ImageGenerator(api_url or settings.API_URL)
+        self.stream = stream
+        self._generator = ImageGenerator(
+            api_url or settings.API_URLS or settings.API_URL,
+            pool_size=pool_size,
+            idle_timeout=idle_timeout,
+            backend_policy=backend_policy,
+            backend_max_in_flight=backend_max_in_flight,
+            admission=admission,
+            cache=cache,
+            coalesce=coalesce,
+            validate_models=validate_models,
+            catalog_ttl=catalog_ttl,
+            sink=sink,
+            instrumentation=instrumentation,
+            timeout=timeout,
+            retry=retry
+        )
+
+    def close(self):
+        """Close pooled connections."""
+        self._generator.close()
+
+    def __enter__(self) -> "DrawThingsClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def generate_image(
         self,
@@ -26,7 +107,14 @@ class DrawThingsClient:
         seed: Optional[int] = None,
         model: Optional[str] = None,
         loras: Optional[List[str]] = None,
-        output_dir: Optional[str] = None
+        negative_prompt: Optional[str] = None,
+        guidance_scale: Optional[float] = None,
+        sampler: Optional[str] = None,
+        clip_skip: Optional[int] = None,
+        output_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        progress: Optional["ProgressWatcher"] = None,
+        priority: Optional[str] = None
     ) -> List[str]:
         """Generate and save an image.
 
@@ -43,11 +131,18 @@ class DrawThingsClient:
             sampler: Sampler to use for generation
             clip_skip: Number of CLIP layers to skip
             output_dir: Directory to save the image
+            timeout: Seconds the request may take, retries included
+            progress: Watcher, from ``watch``, that reports progress while
+                the image is generated and can cancel it
+            priority: Admission priority class, e.g. ``interactive`` or
+                ``batch``, when the client has an admission controller
 
         Returns:
             List of paths to saved images
 
         Raises:
+            AdmissionRejectedError: If admission control sheds the request
+            GenerationCancelledError: If ``progress`` was cancelled
             ImageGenerationError: If image generation fails
         """
         # Use settings defaults if parameters not provided
@@ -59,8 +154,7 @@ class DrawThingsClient:
         loras = loras or settings.DEFAULT_LORAS
         output_dir = output_dir or settings.OUTPUT_DIR
 
-        # Generate images
-        images = self._generator.generate_images(
+        generation_args = dict(
             prompt=prompt,
             width=width,
             height=height,
@@ -73,14 +167,331 @@ class DrawThingsClient:
             sampler=sampler,
             clip_skip=clip_skip
         )
+        payload = self._generator.build_payload(**generation_args)
+        return self._generate(payload, output_dir, timeout, progress, priority=priority)
+
+    def img2img(
+        self,
+        init_image: "Source",
+        prompt: str,
+        mask: Optional["Source"] = None,
+        strength: Optional[float] = None,
+        mask_blur: Optional[int] = None,
+        output_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        progress: Optional["ProgressWatcher"] = None,
+        priority: Optional[str] = None,
+        **params: Any
+    ) -> List[str]:
+        """Generate and save images starting from an existing image.
+
+        Source images are read and base64-encoded once per client and
+        reused from memory while unchanged, so one init image can drive
+        many prompts cheaply.
+
+        Args:
+            init_image: Path of the image to start from, or its file contents
+            prompt: Text prompt for image generation
+            mask: Path or contents of an inpainting mask; white areas are
+                regenerated and black areas kept
+            strength: How far to move away from the init image, from 0 to 1
+            mask_blur: Pixels to blur the mask edge by
+            output_dir: Directory to save the images
+            timeout: Seconds the request may take, retries included
+            progress: Watcher, from ``watch``, that reports progress while
+                the images are generated and can cancel them
+            priority: Admission priority class
+            **params: Further ``generate_image`` arguments, such as model,
+                seed or steps
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            GenerationCancelledError: If ``progress`` was cancelled
+            ImageGenerationError: If a source image cannot be read or image
+                generation fails
+        """
+        from ..core.sources import SOURCE_FIELDS, describe_source
+
+        payload = self._generator.build_img2img_payload(
+            init_image, prompt, mask=mask, strength=strength, mask_blur=mask_blur, **params
+        )
+        # Describe the sources rather than embedding megabytes of base64
+        metadata = {key: value for key, value in payload.items() if key not in SOURCE_FIELDS}
+        metadata["init_images"] = [describe_source(init_image)]
+        if mask is not None:
+            metadata["mask"] = describe_source(mask)
+        return self._generate(payload, output_dir, timeout, progress, metadata, priority=priority)
+
+    def inpaint(self, init_image: "Source", mask: "Source", prompt: str, **kwargs: Any) -> List[str]:
+        """Regenerate the masked areas of an image.
+
+        Shorthand for ``img2img`` with a mask; accepts the same arguments.
+
+        Returns:
+            List of paths to saved images
+        """
+        return self.img2img(init_image, prompt, mask=mask, **kwargs)
+
+    def template(self, fields: Optional[Sequence[str]] = None, **params: Any) -> "RequestTemplate":
+        """Build a reusable template for requests sharing most parameters.
+
+        Settings defaults are resolved and the shared part of the payload is
+        serialized once; see ``ImageGenerator.template``.
+
+        Args:
+            fields: Fields that vary per request (defaults to prompt,
+                negative prompt and seed)
+            **params: ``generate_image`` arguments shared by every request
+
+        Returns:
+            Template for ``generate_from_template``
+        """
+        return self._generator.template(fields, **params)
+
+    def generate_from_template(
+        self,
+        template: "RequestTemplate",
+        output_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        progress: Optional["ProgressWatcher"] = None,
+        priority: Optional[str] = None,
+        **values: Any
+    ) -> List[str]:
+        """Generate and save images for one request built from a template.
+
+        Example:
+            template = client.template(model="sd_v1.5.ckpt", steps=20)
+            for prompt in prompts:
+                client.generate_from_template(template, prompt=prompt, seed=42)
+
+        Args:
+            template: Template from ``template``
+            output_dir: Directory to save the images
+            timeout: Seconds the request may take, retries included
+            progress: Watcher, from ``watch``, that reports progress and can
+                cancel the generation
+            priority: Admission priority class
+            **values: This request's values of the template's fields
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        return self._generate(
+            template.payload(**values), output_dir, timeout, progress,
+            body=template.encode(**values), priority=priority
+        )
+
+    def watch(
+        self,
+        on_progress: Optional[Callable[["Progress"], None]] = None,
+        preview: bool = False
+    ) -> "ProgressWatcher":
+        """Create a progress watcher to pass to a generation call.
+
+        Example:
+            watcher = client.watch(lambda p: print(p.step, p.steps, p.eta))
+            paths = client.generate_image("A cat", progress=watcher)
+            # elsewhere, e.g. when the user gives up: watcher.cancel()
+
+        Args:
+            on_progress: Called with each new ``Progress`` report, from the
+                polling thread
+            preview: Ask for a preview of the image so far with each report
+
+        Returns:
+            A watcher polling the client's first server
+        """
+        from ..core.progress import ProgressWatcher
+
+        return ProgressWatcher(self._generator, on_progress=on_progress, preview=preview)
+
+    def _generate(
+        self,
+        payload: Dict[str, Any],
+        output_dir: Optional[str],
+        timeout: Optional[float],
+        progress: Optional["ProgressWatcher"] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None
+    ) -> List[str]:
+        """Send a payload, watching its progress, and save its images."""
+        model = payload["model"]
+        output_dir = output_dir or settings.OUTPUT_DIR
+        if progress is not None and progress.cancelled:
+            raise GenerationCancelledError("Generation cancelled before it started")
+        try:
+            if progress is not None:
+                progress.start()
+            if self.stream:
+                paths = self._generator.generate_images_to_files(
+                    payload, model_name=model, output_dir=output_dir, timeout=timeout,
+                    body=body, priority=priority, metadata=metadata or payload
+                )
+            else:
+                images = self._generator.generate_from_payload(
+                    payload, timeout=timeout, body=body, priority=priority
+                )
+        except ImageGenerationError as e:
+            if progress is not None and progress.cancelled:
+                raise GenerationCancelledError("Generation cancelled") from e
+            raise
+        finally:
+            if progress is not None:
+                progress.stop()
+        if progress is not None and progress.cancelled:
+            # Whatever the server returned is unfinished
+            if self.stream:
+                for path in paths:
+                    Path(path).unlink(missing_ok=True)
+            raise GenerationCancelledError("Generation cancelled")
+        if self.stream:
+            return paths
+        return self._generator.save_images(
+            images=images,
+            model_name=model,
+            output_dir=output_dir,
+            metadata=[metadata or payload] * len(images)
+        )
+
+    def generate_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        output_dir: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        priority: Optional[str] = None
+    ) -> List[List[str]]:
+        """Generate and save images for several requests in few round trips.
+
+        Requests that differ only in their seed are sent to the server as a
+        single batched call; see ``ImageGenerator.generate_batch``.
+
+        Args:
+            requests: Keyword-argument dicts for ``generate_image``, without
+                ``output_dir``
+            output_dir: Directory to save the images
+            max_batch_size: Largest ``batch_size`` to ask the server for
+            priority: Admission priority class of every call
+
+        Returns:
+            List of paths to saved images for each request, in request order
+
+        Raises:
+            ImageGenerationError: If image generation fails
+        """
+        payloads = [self._generator.build_payload(**request) for request in requests]
+        results = self._generator.generate_batch(
+            payloads, max_batch_size=max_batch_size, priority=priority
+        )
+        output_dir = output_dir or settings.OUTPUT_DIR
+        return [
+            self._generator.save_images(
+                images=images,
+                model_name=payload["model"],
+                output_dir=output_dir,
+                metadata=[payload] * len(images)
+            )
+            for payload, images in zip(payloads, results)
+        ]
+
+    def seed_sweep(
+        self,
+        prompt: str,
+        seeds: Sequence[int],
+        output_dir: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        priority: Optional[str] = None,
+        **params: Any
+    ) -> List[str]:
+        """Generate variations of one prompt over fixed seeds.
+
+        The payload is built once and only its seed varies; consecutive
+        seeds are packed into as few server calls as ``max_batch_size``
+        allows. Images are named ``<model>_<variant>_seed<seed>.png``, where
+        ``variant`` hashes every other request field, so rerunning a sweep
+        rewrites the same files and different sweeps never collide.
+
+        Args:
+            prompt: Text prompt for image generation
+            seeds: Fixed, non-negative seeds, e.g. ``range(100, 116)``
+            output_dir: Directory to save the images
+            max_batch_size: Largest ``batch_size`` to ask the server for
+            priority: Admission priority class of every call
+            **params: Further ``generate_image`` arguments shared by every
+                variation, such as model, width or steps
 
-        # Save images
+        Returns:
+            Path of the saved image for each seed, in the order of seeds
+
+        Raises:
+            ValueError: If a seed is negative
+            ImageGenerationError: If image generation fails
+        """
+        template = self._generator.build_payload(prompt=prompt, **params)
+        images = self._generator.generate_seed_sweep(template, seeds, max_batch_size, priority)
+        variant = payload_key(dict(template, seed=None))[:12]
+        model = template.get("model")
+        prefix = f"{model}_" if model else ""
         return self._generator.save_images(
             images=images,
             model_name=model,
-            output_dir=output_dir
+            output_dir=output_dir or settings.OUTPUT_DIR,
+            names=[f"{prefix}{variant}_seed{seed}.png" for seed in seeds],
+            metadata=[dict(template, seed=seed) for seed in seeds]
         )
 
+    def generate_pipelined(
+        self,
+        requests: Iterable[Dict[str, Any]],
+        output_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        manifest: Optional["ResultManifest"] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate and save images for many requests, overlapping the stages.
+
+        Requests, image decoding and disk writes run as separate pipeline
+        stages, so the next request is in flight while earlier images are
+        still being saved; see ``GenerationPipeline``.
+
+        Args:
+            requests: Keyword-argument dicts for ``generate_image``, without
+                ``output_dir``; consumed lazily
+            output_dir: Directory to save the images
+            workers: Requests in flight at once
+            queue_size: Capacity of each queue between stages
+            manifest: Index of finished requests; those it holds are not run
+                again, and every request saved is added to it
+
+        Yields:
+            One result record per request as it finishes, with the request's
+            ``index``, ``status``, ``paths``, ``seconds`` and, on failure,
+            ``error``; requests found in the manifest have ``resumed: True``
+        """
+        from ..core.pipeline import GenerationPipeline
+
+        pipeline = GenerationPipeline(
+            self._generator, request_workers=workers, queue_size=queue_size,
+            manifest=manifest
+        )
+        return pipeline.run(requests, output_dir=output_dir or settings.OUTPUT_DIR)
+
+    def build_payload(self, **request: Any) -> Dict[str, Any]:
+        """Return the request payload ``generate_image`` would send.
+
+        Args:
+            **request: ``generate_image`` arguments, without ``output_dir``
+
+        Returns:
+            JSON-serializable request payload
+        """
+        return self._generator.build_payload(**request)
+
     def get_available_models(self) -> List[str]:
         """Get list of available models.
 
@@ -12,6 +12,65 @@ class Settings:
         """Initialize settings with default values."""
         # API settings
         self.API_URL = "http://localhost:7860/api/v1/txt2img"
+        # Several servers to balance across; overrides API_URL when set
+        self.API_URLS: List[str] = []
+        self.BACKEND_POLICY = "least_outstanding"
+        self.BACKEND_FAILURE_THRESHOLD = 3
+        self.BACKEND_EJECTION_TIME = 30.0
+        # Requests in flight per server (None: no limit)
+        self.BACKEND_MAX_IN_FLIGHT: Optional[int] = None
+
+        # Connection pool settings
+        self.POOL_SIZE = 4
+        self.POOL_IDLE_TIMEOUT = 30.0
+
+        # Socket timeout in seconds for each connect or read
+        self.REQUEST_TIMEOUT = 600.0
+        # Seconds a whole request may take, retries included (None: no limit)
+        self.REQUEST_DEADLINE: Optional[float] = None
+
+        # Retries of fixed-seed requests: total attempts and backoff seconds
+        self.RETRY_MAX_ATTEMPTS = 3
+        self.RETRY_BACKOFF = 0.5
+        self.RETRY_MAX_BACKOFF = 10.0
+
+        # Maximum requests in flight for the async client
+        self.MAX_CONCURRENCY = 4
+
+        # Worker daemon: jobs in flight and seconds between polls of an empty queue
+        self.WORKER_CONCURRENCY = 4
+        self.WORKER_POLL_INTERVAL = 1.0
+
+        # Capacity of each queue between GenerationPipeline stages
+        self.PIPELINE_QUEUE_SIZE = 8
+
+        # Request batching settings
+        self.MAX_BATCH_SIZE = 4
+        self.BATCH_WINDOW_MS = 20.0
+
+        # Model-affinity scheduler fairness bounds
+        self.SCHEDULER_MAX_GROUP_RUN = 16
+        self.SCHEDULER_MAX_WAIT = 60.0
+
+        # Admission control: requests waiting per priority class before more
+        # are rejected, batch requests per second (None: no limit), and
+        # in-flight slots batch work leaves free for interactive requests
+        self.ADMISSION_MAX_QUEUE = 32
+        self.ADMISSION_BATCH_RATE: Optional[float] = None
+        self.ADMISSION_BATCH_HEADROOM = 1
+
+        # JSON library for request and response bodies: "auto" (msgspec, then
+        # orjson, then the standard library), "msgspec", "orjson" or "json"
+        self.JSON_CODEC = "auto"
+
+        # Seconds the model list from /sd-models is cached
+        self.MODEL_CATALOG_TTL = 60.0
+        # Least seconds between refreshes forced by unknown model names
+        self.MODEL_CATALOG_RECHECK_INTERVAL = 5.0
+
+        # Bounds in seconds on how often progress of a generation is polled
+        self.PROGRESS_MIN_INTERVAL = 0.25
+        self.PROGRESS_MAX_INTERVAL = 2.0
 
         # Default generation parameters
         self.DEFAULT_MODEL = "icatcher_realistic_f16.ckpt"
@@ -27,5 +86,20 @@ class Settings:
 
         # Output settings
         self.OUTPUT_DIR: Optional[str] = None
+        # "sequence" (model_image_<timestamp>_<n>.png) or "hash" (content digest)
+        self.OUTPUT_NAMING = "sequence"
+        # Flush images to stable storage before reporting them saved
+        self.OUTPUT_FSYNC = False
+        # Threads decoding and writing images
+        self.OUTPUT_WORKERS = 4
+        # Processes rendering thumbnails and format variants (None: one per CPU)
+        self.POSTPROCESS_WORKERS: Optional[int] = None
+        # Total size of base64-encoded img2img source images kept in memory
+        self.SOURCE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+        # Result cache settings
+        self.CACHE_DIR = str(Path.home() / ".cache" / "draw_things")
+        self.CACHE_MAX_ENTRIES = 1000
+        self.CACHE_MAX_BYTES: Optional[int] = None
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,348 @@
+"""
+Priority-aware admission control for shared servers.
+
+Interactive users and bulk batch jobs often share the same servers. Without
+admission control a large batch fills every slot, and an interactive
+request waits behind it. ``AdmissionController`` sits in front of the
+generator. It queues each request in a priority class and decides when
+the request may be sent.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional, Sequence
+
+from ..config.settings import settings
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class TokenBucket:
+    """Rate limiter allowing ``rate`` requests per second on average.
+
+    Up to ``burst`` requests may be sent at once after a quiet spell.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Capacity of the bucket (defaults to one second's worth,
+                and at least one token)
+
+        Raises:
+            ValueError: If rate or burst is not positive
+        """
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.burst = max(1.0, rate) if burst is None else burst
+        if self.burst < 1:
+            raise ValueError("Token bucket burst must be at least 1")
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Take a token if one is available.
+
+        Not thread-safe; callers hold their own lock.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PriorityClass:
+    """A class of traffic with its own queue, rate limit and share of slots.
+
+    Attributes:
+        name: Name callers pass as ``priority``
+        priority: Lower numbers are admitted first
+        bucket: Rate limit, or None for no limit
+        max_queue: Requests that may wait before new ones are rejected
+        headroom: In-flight slots this class leaves free for classes with
+            higher priority
+    """
+
+    def __init__(
+        self,
+        name: str,
+        priority: int,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        headroom: int = 0
+    ):
+        """Initialize the class.
+
+        Args:
+            name: Name callers pass as ``priority``
+            priority: Lower numbers are admitted first
+            rate: Requests admitted per second on average (None: no limit)
+            burst: Requests that may be admitted at once after a quiet spell
+            max_queue: Requests that may wait before new ones are rejected
+                (defaults to ``settings.ADMISSION_MAX_QUEUE``)
+            headroom: In-flight slots this class leaves free for classes with
+                higher priority
+        """
+        self.name = name
+        self.priority = priority
+        self.bucket = None if rate is None else TokenBucket(rate, burst)
+        self.max_queue = settings.ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.headroom = headroom
+
+    def __repr__(self) -> str:
+        rate = self.bucket.rate if self.bucket else None
+        return (
+            f"PriorityClass({self.name!r}, priority={self.priority}, rate={rate}, "
+            f"max_queue={self.max_queue}, headroom={self.headroom})"
+        )
+
+
+def default_classes() -> List[PriorityClass]:
+    """Return the ``interactive`` and ``batch`` classes configured in settings."""
+    return [
+        PriorityClass(INTERACTIVE, 0),
+        PriorityClass(
+            BATCH, 1,
+            rate=settings.ADMISSION_BATCH_RATE,
+            headroom=settings.ADMISSION_BATCH_HEADROOM
+        ),
+    ]
+
+
+class _Ticket:
+    """A request waiting in a class queue."""
+
+    def __init__(self, priority_class: PriorityClass, capacity: Optional[int] = None):
+        self.priority_class = priority_class
+        self.capacity = capacity
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class _ClassState:
+    """Queue and counters of one priority class."""
+
+    def __init__(self):
+        self.queue: Deque[_Ticket] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waits: Deque[float] = deque(maxlen=1024)  # recent queueing seconds
+
+
+class AdmissionController:
+    """Decides when each request may be sent, by priority class.
+
+    Each request waits in the queue of its class. When an in-flight slot is
+    free, the waiting class with the highest priority goes first.
+    Requests within a class go in arrival order.
+
+    Three limits shape the traffic:
+
+    - ``max_in_flight``: requests in flight across all classes
+    - a class's ``headroom``: slots the class leaves free for classes with
+      higher priority. With the defaults, batch work uses all but one slot,
+      so an interactive request waits for at most one batch render.
+    - a class's token bucket: the rate at which it is admitted
+
+    A class that is rate limited or out of slots does not block lower
+    classes, so batch work uses whatever capacity the other classes leave.
+    When a request would have to wait and its class already has
+    ``max_queue`` requests waiting, it is rejected at once with
+    ``AdmissionRejectedError``. Callers see the
+    backpressure straight away instead of queueing without limit.
+
+    Pass the controller to ``ImageGenerator`` or ``DrawThingsClient`` as
+    ``admission``, and choose a class per call with ``priority``.
+    """
+
+    def __init__(
+        self,
+        classes: Optional[Sequence[PriorityClass]] = None,
+        max_in_flight: Optional[int] = None,
+        default: Optional[str] = None
+    ):
+        """Initialize the controller.
+
+        Args:
+            classes: Priority classes (defaults to ``default_classes()``)
+            max_in_flight: Requests in flight across all classes. None
+                leaves the limit to each request's ``capacity``; an
+                ``ImageGenerator`` passes its backends' total capacity, or
+                one request per server when they have no limit. Requests
+                with no limit at all are admitted at once, so priorities
+                and headroom have nothing to order
+            default: Class of requests that name none (defaults to the
+                class with the highest priority)
+
+        Raises:
+            ValueError: If class names repeat or the default is unknown
+        """
+        classes = list(classes or default_classes())
+        if len({c.name for c in classes}) != len(classes):
+            raise ValueError("Priority class names must be unique")
+        self.classes = sorted(classes, key=lambda c: c.priority)
+        self.max_in_flight = max_in_flight
+        self.default = default or self.classes[0].name
+        self._by_name = {c.name: c for c in self.classes}
+        if self.default not in self._by_name:
+            raise ValueError(f"Unknown priority class: {self.default}")
+        self._state = {c.name: _ClassState() for c in self.classes}
+        self._in_flight = 0
+        self._wake_at: Optional[float] = None  # when a bucket next has a token
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(
+        self,
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None,
+        capacity: Optional[int] = None
+    ) -> Iterator[None]:
+        """Wait for admission, then hold an in-flight slot until exit.
+
+        Args:
+            priority: Name of the request's class (defaults to ``default``)
+            timeout: Longest seconds to wait for admission
+            capacity: In-flight limit for this request when the controller
+                has no ``max_in_flight``, e.g. the capacity of the servers
+                it goes to
+
+        Raises:
+            ValueError: If the class is unknown
+            AdmissionRejectedError: If the request would have to wait and
+                the class's queue is full, or the request is not admitted
+                within ``timeout``
+        """
+        self._acquire(priority, timeout, capacity)
+        try:
+            yield
+        finally:
+            self._release(priority or self.default)
+
+    def _acquire(
+        self,
+        priority: Optional[str],
+        timeout: Optional[float],
+        capacity: Optional[int]
+    ):
+        from .image_generator import AdmissionRejectedError
+
+        name = priority or self.default
+        priority_class = self._by_name.get(name)
+        if priority_class is None:
+            raise ValueError(f"Unknown priority class: {name}")
+        state = self._state[name]
+        ticket = _Ticket(priority_class, capacity)
+        expires = None if timeout is None else ticket.enqueued + timeout
+        with self._condition:
+            state.queue.append(ticket)
+            self._grant()
+            # Only a request that has to wait counts against the queue bound
+            if not ticket.granted and len(state.queue) > priority_class.max_queue:
+                state.queue.remove(ticket)
+                state.rejected += 1
+                raise AdmissionRejectedError(
+                    f"{len(state.queue)} {name} requests already waiting; try again later"
+                )
+            while not ticket.granted:
+                wait = None if self._wake_at is None else max(0.0, self._wake_at - time.monotonic())
+                if expires is not None:
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        state.queue.remove(ticket)
+                        state.rejected += 1
+                        self._grant()  # a lower class may fit where this one did not
+                        raise AdmissionRejectedError(
+                            f"{name} request not admitted within {timeout}s"
+                        )
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+                if not ticket.granted:
+                    self._grant()
+            state.waits.append(time.monotonic() - ticket.enqueued)
+
+    def _release(self, name: str):
+        with self._condition:
+            self._in_flight -= 1
+            self._state[name].in_flight -= 1
+            self._grant()
+
+    def _limit(self, ticket: _Ticket) -> Optional[int]:
+        limit = ticket.capacity if self.max_in_flight is None else self.max_in_flight
+        if limit is None:
+            return None
+        # Every class may have at least one request in flight
+        return max(1, limit - ticket.priority_class.headroom)
+
+    def _grant(self):
+        """Admit waiting requests in priority order while slots allow.
+
+        Called with the condition held whenever a request arrives or leaves,
+        or a waiter wakes for a bucket refill.
+        """
+        now = time.monotonic()
+        wake_at: Optional[float] = None
+        granted = False
+        for priority_class in self.classes:
+            state = self._state[priority_class.name]
+            while state.queue:
+                limit = self._limit(state.queue[0])
+                if limit is not None and self._in_flight >= limit:
+                    break
+                if priority_class.bucket is not None:
+                    refill = priority_class.bucket.take(now)
+                    if refill:
+                        wake_at = now + refill if wake_at is None else min(wake_at, now + refill)
+                        break
+                ticket = state.queue.popleft()
+                ticket.granted = granted = True
+                self._in_flight += 1
+                state.in_flight += 1
+                state.admitted += 1
+        # Waiters sleep until the next refill; wake them if it moved earlier
+        earlier = wake_at is not None and (
+            self._wake_at is None or wake_at < self._wake_at - 1e-6
+        )
+        self._wake_at = wake_at
+        if granted or earlier:
+            self._condition.notify_all()
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Return counters per class.
+
+        Each class reports requests ``admitted``, ``rejected``, ``pending``
+        and ``in_flight``, and ``wait_p99``: the 99th percentile of
+        recent queueing time, in seconds.
+        """
+        with self._condition:
+            report: Dict[str, Dict[str, float]] = {}
+            for priority_class in self.classes:
+                state = self._state[priority_class.name]
+                waits = sorted(state.waits)
+                p99 = waits[max(0, -(-len(waits) * 99 // 100) - 1)] if waits else 0.0
+                report[priority_class.name] = {
+                    "admitted": state.admitted,
+                    "rejected": state.rejected,
+                    "pending": len(state.queue),
+                    "in_flight": state.in_flight,
+                    "wait_p99": round(p99, 6),
+                }
+            return report
+
+    def __repr__(self) -> str:
+        names = [c.name for c in self.classes]
+        return f"AdmissionController({names!r}, max_in_flight={self.max_in_flight})"
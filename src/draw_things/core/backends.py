@@ -0,0 +1,243 @@
+"""
+Load balancing across several Draw Things servers.
+"""
+
+import threading
+import time
+import urllib.error
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+
+from ..config.settings import settings
+
+POLICIES = ("least_outstanding", "latency")
+
+
+class NoHealthyBackendError(Exception):
+    """Raised when every backend's circuit is open."""
+    pass
+
+
+class BackendBusyError(Exception):
+    """Raised when no backend frees up a slot within the timeout."""
+    pass
+
+
+class Backend:
+    """A single Draw Things server and its live routing statistics."""
+
+    def __init__(self, url: str):
+        """Initialize the backend.
+
+        Args:
+            url: txt2img endpoint URL of the server
+        """
+        self.url = url
+        self.outstanding = 0
+        self.latency: Optional[float] = None  # EWMA of request seconds
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.probing = False  # a half-open trial request is in flight
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        """Return whether the backend is currently eligible for traffic."""
+        now = time.monotonic() if now is None else now
+        return now >= self.ejected_until and not self.probing
+
+    def __repr__(self) -> str:
+        return (
+            f"Backend({self.url!r}, outstanding={self.outstanding}, "
+            f"latency={self.latency}, failures={self.failures})"
+        )
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Return whether an error says the server itself is unhealthy.
+
+    Connection failures and 5xx responses count; client errors such as a 4xx
+    for a bad payload do not.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    return isinstance(error, (urllib.error.URLError, OSError))
+
+
+class BackendPool:
+    """Routes requests across backends with passive health checking.
+
+    Two routing policies are supported:
+
+    - ``least_outstanding``: pick the backend with the fewest requests in
+      flight.
+    - ``latency``: pick the backend with the lowest expected completion time,
+      its latency EWMA scaled by the requests already queued on it. Backends
+      with no measurement yet are tried first.
+
+    Each backend has a circuit breaker. After ``failure_threshold``
+    consecutive failures its circuit opens and it is ejected for
+    ``ejection_time`` seconds. Once that expires the circuit is half-open: a
+    single trial request is let through, closing the circuit if it succeeds
+    and ejecting the backend anew if it fails. While every circuit is open,
+    requests fail fast with ``NoHealthyBackendError`` instead of waiting on a
+    server that is down.
+
+    With ``max_in_flight`` set, no backend is sent more than that many
+    requests at once. Requests made while every healthy backend is at its
+    limit wait for one to finish, for at most the timeout given to
+    ``acquire``.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        policy: Optional[str] = None,
+        failure_threshold: Optional[int] = None,
+        ejection_time: Optional[float] = None,
+        latency_decay: float = 0.3,
+        max_in_flight: Optional[int] = None
+    ):
+        """Initialize the backend pool.
+
+        Args:
+            urls: txt2img endpoint URLs, one per server
+            policy: Routing policy, ``least_outstanding`` or ``latency``
+            failure_threshold: Consecutive failures before a backend is ejected
+            ejection_time: Seconds an ejected backend receives no traffic
+            latency_decay: Weight of the newest sample in the latency EWMA
+            max_in_flight: Requests in flight per backend (defaults to
+                ``settings.BACKEND_MAX_IN_FLIGHT``; None means no limit)
+
+        Raises:
+            ValueError: If no URLs are given, the policy is unknown or
+                max_in_flight is below 1
+        """
+        if not urls:
+            raise ValueError("At least one backend URL is required")
+        self.policy = policy or settings.BACKEND_POLICY
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown backend policy: {self.policy}")
+        self.failure_threshold = failure_threshold or settings.BACKEND_FAILURE_THRESHOLD
+        self.ejection_time = (
+            settings.BACKEND_EJECTION_TIME if ejection_time is None else ejection_time
+        )
+        self.latency_decay = latency_decay
+        self.max_in_flight = (
+            settings.BACKEND_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        )
+        if self.max_in_flight is not None and self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.backends = [Backend(url) for url in urls]
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._next = 0  # rotates tie-breaking between equal backends
+
+    def _cost(self, backend: Backend) -> float:
+        if self.policy == "latency":
+            return (backend.outstanding + 1) * (backend.latency or 0.0)
+        return backend.outstanding
+
+    @property
+    def capacity(self) -> Optional[int]:
+        """Requests all backends together may have in flight, or None."""
+        if self.max_in_flight is None:
+            return None
+        return self.max_in_flight * len(self.backends)
+
+    def select(self) -> Optional[Backend]:
+        """Pick the backend for the next request.
+
+        Returns:
+            The backend, or None if every healthy backend is at
+            ``max_in_flight``
+
+        Raises:
+            NoHealthyBackendError: If every backend is ejected
+        """
+        with self._lock:
+            return self._choose()
+
+    def _choose(self) -> Optional[Backend]:
+        now = time.monotonic()
+        count = len(self.backends)
+        ordered = [self.backends[(self._next + i) % count] for i in range(count)]
+        self._next = (self._next + 1) % count
+        healthy = [backend for backend in ordered if backend.is_healthy(now)]
+        if not healthy:
+            wait = max(0.0, min(backend.ejected_until for backend in ordered) - now)
+            raise NoHealthyBackendError(
+                f"All {count} backends are unavailable; retrying in {wait:.1f}s"
+            )
+        if self.max_in_flight is not None:
+            healthy = [b for b in healthy if b.outstanding < self.max_in_flight]
+            if not healthy:
+                return None
+        return min(healthy, key=self._cost)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Backend]:
+        """Select a backend and track the request made against it.
+
+        The request's duration feeds the latency estimate; errors that
+        indicate an unhealthy server count towards ejection. While every
+        healthy backend is at ``max_in_flight``, waits for a request to
+        finish.
+
+        Args:
+            timeout: Longest seconds to wait for a backend (None: no limit)
+
+        Raises:
+            NoHealthyBackendError: If every backend is ejected
+            BackendBusyError: If every healthy backend is still at
+                ``max_in_flight`` after ``timeout``
+        """
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            backend = self._choose()
+            while backend is None:
+                remaining = None if expires is None else expires - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise BackendBusyError(
+                        f"No backend had a free slot within {timeout:.2f}s"
+                    )
+                self._released.wait(remaining)
+                backend = self._choose()
+            # A backend coming back from ejection takes one trial request
+            backend.probing = backend.consecutive_failures >= self.failure_threshold
+            backend.outstanding += 1
+            backend.requests += 1
+        start = time.monotonic()
+        try:
+            yield backend
+        except BaseException as e:
+            with self._lock:
+                backend.outstanding -= 1
+                backend.probing = False
+                self._released.notify()
+                if is_backend_failure(e):
+                    self._record_failure(backend)
+            raise
+        else:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                backend.outstanding -= 1
+                backend.probing = False
+                self._released.notify()
+                backend.consecutive_failures = 0
+                if backend.latency is None:
+                    backend.latency = elapsed
+                else:
+                    backend.latency += self.latency_decay * (elapsed - backend.latency)
+
+    def _record_failure(self, backend: Backend):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.ejected_until = time.monotonic() + self.ejection_time
+
+    def healthy(self) -> List[Backend]:
+        """Return the backends currently eligible for traffic."""
+        now = time.monotonic()
+        with self._lock:
+            return [backend for backend in self.backends if backend.is_healthy(now)]
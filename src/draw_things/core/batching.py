@@ -0,0 +1,278 @@
+"""
+Packing several generation requests into batched server calls.
+
+The server can render several images per request: ``batch_size`` images are
+generated together and ``n_iter`` such batches run back to back. Images come
+back in order with consecutive seeds, starting from the request's seed. Any
+requests that differ only in their seed can therefore share one call, as long
+as they either all use a random seed or their fixed seeds form a consecutive
+run.
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config.settings import settings
+
+_BATCH_FIELDS = ("seed", "batch_size", "n_iter")
+
+Pack = Tuple[Dict[str, Any], List[int]]
+
+
+def _group_key(payload: Dict[str, Any]) -> str:
+    # Cheap canonical form of everything except the batch fields
+    return repr(sorted(
+        (key, repr(value)) for key, value in payload.items() if key not in _BATCH_FIELDS
+    ))
+
+
+def _split(count: int, max_batch_size: int) -> List[int]:
+    """Split count images into as few exact batch_size x n_iter calls as possible."""
+    if count <= max_batch_size:
+        return [count]
+    full = count - count % max_batch_size
+    return [full] + ([count - full] if count > full else [])
+
+
+def _chunks(run: List[int], max_batch_size: int) -> Iterator[List[int]]:
+    """Split a run of consecutive images into the chunks ``_split`` sizes."""
+    start = 0
+    for count in _split(len(run), max_batch_size):
+        yield run[start:start + count]
+        start += count
+
+
+def _batched(payload: Dict[str, Any], count: int, max_batch_size: int, **overrides: Any) -> Dict[str, Any]:
+    """Copy payload, asking for count images in as few batches as allowed."""
+    batched = dict(payload, **overrides)
+    batched["batch_size"] = min(count, max_batch_size)
+    batched["n_iter"] = count // batched["batch_size"]
+    return batched
+
+
+def pack_payloads(
+    payloads: List[Dict[str, Any]],
+    max_batch_size: Optional[int] = None
+) -> List[Pack]:
+    """Pack single-image payloads into as few server calls as possible.
+
+    Args:
+        payloads: Request payloads, as returned by ``build_payload``
+        max_batch_size: Largest ``batch_size`` to ask the server for
+
+    Returns:
+        (payload, indices) pairs: each payload to send, and the indices of
+        the input payloads whose images it returns, in image order
+    """
+    max_batch_size = max_batch_size or settings.MAX_BATCH_SIZE
+    groups: Dict[str, List[int]] = {}
+    packs: List[Pack] = []
+    for index, payload in enumerate(payloads):
+        if payload.get("batch_size", 1) != 1 or payload.get("n_iter", 1) != 1:
+            # Already a batch of its own; send as is
+            packs.append((payload, [index]))
+            continue
+        groups.setdefault(_group_key(payload), []).append(index)
+
+    for indices in groups.values():
+        random_seed = [i for i in indices if payloads[i].get("seed", -1) < 0]
+        fixed_seed = sorted(
+            (i for i in indices if payloads[i].get("seed", -1) >= 0),
+            key=lambda i: payloads[i]["seed"]
+        )
+
+        runs: List[List[int]] = []
+        if random_seed:
+            runs.append(random_seed)
+        for i in fixed_seed:
+            if runs and runs[-1] is not random_seed:
+                previous = payloads[runs[-1][-1]]["seed"]
+                if payloads[i]["seed"] == previous + 1:
+                    runs[-1].append(i)
+                    continue
+            runs.append([i])
+
+        for run in runs:
+            for chunk in _chunks(run, max_batch_size):
+                packs.append((_batched(payloads[chunk[0]], len(chunk), max_batch_size), chunk))
+    return packs
+
+
+def pack_seeds(
+    template: Dict[str, Any],
+    seeds: Sequence[int],
+    max_batch_size: Optional[int] = None
+) -> List[Pack]:
+    """Pack variations of one payload that differ only in their seed.
+
+    Equivalent to ``pack_payloads`` on one copy of template per seed, but
+    the template is copied once per server call instead of once per seed,
+    and nothing is compared.
+
+    Args:
+        template: Request payload, as returned by ``build_payload``
+        seeds: Fixed seeds to generate
+        max_batch_size: Largest ``batch_size`` to ask the server for
+
+    Returns:
+        (payload, indices) pairs: each payload to send, and the indices into
+        seeds of the images it returns, in image order
+    """
+    max_batch_size = max_batch_size or settings.MAX_BATCH_SIZE
+    runs: List[List[int]] = []
+    for i in sorted(range(len(seeds)), key=seeds.__getitem__):
+        if runs and seeds[i] == seeds[runs[-1][-1]] + 1:
+            runs[-1].append(i)
+        else:
+            runs.append([i])
+    return [
+        (_batched(template, len(chunk), max_batch_size, seed=seeds[chunk[0]]), chunk)
+        for run in runs
+        for chunk in _chunks(run, max_batch_size)
+    ]
+
+
+def unpack_images(
+    packs: List[Pack],
+    results: List[List[str]],
+    count: int
+) -> List[List[str]]:
+    """Split the images returned for each pack back out per request.
+
+    Args:
+        packs: Packs as returned by ``pack_payloads``
+        results: Images returned for each pack
+        count: Number of original payloads
+
+    Returns:
+        Images for each original payload, in payload order
+
+    Raises:
+        ValueError: If a call returned fewer images than it was asked for
+    """
+    images: List[List[str]] = [[] for _ in range(count)]
+    for (payload, indices), returned in zip(packs, results):
+        if len(indices) == 1 and payload.get("batch_size", 1) * payload.get("n_iter", 1) != 1:
+            images[indices[0]] = returned
+            continue
+        if len(returned) < len(indices):
+            raise ValueError(
+                f"Expected {len(indices)} images in batched response, got {len(returned)}"
+            )
+        for index, image in zip(indices, returned):
+            images[index] = [image]
+    return images
+
+
+class MicroBatcher:
+    """Groups requests arriving close together into batched server calls.
+
+    The first request to arrive opens a window; everything submitted before
+    it closes (or until ``max_batch_size`` requests are waiting) is packed
+    with ``pack_payloads`` and sent together.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[Dict[str, Any]], int], List[List[str]]],
+        window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ):
+        """Initialize the micro-batcher.
+
+        Args:
+            send_batch: Called with payloads that pack into one call and the
+                maximum batch size; returns each payload's images, as
+                ``ImageGenerator.generate_batch`` does
+            window_ms: How long to wait for more requests after the first
+            max_batch_size: Largest ``batch_size`` to ask the server for
+            max_workers: Maximum batched calls in flight at once
+        """
+        self._send_batch = send_batch
+        self.window = (
+            settings.BATCH_WINDOW_MS if window_ms is None else window_ms
+        ) / 1000.0
+        self.max_batch_size = max_batch_size or settings.MAX_BATCH_SIZE
+        self.batches_sent = 0
+        self.requests_batched = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.MAX_CONCURRENCY,
+            thread_name_prefix="draw-things-batch"
+        )
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Dict[str, Any]) -> "Future[List[str]]":
+        """Queue a single-image payload.
+
+        Returns:
+            Future resolving to the request's images
+
+        Raises:
+            RuntimeError: If the batcher has been closed
+        """
+        future: "Future[List[str]]" = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._pending.append((payload, future))
+            self._condition.notify()
+        return future
+
+    def close(self):
+        """Flush pending requests and stop accepting new ones."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, []
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Dict[str, Any], Future]]):
+        payloads = [payload for payload, _ in batch]
+        futures = [future for _, future in batch]
+        for packed, indices in pack_payloads(payloads, self.max_batch_size):
+            self.batches_sent += 1
+            self.requests_batched += len(indices)
+            self._executor.submit(
+                self._complete,
+                [payloads[i] for i in indices],
+                [futures[i] for i in indices]
+            )
+
+    def _complete(self, payloads: List[Dict[str, Any]], futures: List[Future]):
+        try:
+            results = self._send_batch(payloads, self.max_batch_size)
+        except BaseException as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            future.set_result(result)
@@ -0,0 +1,182 @@
+"""
+Content-addressed on-disk cache of generation results.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config.settings import settings
+
+
+def payload_key(payload: Dict[str, Any]) -> str:
+    """Return a canonical hash of a request payload.
+
+    Key order and whitespace don't affect the result, so two payloads that
+    ask the server for the same thing always share a key.
+    """
+    canonical = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(payload: Dict[str, Any]) -> bool:
+    """Return whether a payload always produces the same images.
+
+    Only a fixed, non-negative seed makes the output reproducible; ``-1``
+    asks the server for a random one.
+    """
+    seed = payload.get("seed")
+    return isinstance(seed, int) and seed >= 0
+
+
+class ResultCache:
+    """LRU cache of generated images, keyed by the full request payload.
+
+    Each entry is a JSON file named after ``payload_key`` holding the list of
+    base64 images the server returned. Payloads with a random seed are never
+    cached. Recency survives restarts through file modification times.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            directory: Directory holding cache entries
+            max_entries: Maximum number of cached results
+            max_bytes: Maximum total size of cached results on disk
+        """
+        self.directory = Path(directory or settings.CACHE_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        existing = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            existing.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, payload: Dict[str, Any]) -> Optional[List[str]]:
+        """Look up the images for a payload.
+
+        Returns:
+            Cached base64 images, or None on a miss or for random seeds
+        """
+        if not is_deterministic(payload):
+            with self._lock:
+                self.bypassed += 1
+            return None
+        key = payload_key(payload)
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                images = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Removed or corrupted behind our back; treat as a miss
+            with self._lock:
+                self._discard(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return images
+
+    def put(self, payload: Dict[str, Any], images: List[str]):
+        """Store the images generated for a payload.
+
+        Payloads with a random seed are ignored.
+        """
+        if not is_deterministic(payload):
+            return
+        key = payload_key(payload)
+        data = json.dumps(images).encode("utf-8")
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._discard(key, delete=False)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def clear(self):
+        """Remove every cached result."""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss, bypass and eviction counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, payload: Dict[str, Any]) -> bool:
+        with self._lock:
+            return payload_key(payload) in self._entries
+
+    def _discard(self, key: str, delete: bool = True):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        if delete:
+            self._path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._total_bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._discard(key)
+            self.evictions += 1
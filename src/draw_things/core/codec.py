@@ -0,0 +1,137 @@
+"""
+JSON codecs for request and response bodies.
+
+Responses carry base64 images several megabytes long, so parsing them is a
+large share of the client's CPU time. ``get_codec`` picks the fastest JSON
+library available: msgspec, then orjson, then the standard library
+(``pip install 'draw-things[fast-json]'`` installs orjson).
+"""
+
+import importlib.util
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from ..config.settings import settings
+
+# Codec names in order of preference for "auto"
+CODECS = ("msgspec", "orjson", "json")
+
+
+class JSONCodec:
+    """Interface for JSON codecs.
+
+    Codecs are stateless and shared between threads.
+    """
+
+    name = ""
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize obj to UTF-8 JSON."""
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        """Parse UTF-8 JSON.
+
+        Raises:
+            json.JSONDecodeError: If data is not valid JSON
+        """
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class StdlibCodec(JSONCodec):
+    """Codec using the standard library ``json`` module."""
+
+    name = "json"
+
+    def __init__(self):
+        # json.dumps builds a new encoder per call when given options
+        self._encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encode(obj).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec using orjson."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        # orjson.JSONDecodeError is a json.JSONDecodeError
+        return self._orjson.loads(data)
+
+
+class MsgspecCodec(JSONCodec):
+    """Codec using msgspec."""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+        self._json = msgspec.json
+        self._error = msgspec.DecodeError
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._json.encode(obj)
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            return self._json.decode(data)
+        except self._error as e:
+            raise json.JSONDecodeError(str(e), "", 0) from e
+
+
+_CLASSES = {"orjson": OrjsonCodec, "msgspec": MsgspecCodec, "json": StdlibCodec}
+_instances: Dict[str, JSONCodec] = {}
+_lock = threading.Lock()
+
+
+def available_codecs():
+    """Return the names of the codecs that can be used here, fastest first."""
+    return [
+        name for name in CODECS
+        if name == "json" or importlib.util.find_spec(name) is not None
+    ]
+
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """Return a shared codec instance.
+
+    Args:
+        name: ``orjson``, ``msgspec``, ``json`` or ``auto`` for the fastest
+            installed one (defaults to ``settings.JSON_CODEC``)
+
+    Raises:
+        ValueError: If the name is unknown
+        ImportError: If the named library is not installed
+    """
+    name = name or settings.JSON_CODEC
+    if name == "auto":
+        name = available_codecs()[0]
+    if name not in _CLASSES:
+        raise ValueError(f"Unknown JSON codec: {name}")
+    with _lock:
+        codec = _instances.get(name)
+        if codec is None:
+            try:
+                codec = _instances[name] = _CLASSES[name]()
+            except ImportError:
+                package = "'draw-things[fast-json]'" if name == "orjson" else name
+                raise ImportError(
+                    f"The {name} JSON codec requires {name}: pip install {package}"
+                )
+        return codec
@@ -0,0 +1,261 @@
+"""
+Keep-alive HTTP connection pooling for the Draw Things API.
+"""
+
+import http.client
+import io
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from ..config.settings import settings
+
+# Errors that mean a reused keep-alive connection was closed by the server
+# before our request reached it; the request is safe to resend once.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+PoolKey = Tuple[str, str, int]
+
+
+class PooledResponse:
+    """HTTP response that hands its connection back to the pool when closed."""
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        key: PoolKey,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse
+    ):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        """Read from the response body.
+
+        Raises:
+            urllib.error.URLError: If the connection fails or times out
+        """
+        try:
+            return self._response.read(amt)
+        except (OSError, http.client.HTTPException) as e:
+            raise urllib.error.URLError(e)
+
+    def readinto(self, buffer) -> int:
+        """Read from the response body into a pre-allocated buffer.
+
+        Raises:
+            urllib.error.URLError: If the connection fails or times out
+        """
+        try:
+            return self._response.readinto(buffer)
+        except (OSError, http.client.HTTPException) as e:
+            raise urllib.error.URLError(e)
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Return a response header value."""
+        return self._response.getheader(name, default)
+
+    def close(self):
+        """Release the underlying connection.
+
+        The connection is returned to the pool only when the body was fully
+        consumed and the server agreed to keep it alive; otherwise it is closed.
+        """
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool._release(self._key, connection)
+        else:
+            self._response.close()
+            connection.close()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent HTTP connections, keyed by host."""
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        timeout: Optional[float] = None
+    ):
+        """Initialize the connection pool.
+
+        Args:
+            maxsize: Maximum number of idle connections kept per host
+            idle_timeout: Seconds an idle connection may sit in the pool
+                before it is discarded
+            timeout: Socket timeout in seconds for new connections
+        """
+        self.maxsize = maxsize or settings.POOL_SIZE
+        self.idle_timeout = (
+            settings.POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        )
+        self.timeout = timeout
+        self.connections_created = 0
+        self.connections_reused = 0
+        self._idle: Dict[PoolKey, Deque[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def urlopen(
+        self,
+        url: Union[str, urllib.request.Request],
+        timeout: Optional[float] = None
+    ) -> PooledResponse:
+        """Open a URL over a pooled connection.
+
+        Mirrors ``urllib.request.urlopen``: failed connections raise
+        ``urllib.error.URLError`` and error statuses raise
+        ``urllib.error.HTTPError``.
+
+        Args:
+            url: URL string (sent as GET) or a ``urllib.request.Request``
+            timeout: Socket timeout for this request, overriding the pool default
+
+        Returns:
+            Response object usable as a context manager
+
+        Raises:
+            urllib.error.URLError: If the connection fails
+            urllib.error.HTTPError: If the server returns an error status
+        """
+        if isinstance(url, urllib.request.Request):
+            full_url = url.full_url
+            method = url.get_method()
+            body = url.data
+            headers = dict(url.header_items())
+        else:
+            full_url, method, body, headers = url, "GET", None, {}
+
+        parts = urlsplit(full_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise urllib.error.URLError(f"unsupported URL: {full_url}")
+        key = (
+            parts.scheme,
+            parts.hostname,
+            parts.port or (443 if parts.scheme == "https" else 80),
+        )
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        timeout = self.timeout if timeout is None else timeout
+        connection, reused = self._acquire(key)
+        try:
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            try:
+                response = self._send(connection, method, path, body, headers)
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                connection.close()
+                connection, reused = self._new_connection(key), False
+                connection.timeout = timeout
+                response = self._send(connection, method, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise urllib.error.URLError(e)
+
+        pooled = PooledResponse(self, key, connection, response)
+        if response.status >= 400:
+            error_body = response.read()
+            pooled.close()
+            raise urllib.error.HTTPError(
+                full_url, response.status, response.reason,
+                response.headers, io.BytesIO(error_body)
+            )
+        return pooled
+
+    def close(self):
+        """Close all idle connections and stop pooling new ones."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection, _ in connections:
+                connection.close()
+
+    def idle_count(self) -> int:
+        """Return the number of idle connections currently pooled."""
+        with self._lock:
+            return sum(len(connections) for connections in self._idle.values())
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _send(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Dict[str, str]
+    ) -> http.client.HTTPResponse:
+        connection.request(method, path, body=body, headers=headers)
+        return connection.getresponse()
+
+    def _acquire(self, key: PoolKey) -> Tuple[http.client.HTTPConnection, bool]:
+        expired = []
+        connection = None
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            # Oldest connections sit on the left; drop the expired ones and
+            # reuse the most recently released connection.
+            while idle and now - idle[0][1] > self.idle_timeout:
+                expired.append(idle.popleft()[0])
+            if idle:
+                connection = idle.pop()[0]
+                self.connections_reused += 1
+        for stale in expired:
+            stale.close()
+        if connection is not None:
+            return connection, True
+        return self._new_connection(key), False
+
+    def _new_connection(self, key: PoolKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        connection_class = (
+            http.client.HTTPSConnection if scheme == "https"
+            else http.client.HTTPConnection
+        )
+        with self._lock:
+            self.connections_created += 1
+        return connection_class(host, port, timeout=self.timeout)
+
+    def _release(self, key: PoolKey, connection: http.client.HTTPConnection):
+        with self._lock:
+            if not self._closed:
+                idle = self._idle.setdefault(key, deque())
+                if len(idle) < self.maxsize:
+                    idle.append((connection, time.monotonic()))
+                    return
+        connection.close()
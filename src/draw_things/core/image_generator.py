@@ -2,30 +2,187 @@
 Core image generation functionality.
 """
 
-import base64
+import binascii
+import functools
 import json
-from typing import List, Optional, Dict, Any
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from typing import (
+    TYPE_CHECKING, Callable, Iterator, List, Optional, Dict, Any, Sequence, Tuple, Union
+)
 import urllib.request
 import urllib.error
 from pathlib import Path
-from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
 
 from ..config.settings import settings
+from .backends import BackendBusyError, BackendPool, NoHealthyBackendError
+from .cache import ResultCache, is_deterministic, payload_key
+from .codec import JSONCodec, get_codec
+from .connection_pool import ConnectionPool
+from .instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from .output import FileSystemSink, OutputSink
+from .retry import Deadline, RetryPolicy
+from .singleflight import SingleFlight
+from .streaming import stream_images
+
+if TYPE_CHECKING:
+    from .admission import AdmissionController
+    from .model_catalog import ModelCatalog
+    from .progress import Progress
+    from .sources import Source, SourceImageCache
+    from .template import RequestTemplate
+
+logger = logging.getLogger(__name__)
 
 class ImageGenerationError(Exception):
     """Base exception for image generation errors."""
     pass
 
+class UnknownModelError(ImageGenerationError):
+    """Raised when a request names a model the server doesn't have."""
+    pass
+
+class CircuitOpenError(ImageGenerationError):
+    """Raised without contacting a server while every backend is down."""
+    pass
+
+class DeadlineExceededError(ImageGenerationError):
+    """Raised when a request, retries included, runs out of time."""
+    pass
+
+class GenerationCancelledError(ImageGenerationError):
+    """Raised instead of saving images when a generation was cancelled."""
+    pass
+
+class AdmissionRejectedError(ImageGenerationError):
+    """Raised without contacting a server when admission control sheds load."""
+    pass
+
+@contextmanager
+def _api_errors():
+    """Translate transport and decoding failures into ImageGenerationError.
+
+    The original exception is kept as ``__cause__``.
+    """
+    try:
+        yield
+    except urllib.error.HTTPError as e:
+        raise ImageGenerationError(f"HTTP Error: {e.code} {e.reason}") from e
+    except urllib.error.URLError as e:
+        raise ImageGenerationError(f"URL Error: {e.reason}") from e
+    except json.JSONDecodeError as e:
+        raise ImageGenerationError(f"JSON Decode Error: {str(e)}") from e
+    except NoHealthyBackendError as e:
+        raise CircuitOpenError(str(e)) from e
+    except BackendBusyError as e:
+        raise AdmissionRejectedError(str(e)) from e
+
+def _endpoint_url(url: str, endpoint: str) -> str:
+    """Return the URL of a sibling endpoint of a configured API URL.
+
+    Configured URLs name the txt2img endpoint (``.../api/v1/txt2img``);
+    other endpoints live next to it. Only the last path segment is swapped,
+    so host names and query strings that happen to contain ``txt2img`` are
+    left alone.
+    """
+    parts = urlsplit(url)
+    base = parts.path.rstrip("/").rpartition("/")[0]
+    return urlunsplit(parts._replace(path=f"{base}/{endpoint}"))
+
 class ImageGenerator:
     """Core image generation functionality."""
 
-    def __init__(self, api_url: str = None):
+    def __init__(
+        self,
+        api_url: Union[str, Sequence[str]] = None,
+        pool: Optional[ConnectionPool] = None,
+        pool_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        backend_policy: Optional[str] = None,
+        backend_max_in_flight: Optional[int] = None,
+        admission: Optional["AdmissionController"] = None,
+        cache: Optional[ResultCache] = None,
+        coalesce: bool = False,
+        validate_models: bool = False,
+        catalog_ttl: Optional[float] = None,
+        sink: Optional[OutputSink] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[RetryPolicy] = None,
+        source_cache: Optional["SourceImageCache"] = None,
+        codec: Optional[JSONCodec] = None
+    ):
         """Initialize the image generator.
 
         Args:
-            api_url: URL of the Draw Things API endpoint
+            api_url: URL of the Draw Things API endpoint, or a list of URLs
+                to balance requests across several servers
+            pool: Connection pool to share with other generators
+            pool_size: Maximum idle keep-alive connections per host
+            idle_timeout: Seconds before an idle connection is discarded
+            backend_policy: Routing policy across several servers,
+                ``least_outstanding`` or ``latency``
+            backend_max_in_flight: Requests in flight per server (defaults
+                to ``settings.BACKEND_MAX_IN_FLIGHT``)
+            admission: Admission controller that queues generation requests
+                by priority, which may be shared with other generators.
+                Unless it has a ``max_in_flight`` of its own, this
+                generator's requests are limited to the backends' total
+                capacity, or one request per server when they have no limit
+            cache: Cache of results for fixed-seed payloads
+            coalesce: Share one upstream call between concurrent identical
+                fixed-seed requests
+            validate_models: Check the model against the cached model
+                catalog before sending a request
+            catalog_ttl: Seconds the model catalog is cached
+            sink: Where saved images go (defaults to a ``FileSystemSink``)
+            instrumentation: Receives per-stage timings, byte counts and
+                errors (defaults to recording nothing)
+            timeout: Socket timeout in seconds for each blocking read or
+                connect; ignored when a shared ``pool`` is given
+            retry: Retry policy for fixed-seed requests
+            source_cache: Cache of encoded img2img source images, to share
+                with other generators
+            codec: JSON codec for request and response bodies (defaults to
+                the fastest installed, see ``get_codec``)
         """
-        self.api_url = api_url or settings.API_URL
+        if not api_url:
+            api_url = settings.API_URLS or settings.API_URL
+        urls = [api_url] if isinstance(api_url, str) else list(api_url)
+        self.api_url = urls[0]
+        self.backends = BackendPool(
+            urls, policy=backend_policy, max_in_flight=backend_max_in_flight
+        )
+        self.admission = admission
+        # A Draw Things server renders one request at a time
+        self.admission_capacity = self.backends.capacity or len(self.backends.backends)
+        self.timeout = settings.REQUEST_TIMEOUT if timeout is None else timeout
+        self.pool = pool or ConnectionPool(
+            maxsize=pool_size, idle_timeout=idle_timeout, timeout=self.timeout
+        )
+        self.retry = retry or RetryPolicy()
+        self.cache = cache
+        self.in_flight = SingleFlight() if coalesce else None
+        self.validate_models = validate_models
+        self._catalog_ttl = catalog_ttl
+        self._catalog = None
+        self._sources = source_cache
+        self.codec = codec or get_codec()
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.sink = sink or FileSystemSink(instrumentation=self.instrumentation)
+
+    def close(self):
+        """Close pooled connections and wait for pending image writes."""
+        self.pool.close()
+        self.sink.close()
+
+    def __enter__(self) -> "ImageGenerator":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def generate_images(
         self,
@@ -39,7 +196,9 @@ class ImageGenerator:
         negative_prompt: str = None,
         guidance_scale: float = None,
         sampler: str = None,
-        clip_skip: int = None
+        clip_skip: int = None,
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None
     ) -> List[str]:
         """Generate images using the Draw Things API.
 
@@ -55,6 +214,9 @@ class ImageGenerator:
             guidance_scale: Guidance scale for the diffusion process
             sampler: Sampler to use for generation
             clip_skip: Number of CLIP layers to skip
+            timeout: Seconds the request may take, retries included
+            priority: Admission priority class, when the generator has an
+                admission controller
 
         Returns:
             List of base64-encoded images
@@ -62,12 +224,49 @@ class ImageGenerator:
         Raises:
             ImageGenerationError: If image generation fails
         """
+        payload = self.build_payload(
+            prompt=prompt,
+            width=width,
+            height=height,
+            steps=steps,
+            seed=seed,
+            model=model,
+            loras=loras,
+            negative_prompt=negative_prompt,
+            guidance_scale=guidance_scale,
+            sampler=sampler,
+            clip_skip=clip_skip
+        )
+        return self.generate_from_payload(payload, timeout=timeout, priority=priority)
+
+    def build_payload(
+        self,
+        prompt: str,
+        width: int = None,
+        height: int = None,
+        steps: int = None,
+        seed: int = None,
+        model: str = None,
+        loras: List[str] = None,
+        negative_prompt: str = None,
+        guidance_scale: float = None,
+        sampler: str = None,
+        clip_skip: int = None
+    ) -> Dict[str, Any]:
+        """Build a txt2img request payload, filling in settings defaults.
+
+        Takes the same arguments as ``generate_images``.
+
+        Returns:
+            JSON-serializable request payload
+        """
         if loras is None:
             loras = []
 
         # Basic payload with required parameters
         payload = {
             "prompt": prompt,
+            "model": model or settings.DEFAULT_MODEL,
             "negative_prompt": negative_prompt or settings.DEFAULT_NEGATIVE_PROMPT,
             "width": width or settings.DEFAULT_WIDTH,
             "height": height or settings.DEFAULT_HEIGHT,
@@ -91,34 +290,470 @@ class ImageGenerator:
                 }
             }
 
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(
-            self.api_url,
+        return payload
+
+    def build_img2img_payload(
+        self,
+        init_image: "Source",
+        prompt: str,
+        mask: Optional["Source"] = None,
+        strength: Optional[float] = None,
+        mask_blur: Optional[int] = None,
+        **params: Any
+    ) -> Dict[str, Any]:
+        """Build an img2img or inpainting request payload.
+
+        Source images are encoded through the generator's source cache, so
+        reusing one across many payloads reads and encodes it once.
+
+        Args:
+            init_image: Path of the image to start from, or its file contents
+            prompt: Text prompt for image generation
+            mask: Path or contents of an inpainting mask; white areas are
+                regenerated and black areas kept
+            strength: How far to move away from the init image, from 0 to 1
+                (``denoising_strength``)
+            mask_blur: Pixels to blur the mask edge by
+            **params: Further ``build_payload`` arguments
+
+        Returns:
+            JSON-serializable request payload, sent to the img2img endpoint
+
+        Raises:
+            ImageGenerationError: If a source image cannot be read
+        """
+        payload = self.build_payload(prompt=prompt, **params)
+        try:
+            payload["init_images"] = [self.sources.encode(init_image)]
+            if mask is not None:
+                payload["mask"] = self.sources.encode(mask)
+        except OSError as e:
+            raise ImageGenerationError(f"Error reading source image: {str(e)}") from e
+        if strength is not None:
+            payload["denoising_strength"] = strength
+        if mask_blur is not None:
+            payload["mask_blur"] = mask_blur
+        return payload
+
+    def template(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        **params: Any
+    ) -> "RequestTemplate":
+        """Build a reusable template for requests sharing most parameters.
+
+        Defaults are resolved and the invariant part of the payload is
+        serialized once, instead of on every call.
+
+        Args:
+            fields: Fields that vary per request (defaults to prompt,
+                negative prompt and seed)
+            **params: ``build_payload`` arguments shared by every request;
+                ``prompt`` may be left out and given per request
+
+        Returns:
+            Template for ``generate_from_template``
+        """
+        from .template import VARYING_FIELDS, RequestTemplate
+
+        params.setdefault("prompt", "")
+        return RequestTemplate(
+            self.build_payload(**params), fields or VARYING_FIELDS, codec=self.codec
+        )
+
+    def generate_from_template(
+        self,
+        template: "RequestTemplate",
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None,
+        **values: Any
+    ) -> List[str]:
+        """Send one request built from a template.
+
+        Behaves exactly like ``generate_from_payload`` on
+        ``template.payload(**values)``.
+
+        Args:
+            template: Template from ``template``
+            timeout: Seconds the request may take, retries included
+            priority: Admission priority class
+            **values: This request's values of the template's fields
+
+        Returns:
+            List of base64-encoded images
+        """
+        return self.generate_from_payload(
+            template.payload(**values), timeout, body=template.encode(**values),
+            priority=priority
+        )
+
+    def generate_from_payload(
+        self,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None
+    ) -> List[str]:
+        """Send a prepared txt2img or img2img payload to the API.
+
+        When the generator has a result cache, fixed-seed payloads are served
+        from it if possible and stored in it otherwise. With coalescing on,
+        concurrent callers sending the same fixed-seed payload wait for a
+        single upstream request and all receive its images.
+
+        Fixed-seed payloads are idempotent, so transient failures are retried
+        according to the generator's retry policy.
+
+        Args:
+            payload: Request payload, as returned by ``build_payload`` or
+                ``build_img2img_payload``
+            timeout: Seconds the request may take, retries included
+                (defaults to ``settings.REQUEST_DEADLINE``)
+            body: The payload already serialized, e.g. by a
+                ``RequestTemplate``
+            priority: Admission priority class, when the generator has an
+                admission controller (defaults to its ``default`` class)
+
+        Returns:
+            List of base64-encoded images
+
+        Raises:
+            AdmissionRejectedError: If admission control sheds the request
+            CircuitOpenError: If every backend is currently down
+            DeadlineExceededError: If the request runs out of time
+            ImageGenerationError: If image generation fails
+        """
+        if self.validate_models:
+            self.catalog.validate(payload["model"])
+        if self.cache is not None:
+            images = self.cache.get(payload)
+            if images is not None:
+                return images
+        if self.in_flight is not None and is_deterministic(payload):
+            images, shared = self.in_flight.do(
+                payload_key(payload),
+                functools.partial(self._fetch_images, payload, timeout, body, priority)
+            )
+            # Each caller gets its own list so one can't mutate another's
+            return list(images) if shared else images
+        return self._fetch_images(payload, timeout, body, priority)
+
+    def generate_batch(
+        self,
+        payloads: List[Dict[str, Any]],
+        max_batch_size: Optional[int] = None,
+        priority: Optional[str] = None
+    ) -> List[List[str]]:
+        """Generate several payloads in as few server round trips as possible.
+
+        Payloads that differ only in their seed are packed into one call
+        using ``batch_size``/``n_iter``, provided they all use a random seed
+        or their seeds are consecutive. The returned images are split back
+        out per payload.
+
+        Args:
+            payloads: Single-image request payloads, as returned by
+                ``build_payload``
+            max_batch_size: Largest ``batch_size`` to ask the server for
+            priority: Admission priority class of every call
+
+        Returns:
+            List of base64-encoded images for each payload, in payload order
+
+        Raises:
+            ImageGenerationError: If any server call fails
+        """
+        from .batching import pack_payloads, unpack_images
+
+        packs = pack_payloads(payloads, max_batch_size)
+        results = [
+            self.generate_from_payload(payload, priority=priority) for payload, _ in packs
+        ]
+        try:
+            return unpack_images(packs, results, len(payloads))
+        except ValueError as e:
+            raise ImageGenerationError(str(e))
+
+    def generate_seed_sweep(
+        self,
+        payload: Dict[str, Any],
+        seeds: Sequence[int],
+        max_batch_size: Optional[int] = None,
+        priority: Optional[str] = None
+    ) -> List[str]:
+        """Generate one image per seed from a single payload template.
+
+        Only the seed varies, so consecutive seeds are packed into
+        ``batch_size``/``n_iter`` calls straight from the template, without
+        building or comparing a payload per seed.
+
+        Args:
+            payload: Request payload, as returned by ``build_payload``; its
+                seed is ignored
+            seeds: Fixed, non-negative seeds to generate
+            max_batch_size: Largest ``batch_size`` to ask the server for
+            priority: Admission priority class of every call
+
+        Returns:
+            One base64-encoded image per seed, in the order of seeds
+
+        Raises:
+            ValueError: If a seed is negative (random)
+            ImageGenerationError: If any server call fails
+        """
+        from .batching import pack_seeds, unpack_images
+
+        if any(seed < 0 for seed in seeds):
+            raise ValueError("Seed sweeps need fixed, non-negative seeds")
+        packs = pack_seeds(payload, seeds, max_batch_size)
+        results = [
+            self.generate_from_payload(batched, priority=priority) for batched, _ in packs
+        ]
+        try:
+            images = unpack_images(packs, results, len(seeds))
+        except ValueError as e:
+            raise ImageGenerationError(str(e))
+        return [image for per_seed in images for image in per_seed]
+
+    def _fetch_images(
+        self,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None
+    ) -> List[str]:
+        request = functools.partial(
+            self._request_images, payload, body=body, priority=priority
+        )
+        images = self._with_retries(payload, request, timeout)
+        if self.cache is not None:
+            try:
+                self.cache.put(payload, images)
+            except OSError as e:
+                # The images are already paid for; a cache miss next time is cheaper
+                logger.warning("Could not cache result: %s", e)
+        return images
+
+    def _with_retries(
+        self,
+        payload: Dict[str, Any],
+        attempt: Callable[[Optional[float]], Any],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Run attempt, retrying transient failures of fixed-seed payloads.
+
+        Args:
+            payload: Payload being sent; only fixed-seed ones are retried
+            attempt: Makes one attempt, given the socket timeout to use
+            timeout: Seconds all attempts together may take
+
+        Raises:
+            DeadlineExceededError: If the deadline passes
+            ImageGenerationError: If the last attempt fails
+        """
+        deadline = Deadline(settings.REQUEST_DEADLINE if timeout is None else timeout)
+        retry = is_deterministic(payload)
+        number = 0
+        while True:
+            number += 1
+            remaining = deadline.remaining()
+            try:
+                return attempt(None if remaining is None else min(self.timeout, remaining))
+            except ImageGenerationError as e:
+                if deadline.expired():
+                    raise DeadlineExceededError(
+                        f"Request did not finish within {deadline.seconds}s: {str(e)}"
+                    ) from e
+                if not retry or not self.retry.should_retry(e.__cause__, number):
+                    raise
+                delay = self.retry.delay(number, e.__cause__)
+                remaining = deadline.remaining()
+                if remaining is not None and delay >= remaining:
+                    raise DeadlineExceededError(
+                        f"Request did not finish within {deadline.seconds}s: {str(e)}"
+                    ) from e
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        """Return request deduplication counters.
+
+        Returns:
+            Cache hits/misses when a cache is configured, and upstream calls
+            and coalesced requests when coalescing is on
+        """
+        stats: Dict[str, int] = {}
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            stats["cache_hits"] = cache_stats["hits"]
+            stats["cache_misses"] = cache_stats["misses"]
+        if self.in_flight is not None:
+            flight_stats = self.in_flight.stats()
+            stats["upstream_calls"] = flight_stats["calls"]
+            stats["coalesced"] = flight_stats["coalesced"]
+        return stats
+
+    def _request_images(
+        self,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None
+    ) -> List[str]:
+        request = functools.partial(self._generation_request, payload=payload, body=body)
+        with self._api_call(request, timeout, admit=True, priority=priority) as response:
+            with self.instrumentation.span("transfer"):
+                data = response.read()
+            self.instrumentation.add_bytes("received", len(data))
+            with self.instrumentation.span("parse"):
+                result = self.codec.loads(data)
+            # The API returns the generated image in the response
+            if 'images' in result:
+                return result['images']
+            else:
+                raise ImageGenerationError("No images in API response")
+
+    def generate_images_to_files(
+        self,
+        payload: Dict[str, Any],
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Send a payload and stream the returned images to disk.
+
+        Unlike ``generate_from_payload`` followed by ``save_images``, the
+        response is parsed incrementally and each image is base64-decoded in
+        small chunks straight into its file, so memory use does not grow with
+        image size or batch size.
+
+        Args:
+            payload: Request payload, as returned by ``build_payload``
+            model_name: Name of the model used for generation
+            output_dir: Directory to save images to
+            timeout: Seconds the request may take, retries included
+            body: The payload already serialized, e.g. by a
+                ``RequestTemplate``
+            priority: Admission priority class
+            metadata: Request payload embedded in each file when the sink
+                has a ``PostProcessor``
+
+        Returns:
+            List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If image generation or saving fails
+        """
+        stream = functools.partial(
+            self._stream_images, payload, model_name, output_dir,
+            body=body, priority=priority, metadata=metadata
+        )
+        return self._with_retries(payload, stream, timeout)
+
+    def _stream_images(
+        self,
+        payload: Dict[str, Any],
+        model_name: Optional[str],
+        output_dir: Optional[str],
+        timeout: Optional[float] = None,
+        body: Optional[bytes] = None,
+        priority: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        files: List[Any] = []
+
+        def open_image(index: int):
+            try:
+                files.append(
+                    self.sink.open_image(model_name, output_dir, metadata=metadata)
+                )
+            except OSError as e:
+                raise ImageGenerationError(f"Error saving image: {str(e)}") from e
+            return files[-1]
+
+        try:
+            request = functools.partial(self._generation_request, payload=payload, body=body)
+            with self._api_call(request, timeout, admit=True, priority=priority) as response:
+                with self.instrumentation.span("stream"):
+                    count = stream_images(response, open_image)
+        except Exception as e:
+            # Don't leave truncated or orphaned images behind
+            for f in files:
+                f.discard()
+                if f.path:
+                    Path(f.path).unlink(missing_ok=True)
+            # _api_call has already counted the error
+            if isinstance(e, binascii.Error):
+                raise ImageGenerationError(f"Error decoding image: {str(e)}") from e
+            if isinstance(e, OSError):
+                raise ImageGenerationError(f"Error saving image: {str(e)}") from e
+            raise
+        if not count:
+            raise ImageGenerationError("No images in API response")
+        return [f.path for f in files]
+
+    @contextmanager
+    def _api_call(
+        self,
+        build_request: Callable[[str], Union[str, urllib.request.Request]],
+        timeout: Optional[float] = None,
+        admit: bool = False,
+        priority: Optional[str] = None
+    ) -> Iterator[Any]:
+        """Open a request against the next backend over a pooled connection.
+
+        Args:
+            build_request: Maps the chosen backend's configured URL to the
+                URL or request to open
+            timeout: Socket timeout, overriding the pool default; also bounds
+                the wait for admission and a free backend together
+            admit: Pass the request through the admission controller, if any
+            priority: Admission priority class
+        """
+        deadline = Deadline(timeout)
+        admitted = (
+            self.admission.admit(priority, timeout, self.admission_capacity)
+            if admit and self.admission is not None else nullcontext()
+        )
+        with _api_errors():
+            try:
+                with admitted, self.backends.acquire(deadline.remaining()) as backend:
+                    with self.instrumentation.span("server"):
+                        opened = self.pool.urlopen(build_request(backend.url), timeout=timeout)
+                    with opened as response:
+                        yield response
+            except Exception as e:
+                self.instrumentation.count_error(type(e).__name__)
+                raise
+
+    def _models_url(self, url: str) -> str:
+        return _endpoint_url(url, "sd-models")
+
+    def _generation_request(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        body: Optional[bytes] = None
+    ) -> urllib.request.Request:
+        if "init_images" in payload:
+            url = _endpoint_url(url, "img2img")
+        data = self.codec.dumps(payload) if body is None else body
+        return urllib.request.Request(
+            url,
             data=data,
             headers={'Content-Type': 'application/json'},
             method='POST'
         )
 
-        try:
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                # The API returns the generated image in the response
-                if 'images' in result:
-                    return result['images']
-                else:
-                    raise ImageGenerationError("No images in API response")
-        except urllib.error.HTTPError as e:
-            raise ImageGenerationError(f"HTTP Error: {e.code} {e.reason}")
-        except urllib.error.URLError as e:
-            raise ImageGenerationError(f"URL Error: {e.reason}")
-        except json.JSONDecodeError as e:
-            raise ImageGenerationError(f"JSON Decode Error: {str(e)}")
-
     def save_images(
         self,
         images: List[str],
         model_name: Optional[str] = None,
-        output_dir: Optional[str] = None
+        output_dir: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None
     ) -> List[str]:
         """Save base64-encoded images to disk.
 
@@ -126,59 +761,141 @@ class ImageGenerator:
             images: List of base64-encoded images
             model_name: Name of the model used for generation
             output_dir: Directory to save images to
+            names: File names to use, one per image, instead of the sink's
+                naming scheme
+            metadata: Request payload of each image, embedded in the file
+                when the sink has a ``PostProcessor``
 
         Returns:
             List of paths to saved images
+
+        Raises:
+            ImageGenerationError: If there are no images, or decoding or
+                saving fails
         """
         if not images:
-            return []
-
-        output_dir = Path(output_dir or settings.OUTPUT_DIR or "generated_images")
-        output_dir.mkdir(parents=True, exist_ok=True)
+            raise ImageGenerationError("No images to save")
 
-        saved_paths = []
-        for i, image_data in enumerate(images):
-            # Decode base64 image
-            try:
-                image_bytes = base64.b64decode(image_data)
-            except Exception as e:
-                raise ImageGenerationError(f"Error decoding image: {str(e)}")
+        try:
+            return self.sink.save(
+                images, model_name, output_dir, names=names, metadata=metadata
+            )
+        except binascii.Error as e:
+            self.instrumentation.count_error(type(e).__name__)
+            raise ImageGenerationError(f"Error decoding image: {str(e)}")
+        except OSError as e:
+            self.instrumentation.count_error(type(e).__name__)
+            raise ImageGenerationError(f"Error saving image: {str(e)}")
 
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"image_{timestamp}_{i}.png"
-            if model_name:
-                filename = f"{model_name}_{filename}"
+    @property
+    def catalog(self) -> "ModelCatalog":
+        """Cached catalog of the server's models, created on first use."""
+        if self._catalog is None:
+            from .model_catalog import ModelCatalog
+            self._catalog = ModelCatalog(self, ttl=self._catalog_ttl)
+        return self._catalog
 
-            # Save image
-            file_path = output_dir / filename
-            try:
-                with open(file_path, "wb") as f:
-                    f.write(image_bytes)
-                saved_paths.append(str(file_path))
-            except Exception as e:
-                raise ImageGenerationError(f"Error saving image: {str(e)}")
-
-        return saved_paths
+    @property
+    def sources(self) -> "SourceImageCache":
+        """Cache of encoded img2img source images, created on first use."""
+        if self._sources is None:
+            from .sources import SourceImageCache
+            self._sources = SourceImageCache()
+        return self._sources
 
     def get_available_models(self) -> List[str]:
         """Get list of available models.
 
+        The list comes from the model catalog, so it is only fetched from
+        the server again once the catalog's TTL expires.
+
         Returns:
             List of available model names
 
         Raises:
             ImageGenerationError: If model list retrieval fails
         """
-        models_url = self.api_url.replace("/txt2img", "/sd-models")
-        try:
-            with urllib.request.urlopen(models_url) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                # The API returns a list of model objects
-                return [model.get('title', '') for model in result]
-        except urllib.error.HTTPError as e:
-            raise ImageGenerationError(f"HTTP Error: {e.code} {e.reason}")
-        except urllib.error.URLError as e:
-            raise ImageGenerationError(f"URL Error: {e.reason}")
-        except json.JSONDecodeError as e:
-            raise ImageGenerationError(f"JSON Decode Error: {str(e)}")
\ No newline at end of file
+        return self.catalog.titles()
+
+    def fetch_progress(self, url: Optional[str] = None, preview: bool = False) -> "Progress":
+        """Fetch the progress of the generation the server is running.
+
+        Args:
+            url: API URL of the server to ask (defaults to the first one)
+            preview: Include the server's preview of the image so far
+
+        Returns:
+            The server's progress report
+
+        Raises:
+            ImageGenerationError: If the request fails
+        """
+        from .progress import Progress
+
+        query = "false" if preview else "true"
+        progress_url = f"{_endpoint_url(url or self.api_url, 'progress')}?skip_current_image={query}"
+        with _api_errors():
+            with self.pool.urlopen(progress_url, timeout=self.timeout) as response:
+                return Progress.from_response(self.codec.loads(response.read()))
+
+    def interrupt(self, url: Optional[str] = None):
+        """Ask the server to stop the generation it is running.
+
+        The interrupted request returns early with whatever the server has
+        made so far. The server stops its current job, whichever request
+        that belongs to.
+
+        Args:
+            url: API URL of the server (defaults to the first one)
+
+        Raises:
+            ImageGenerationError: If the request fails
+        """
+        request = urllib.request.Request(
+            _endpoint_url(url or self.api_url, "interrupt"), data=b"", method="POST"
+        )
+        with _api_errors():
+            with self.pool.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+
+    def fetch_models(
+        self,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str], Optional[str]]:
+        """Fetch the full model metadata from the server.
+
+        Args:
+            etag: ETag of a previously fetched list, to revalidate it
+            last_modified: Last-Modified of a previously fetched list
+
+        Returns:
+            The model objects (None if the server says the previously fetched
+            list is unchanged), plus the new ETag and Last-Modified validators
+
+        Raises:
+            ImageGenerationError: If model list retrieval fails
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        def request(url: str) -> urllib.request.Request:
+            return urllib.request.Request(self._models_url(url), headers=headers)
+
+        with self._api_call(request) as response:
+            body = response.read()
+            if response.status == 304:
+                return None, etag, last_modified
+            result = self.codec.loads(body)
+            validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        # The API returns a list of model objects; accept {"models": [...]} too
+        if isinstance(result, dict):
+            result = result.get("models", [])
+        models = [
+            model if isinstance(model, dict) else {"title": str(model)}
+            for model in result
+        ]
+        return (models,) + validators
\ No newline at end of file
@@ -0,0 +1,274 @@
+"""
+Per-stage timing and counters for image generation.
+
+``ImageGenerator`` reports every request through an ``Instrumentation``:
+
+- spans timing each stage: ``server`` (until the response headers arrive,
+  i.e. queueing and compute), ``transfer`` (reading the body), ``parse``
+  (JSON), ``decode`` (base64), ``write`` (image files) and ``stream`` (the
+  interleaved transfer/parse/decode/write of streamed responses)
+- byte counters: ``received`` response bytes and ``written`` image bytes
+- an error counter keyed by exception class
+
+The default ``Instrumentation`` does nothing. ``Metrics`` collects the data
+in process and can be exported in the Prometheus text format;
+``OpenTelemetryInstrumentation`` forwards it to OpenTelemetry.
+"""
+
+import bisect
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Instrumentation:
+    """Instrumentation that records nothing.
+
+    Subclass and override the methods to route measurements elsewhere.
+    """
+
+    def span(self, stage: str) -> Any:
+        """Return a context manager timing one stage."""
+        return _NULL_SPAN
+
+    def add_bytes(self, direction: str, count: int):
+        """Count bytes ``received`` from the server or ``written`` to disk."""
+
+    def count_error(self, error_class: str):
+        """Count a failure by exception class name."""
+
+
+NULL_INSTRUMENTATION = Instrumentation()
+
+
+class _Span:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.observe(self._stage, time.perf_counter() - self._start)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Metrics(Instrumentation):
+    """In-process collector of stage timings, byte counts and errors.
+
+    Stage timings are kept as histograms. Listeners registered with
+    ``add_listener`` are called with ``(stage, seconds)`` after every span,
+    for ad hoc logging or forwarding.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize the collector.
+
+        Args:
+            buckets: Upper bounds in seconds of the timing histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._stages: Dict[str, _Histogram] = {}
+        self._bytes: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, float], None]] = []
+        self._lock = threading.Lock()
+
+    def span(self, stage: str) -> _Span:
+        return _Span(self, stage)
+
+    def observe(self, stage: str, seconds: float):
+        """Record a stage duration measured elsewhere."""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = _Histogram(self.buckets)
+            histogram.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram.count += 1
+            histogram.sum += seconds
+        for listener in self._listeners:
+            listener(stage, seconds)
+
+    def add_bytes(self, direction: str, count: int):
+        with self._lock:
+            self._bytes[direction] = self._bytes.get(direction, 0) + count
+
+    def count_error(self, error_class: str):
+        with self._lock:
+            self._errors[error_class] = self._errors.get(error_class, 0) + 1
+
+    def add_listener(self, listener: Callable[[str, float], None]):
+        """Call listener with ``(stage, seconds)`` after every span."""
+        self._listeners.append(listener)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of everything collected so far.
+
+        Returns:
+            ``stages`` (count, total seconds and cumulative bucket counts per
+            stage), ``bytes`` per direction and ``errors`` per class
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self._stages.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                stages[stage] = {
+                    "count": histogram.count, "sum": histogram.sum, "buckets": buckets
+                }
+            return {"stages": stages, "bytes": dict(self._bytes), "errors": dict(self._errors)}
+
+    def render_prometheus(self, prefix: str = "draw_things") -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each generation stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, data in sorted(snapshot["stages"].items()):
+            for bound, count in data["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {data["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+        lines += [
+            f"# HELP {prefix}_bytes_total Bytes received from the server or written to disk.",
+            f"# TYPE {prefix}_bytes_total counter",
+        ]
+        for direction, count in sorted(snapshot["bytes"].items()):
+            lines.append(f'{prefix}_bytes_total{{direction="{direction}"}} {count}')
+        lines += [
+            f"# HELP {prefix}_errors_total Failures by exception class.",
+            f"# TYPE {prefix}_errors_total counter",
+        ]
+        for error_class, count in sorted(snapshot["errors"].items()):
+            lines.append(f'{prefix}_errors_total{{class="{error_class}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "") -> "ThreadingHTTPServer":
+        """Serve ``/metrics`` for Prometheus to scrape, from a daemon thread.
+
+        Returns:
+            The running server; call ``shutdown()`` to stop it
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="draw-things-metrics", daemon=True
+        ).start()
+        return server
+
+
+class _OpenTelemetrySpan:
+    __slots__ = ("_owner", "_stage", "_span", "_start")
+
+    def __init__(self, owner: "OpenTelemetryInstrumentation", stage: str):
+        self._owner = owner
+        self._stage = stage
+
+    def __enter__(self):
+        self._span = self._owner.tracer.start_as_current_span(f"draw_things.{self._stage}")
+        self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._owner.duration.record(
+            time.perf_counter() - self._start, {"stage": self._stage}
+        )
+        return self._span.__exit__(exc_type, exc_value, traceback)
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """Reports stages as OpenTelemetry spans and metrics.
+
+    Requires the ``opentelemetry-api`` package; spans and metrics go to
+    whatever SDK and exporters the application has configured.
+    """
+
+    def __init__(self, tracer: Optional[Any] = None, meter: Optional[Any] = None):
+        """Initialize the instrumentation.
+
+        Args:
+            tracer: Tracer to create spans with (defaults to the global one)
+            meter: Meter to create instruments with (defaults to the global one)
+
+        Raises:
+            ImportError: If opentelemetry-api is not installed
+        """
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetryInstrumentation requires opentelemetry-api: "
+                "pip install 'draw-things[otel]'"
+            )
+        self.tracer = tracer or trace.get_tracer("draw_things")
+        meter = meter or metrics.get_meter("draw_things")
+        self.duration = meter.create_histogram(
+            "draw_things.stage.duration", unit="s",
+            description="Time spent in each generation stage"
+        )
+        self.bytes = meter.create_counter(
+            "draw_things.bytes", unit="By",
+            description="Bytes received from the server or written to disk"
+        )
+        self.errors = meter.create_counter(
+            "draw_things.errors", description="Failures by exception class"
+        )
+
+    def span(self, stage: str) -> _OpenTelemetrySpan:
+        return _OpenTelemetrySpan(self, stage)
+
+    def add_bytes(self, direction: str, count: int):
+        self.bytes.add(count, {"direction": direction})
+
+    def count_error(self, error_class: str):
+        self.errors.add(1, {"class": error_class})
@@ -0,0 +1,275 @@
+"""
+Durable local job queues for the worker daemon.
+
+A job is a dict of ``generate_image`` keyword arguments. Jobs move from
+``pending`` to ``running`` when a worker claims them, and from there to
+``done`` or ``failed`` with a result record. Two backends are provided:
+
+- ``SQLiteJobQueue`` keeps every job in one SQLite database
+- ``SpoolJobQueue`` keeps one JSON file per job in a directory, moving the
+  file between subdirectories as its state changes, so jobs can be queued
+  by anything that can write a file
+
+Both are safe to share between threads and between processes.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+STATUSES = ("pending", "running", "done", "failed")
+
+
+class JobQueue:
+    """Interface for durable job queues."""
+
+    def put(self, request: Dict[str, Any]) -> str:
+        """Queue a job.
+
+        Args:
+            request: Keyword arguments for ``generate_image``
+
+        Returns:
+            The job's id
+        """
+        raise NotImplementedError
+
+    def claim(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Take the oldest pending job and mark it running.
+
+        Returns:
+            The job's id and request, or None if nothing is pending
+        """
+        raise NotImplementedError
+
+    def complete(self, job_id: str, record: Dict[str, Any]):
+        """Mark a running job done or failed, by ``record["status"]``."""
+        raise NotImplementedError
+
+    def recover(self) -> int:
+        """Return running jobs to pending, after a worker died mid-job.
+
+        Only call this when no other worker is using the queue.
+
+        Returns:
+            Number of jobs requeued
+        """
+        raise NotImplementedError
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a finished job's result record, or None if unfinished."""
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of jobs in each status."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the queue's resources."""
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in a SQLite database.
+
+    Claims run in ``BEGIN IMMEDIATE`` transactions, so several worker
+    processes can drain the same database without taking a job twice.
+    """
+
+    def __init__(self, path: str):
+        """Open or create the queue.
+
+        Args:
+            path: Database file
+        """
+        self.path = path
+        self._connection = sqlite3.connect(
+            path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " request TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " result TEXT,"
+                " enqueued REAL NOT NULL,"
+                " started REAL,"
+                " finished REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)"
+            )
+
+    def put(self, request: Dict[str, Any]) -> str:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO jobs (request, enqueued) VALUES (?, ?)",
+                (json.dumps(request), time.time())
+            )
+        return str(cursor.lastrowid)
+
+    def claim(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT id, request FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                        (time.time(), row[0])
+                    )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return str(row[0]), json.loads(row[1])
+
+    def complete(self, job_id: str, record: Dict[str, Any]):
+        status = "done" if record.get("status") == "ok" else "failed"
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ?",
+                (status, json.dumps(record), time.time(), int(job_id))
+            )
+
+    def recover(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE jobs SET status = 'pending', started = NULL WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT result FROM jobs WHERE id = ?", (int(job_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SpoolJobQueue(JobQueue):
+    """Job queue in a spool directory of JSON files.
+
+    Pending jobs are ``*.json`` files in the directory itself, claimed
+    oldest name first. Claiming renames a file into ``running/``, which is
+    atomic, so only one worker wins each job. Finished jobs are replaced by
+    their result record in ``done/`` or ``failed/``. Files whose names start
+    with a dot are ignored, so producers can write a temporary dot file and
+    rename it into place.
+    """
+
+    def __init__(self, directory: str):
+        """Open or create the spool.
+
+        Args:
+            directory: Spool directory
+        """
+        self.directory = Path(directory)
+        for status in STATUSES[1:]:
+            (self.directory / status).mkdir(parents=True, exist_ok=True)
+        self._sequence = itertools.count()
+
+    def put(self, request: Dict[str, Any]) -> str:
+        job_id = f"{time.time_ns():020d}-{os.getpid()}-{next(self._sequence)}"
+        self._write_json(self.directory / f"{job_id}.json", request)
+        return job_id
+
+    def claim(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        for path in sorted(self.directory.glob("[!.]*.json")):
+            running = self.directory / "running" / path.name
+            try:
+                os.rename(path, running)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            try:
+                with open(running, "r", encoding="utf-8") as f:
+                    request = json.load(f)
+            except ValueError as e:
+                self.complete(path.stem, {
+                    "job_id": path.stem, "status": "error", "error": f"Invalid job file: {e}"
+                })
+                continue
+            return path.stem, request
+        return None
+
+    def complete(self, job_id: str, record: Dict[str, Any]):
+        status = "done" if record.get("status") == "ok" else "failed"
+        self._write_json(self.directory / status / f"{job_id}.json", record)
+        try:
+            os.unlink(self.directory / "running" / f"{job_id}.json")
+        except FileNotFoundError:
+            pass
+
+    def recover(self) -> int:
+        requeued = 0
+        for path in (self.directory / "running").glob("*.json"):
+            os.rename(path, self.directory / path.name)
+            requeued += 1
+        return requeued
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        for status in ("done", "failed"):
+            path = self.directory / status / f"{job_id}.json"
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        return None
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"pending": len(list(self.directory.glob("[!.]*.json")))}
+        for status in STATUSES[1:]:
+            counts[status] = len(list((self.directory / status).glob("*.json")))
+        return counts
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]):
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def open_queue(location: str) -> JobQueue:
+    """Open the queue at location.
+
+    Existing directories, and paths without a file extension, are spool
+    directories; anything else is a SQLite database.
+    """
+    if os.path.isdir(location) or not os.path.splitext(location)[1]:
+        return SpoolJobQueue(location)
+    return SQLiteJobQueue(location)
@@ -0,0 +1,98 @@
+"""
+Index of completed generations, used to skip finished work on reruns.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .cache import is_deterministic, payload_key
+
+
+def result_key(payload: Dict[str, Any], occurrence: int = 0) -> str:
+    """Return the manifest key of a request payload.
+
+    A payload with a fixed seed always produces the same images, so its key
+    is its content hash alone and matches across runs and inputs. Payloads
+    with a random seed are told apart by ``occurrence``, their position in
+    the input, so asking for the same random prompt several times still
+    produces several images.
+    """
+    key = payload_key(payload)
+    return key if is_deterministic(payload) else f"{key}#{occurrence}"
+
+
+class ResultManifest:
+    """SQLite index from payload key to the result record of a finished job.
+
+    Keys are the table's primary key, so each lookup is one B-tree probe
+    however many jobs the manifest holds. Entries whose images have since
+    been deleted are treated as missing, so that work is redone.
+    """
+
+    def __init__(self, path: str):
+        """Open or create the manifest.
+
+        Args:
+            path: Database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(
+            path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " record TEXT NOT NULL,"
+                " finished REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the record stored for key, or None if absent or stale."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT record FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if not all(os.path.exists(path) for path in record.get("paths", [])):
+            return None
+        return record
+
+    def add(self, key: str, record: Dict[str, Any]):
+        """Store the record of a finished job, replacing any earlier one."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, record, finished) VALUES (?, ?, ?)",
+                (key, json.dumps(record), time.time())
+            )
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "ResultManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
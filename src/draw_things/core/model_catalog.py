@@ -0,0 +1,187 @@
+"""
+Cached catalog of the models a Draw Things server offers.
+"""
+
+import difflib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..config.settings import settings
+from .image_generator import UnknownModelError
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCatalog:
+    """TTL-bound cache of the server's model metadata.
+
+    The full model objects from ``/sd-models`` are kept, indexed by title,
+    model name and file name so lookups are O(1). Once the TTL expires the
+    next read refreshes the list, sending the server's ETag/Last-Modified
+    validators so an unchanged list costs a 304 and no parsing. A background
+    thread can keep the catalog fresh so reads never wait on the network.
+    """
+
+    def __init__(
+        self,
+        generator: Any,
+        ttl: Optional[float] = None,
+        refresh_interval: Optional[float] = None,
+        recheck_interval: Optional[float] = None
+    ):
+        """Initialize the catalog.
+
+        Args:
+            generator: ImageGenerator used to query the server
+            ttl: Seconds before the cached list is considered stale
+            refresh_interval: Seconds between background refreshes, once
+                ``start`` is called (defaults to the TTL)
+            recheck_interval: Least seconds between refreshes forced by
+                unknown model names (defaults to
+                ``settings.MODEL_CATALOG_RECHECK_INTERVAL``)
+        """
+        self.generator = generator
+        self.ttl = settings.MODEL_CATALOG_TTL if ttl is None else ttl
+        self.refresh_interval = refresh_interval or self.ttl
+        self.recheck_interval = (
+            settings.MODEL_CATALOG_RECHECK_INTERVAL if recheck_interval is None
+            else recheck_interval
+        )
+        self.fetches = 0
+        self.not_modified = 0
+        self._models: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_stale(self, max_age: Optional[float] = None) -> bool:
+        """Return whether the cached list is older than max_age (default: the TTL)."""
+        max_age = self.ttl if max_age is None else max_age
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= max_age
+
+    def refresh(self, force: bool = False) -> bool:
+        """Refresh the list from the server if it is stale.
+
+        Args:
+            force: Refresh even if the TTL has not expired
+
+        Returns:
+            Whether the list changed
+
+        Raises:
+            ImageGenerationError: If model list retrieval fails
+        """
+        return self._refresh(0.0 if force else self.ttl)
+
+    def _refresh(self, max_age: float) -> bool:
+        """Refresh the list if it is older than max_age seconds."""
+        if not self.is_stale(max_age):
+            return False  # fresh reads never wait on the lock
+        with self._lock:
+            # Another thread may have refreshed while this one waited
+            if not self.is_stale(max_age):
+                return False
+            models, etag, last_modified = self.generator.fetch_models(
+                etag=self._etag, last_modified=self._last_modified
+            )
+            self.fetches += 1
+            self._fetched_at = time.monotonic()
+            if models is None:
+                self.not_modified += 1
+                return False
+            self._etag, self._last_modified = etag, last_modified
+            changed = models != self._models
+            self._models = models
+            self._index = self._build_index(models)
+            return changed
+
+    @staticmethod
+    def _build_index(models: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        index: Dict[str, Dict[str, Any]] = {}
+        # Titles win over the looser aliases if they collide
+        for field in ("filename", "model_name", "title"):
+            for model in models:
+                value = model.get(field)
+                if value:
+                    index[value] = model
+                    if field == "filename":
+                        index[os.path.basename(value)] = model
+        return index
+
+    def models(self) -> List[Dict[str, Any]]:
+        """Return the full metadata of every model."""
+        self.refresh()
+        return list(self._models)
+
+    def titles(self) -> List[str]:
+        """Return the title of every model."""
+        return [model.get("title", "") for model in self.models()]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Look up a model by title, model name or file name.
+
+        Returns:
+            The model's metadata, or None if the server doesn't have it
+        """
+        self.refresh()
+        return self._index.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def validate(self, name: str) -> Dict[str, Any]:
+        """Check that the server knows a model before requesting it.
+
+        An unknown name forces one refresh, in case the model was added
+        since the list was cached, unless the list is younger than
+        ``recheck_interval``.
+
+        Returns:
+            The model's metadata
+
+        Raises:
+            UnknownModelError: If the server has no such model
+        """
+        model = self.get(name)
+        if model is None and self._refresh(self.recheck_interval):
+            model = self._index.get(name)
+        if model is None:
+            message = f"Unknown model: {name}"
+            suggestions = difflib.get_close_matches(name, list(self._index), n=3)
+            if suggestions:
+                message += f" (did you mean {', '.join(suggestions)}?)"
+            raise UnknownModelError(message)
+        return model
+
+    def start(self):
+        """Start refreshing the catalog in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name="draw-things-catalog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresher."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh(force=True)
+            except Exception as e:
+                # Keep serving the last good list; try again next round
+                logger.warning("Could not refresh model catalog: %s", e)
+            self._stop.wait(self.refresh_interval)
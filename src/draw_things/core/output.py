@@ -0,0 +1,489 @@
+"""
+Output sinks that persist generated images.
+"""
+
+import binascii
+import hashlib
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from .instrumentation import NULL_INSTRUMENTATION, Instrumentation
+
+if TYPE_CHECKING:
+    from .postprocess import PostProcessor
+
+NAMING_SCHEMES = ("sequence", "hash")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def create_temp_file(directory: str) -> Tuple[int, str]:
+    """Create a hidden temporary file that will be published as an image.
+
+    ``tempfile.mkstemp`` creates files readable by their owner only, and
+    publishing by link or rename keeps that mode. The file is created with
+    mode 0666 less the umask instead, as ``open`` would.
+
+    Returns:
+        The open file descriptor and the file's path
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        path = os.path.join(directory, f".{os.urandom(8).hex()}.tmp")
+        try:
+            return os.open(path, flags, 0o666), path
+        except FileExistsError:
+            continue
+
+
+class OutputSink:
+    """Destination for generated images.
+
+    Subclasses decide where and how images are stored; ``ImageGenerator``
+    hands every image it saves to its sink.
+    """
+
+    def save(
+        self,
+        images: List[str],
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> List[str]:
+        """Store base64-encoded images.
+
+        Args:
+            images: List of base64-encoded images
+            model_name: Name of the model used for generation
+            output_dir: Directory to save images to
+            names: File names to store the images under, one per image,
+                instead of the sink's naming scheme; an existing file of
+                the same name is replaced
+            metadata: Request payload of each image, for sinks that record
+                how images were made
+
+        Returns:
+            Locations of the stored images, in image order
+
+        Raises:
+            binascii.Error: If an image is not valid base64
+            OSError: If an image cannot be stored
+        """
+        raise NotImplementedError
+
+    def save_decoded(
+        self,
+        images: List[bytes],
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> List[str]:
+        """Store images already decoded from base64, as ``save`` would.
+
+        The default encodes the images again and calls ``save``; sinks that
+        can store bytes directly should override it.
+
+        Returns:
+            Locations of the stored images, in image order
+
+        Raises:
+            OSError: If an image cannot be stored
+        """
+        import base64
+
+        encoded = [base64.b64encode(image).decode("ascii") for image in images]
+        return self.save(
+            encoded, model_name, output_dir, names=names, metadata=metadata
+        )
+
+    def open_image(
+        self,
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Open a writable binary file for one image, for streamed writes.
+
+        The image becomes visible under its final name only once the file is
+        closed without error.
+
+        Args:
+            model_name: Name of the model used for generation
+            output_dir: Directory to save the image to
+            metadata: Request payload of the image, for sinks that record
+                how images were made
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the sink."""
+
+
+class AtomicImageFile:
+    """Binary file written under a temporary name and published on close.
+
+    Publishing uses a hard link, which fails instead of overwriting when the
+    name is taken, so a name is never claimed twice; the sink then tries the
+    next candidate name. A failed write leaves nothing behind.
+
+    When the sink has a ``PostProcessor``, the image's payload is embedded
+    as it is written and the published image is handed to the processor.
+    """
+
+    def __init__(
+        self,
+        sink: "FileSystemSink",
+        directory: Path,
+        model_name: Optional[str],
+        name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        sync_directory: bool = False
+    ):
+        self._sink = sink
+        self._directory = directory
+        self._model_name = model_name
+        self._name = name
+        self._sync_directory = sync_directory
+        self._digest = hashlib.sha256()
+        self._size = 0
+        processor = sink.post_processor
+        self._text: Optional[Dict[str, str]] = None
+        if processor is not None and processor.embed_metadata and metadata is not None:
+            self._text = {"parameters": json.dumps(metadata, sort_keys=True)}
+        self._header = b""  # start of the PNG, held back until the text can follow it
+        fd, self._temp_path = create_temp_file(str(directory))
+        self._file = os.fdopen(fd, "wb")
+        self.path: Optional[str] = None
+
+    def write(self, data: bytes) -> int:
+        if self._text is not None:
+            self._header += data
+            if not self._header_complete():
+                return len(data)
+            from .postprocess import embed_png_text
+            header, text = self._header, self._text
+            self._header, self._text = b"", None
+            self._write(embed_png_text(header, text))
+            return len(data)
+        return self._write(data)
+
+    def _header_complete(self) -> bool:
+        """Return whether the buffered start of the file reaches past IHDR."""
+        header = self._header
+        if len(header) < 16:
+            return False
+        if not header.startswith(PNG_SIGNATURE) or header[12:16] != b"IHDR":
+            return True  # not a PNG: nothing to embed into
+        return len(header) >= 20 + int.from_bytes(header[8:12], "big")
+
+    def _write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self._size += len(data)
+        return self._file.write(data)
+
+    def close(self, data: Optional[bytes] = None):
+        """Flush the image, publish it under a unique final name and post-process it.
+
+        Args:
+            data: The whole image, when the caller holds it, so derivatives
+                are rendered without reading the file back
+        """
+        if self._file.closed:
+            return
+        try:
+            if self._header:
+                self._write(self._header)  # too short to be a PNG
+            self._file.flush()
+            if self._sink.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self.path = self._sink._publish(
+                self._temp_path, self._directory, self._model_name,
+                self._digest.hexdigest(), self._name
+            )
+            if self._sink.fsync and self._sync_directory:
+                self._sink._fsync_directory(self._directory)
+            self._sink.instrumentation.add_bytes("written", self._size)
+        except BaseException:
+            self.discard()
+            raise
+        if self._sink.post_processor is not None:
+            self._sink.post_processor.submit(data, self.path)
+
+    def discard(self):
+        """Abandon the image without publishing it."""
+        if not self._file.closed:
+            self._file.close()
+        Path(self._temp_path).unlink(missing_ok=True)
+
+    def __enter__(self) -> "AtomicImageFile":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class FileSystemSink(OutputSink):
+    """Writes images to a local directory.
+
+    Images are decoded and written in parallel on a thread pool. Each one is
+    written to a temporary file and then atomically given a unique name, so
+    readers never see partial images and concurrent writers never overwrite
+    each other.
+
+    Two naming schemes are available:
+
+    - ``sequence``: ``<model>_image_<timestamp>_<n>.png`` with ``n`` counting
+      up per sink, skipping any name already on disk.
+    - ``hash``: ``<model>_<sha256 prefix>.png``; identical images share a
+      file.
+
+    Images saved with explicit ``names`` bypass the scheme and atomically
+    replace any file of that name.
+
+    With ``fsync`` on, each image is flushed to stable storage and the
+    directory entry for a whole batch is synced once at the end.
+
+    A ``PostProcessor`` embeds each image's payload as it is written and
+    renders derivatives once it is published, from the decoded bytes, or
+    from the file for images streamed through ``open_image``.
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        naming: Optional[str] = None,
+        fsync: Optional[bool] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        post_processor: Optional["PostProcessor"] = None
+    ):
+        """Initialize the sink.
+
+        Args:
+            output_dir: Default directory to save images to
+            max_workers: Threads decoding and writing images
+            naming: Naming scheme, ``sequence`` or ``hash``
+            fsync: Flush images to stable storage before returning
+            instrumentation: Receives decode/write timings and bytes written
+            post_processor: Embeds metadata and renders derivatives of
+                saved images; closed with the sink
+
+        Raises:
+            ValueError: If the naming scheme is unknown
+        """
+        self.output_dir = output_dir
+        self.naming = naming or settings.OUTPUT_NAMING
+        if self.naming not in NAMING_SCHEMES:
+            raise ValueError(f"Unknown naming scheme: {self.naming}")
+        self.fsync = settings.OUTPUT_FSYNC if fsync is None else fsync
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+        self.max_workers = max_workers or settings.OUTPUT_WORKERS
+        self.post_processor = post_processor
+        self._executor = None  # started by the first multi-image save
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def directory(self, output_dir: Optional[str] = None) -> Path:
+        """Resolve and create the directory to write into."""
+        directory = Path(
+            output_dir or self.output_dir or settings.OUTPUT_DIR or "generated_images"
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def save(
+        self,
+        images: List[str],
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> List[str]:
+        return self._save(self._write, images, model_name, output_dir, names, metadata)
+
+    def save_decoded(
+        self,
+        images: List[bytes],
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        names: Optional[List[str]] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None
+    ) -> List[str]:
+        return self._save(
+            self._write_decoded, images, model_name, output_dir, names, metadata
+        )
+
+    def _save(
+        self,
+        write: Callable[..., str],
+        images: List[Any],
+        model_name: Optional[str],
+        output_dir: Optional[str],
+        names: Optional[List[str]],
+        metadata: Optional[List[Dict[str, Any]]]
+    ) -> List[str]:
+        directory = self.directory(output_dir)
+        if names is not None and len(names) != len(images):
+            raise ValueError(f"Got {len(names)} names for {len(images)} images")
+        if metadata is not None and len(metadata) != len(images):
+            raise ValueError(f"Got {len(metadata)} metadata entries for {len(images)} images")
+        names = names or [None] * len(images)
+        metadata = metadata or [None] * len(images)
+        if len(images) == 1:
+            paths = [write(images[0], directory, model_name, names[0], metadata[0])]
+        else:
+            executor = self._writers()
+            futures = [
+                executor.submit(write, image, directory, model_name, name, payload)
+                for image, name, payload in zip(images, names, metadata)
+            ]
+            paths = [future.result() for future in futures]
+        if self.fsync:
+            self._fsync_directory(directory)
+        return paths
+
+    def open_image(
+        self,
+        model_name: Optional[str] = None,
+        output_dir: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> AtomicImageFile:
+        return AtomicImageFile(
+            self, self.directory(output_dir), model_name,
+            metadata=metadata, sync_directory=True
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self.post_processor is not None:
+            self.post_processor.close()
+
+    def _writers(self):
+        """Return the writer thread pool, starting it on first use."""
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="draw-things-writer"
+                )
+            return self._executor
+
+    def _write(
+        self,
+        image: str,
+        directory: Path,
+        model_name: Optional[str],
+        name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        with self.instrumentation.span("decode"):
+            data = binascii.a2b_base64(image)
+        return self._write_decoded(data, directory, model_name, name, metadata)
+
+    def _write_decoded(
+        self,
+        data: bytes,
+        directory: Path,
+        model_name: Optional[str],
+        name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        with self.instrumentation.span("write"):
+            f = AtomicImageFile(self, directory, model_name, name, metadata)
+            try:
+                f.write(data)
+            except BaseException:
+                f.discard()
+                raise
+            f.close(data)
+        return f.path
+
+    def _candidates(self, model_name: Optional[str], digest: str):
+        prefix = f"{model_name}_" if model_name else ""
+        if self.naming == "hash":
+            yield f"{prefix}{digest[:16]}.png"
+            # A different image with the same prefix: extend the hash
+            yield f"{prefix}{digest}.png"
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        while True:
+            with self._lock:
+                sequence = next(self._sequence)
+            yield f"{prefix}image_{timestamp}_{sequence}.png"
+
+    def _publish(
+        self,
+        temp_path: str,
+        directory: Path,
+        model_name: Optional[str],
+        digest: str,
+        name: Optional[str] = None
+    ) -> str:
+        try:
+            if name is not None:
+                target = directory / name
+                os.replace(temp_path, target)
+                return str(target)
+            for filename in self._candidates(model_name, digest):
+                target = directory / filename
+                try:
+                    _claim(temp_path, target)
+                    return str(target)
+                except FileExistsError:
+                    if self.naming == "hash" and _same_digest(target, digest):
+                        return str(target)
+            raise FileExistsError(f"No free file name for image {digest[:16]}")
+        finally:
+            Path(temp_path).unlink(missing_ok=True)
+
+    def _fsync_directory(self, directory: Path):
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # directories can't be opened on every platform
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _same_digest(path: Path, digest: str) -> bool:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest() == digest
+
+
+def _claim(temp_path: str, target: Path):
+    """Atomically move a finished file to target unless target exists.
+
+    Raises:
+        FileExistsError: If target is already taken
+    """
+    try:
+        os.link(temp_path, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard links on this filesystem: reserve the name, then replace
+        # the placeholder with the finished file
+        os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        try:
+            os.replace(temp_path, target)
+        except OSError:
+            os.unlink(target)
+            raise
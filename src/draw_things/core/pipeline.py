@@ -0,0 +1,262 @@
+"""
+Pipelined generation: requests, decoding and disk writes overlap.
+"""
+
+import binascii
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ..config.settings import settings
+from .manifest import ResultManifest, result_key
+
+_DONE = object()
+_POLL = 0.1
+
+
+class _Item:
+    """One job as it moves through the pipeline."""
+
+    def __init__(self, index: int, job: Dict[str, Any]):
+        self.index = index
+        self.job = job
+        self.payload: Dict[str, Any] = {}
+        self.images: List[Any] = []
+        self.paths: List[str] = []
+        self.error: Optional[BaseException] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.key: Optional[str] = None
+        self.resumed = False
+
+    def record(self) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"index": self.index, "job": self.job, "paths": self.paths}
+        if self.resumed:
+            record["resumed"] = True
+        if self.started is not None:
+            finished = self.finished or time.monotonic()
+            record["seconds"] = round(finished - self.started, 3)
+        if self.error is None:
+            record["status"] = "ok"
+        else:
+            record["status"] = "error"
+            record["error"] = str(self.error)
+        return record
+
+
+class GenerationPipeline:
+    """Producer/consumer pipeline from job specs to saved images.
+
+    Jobs flow through three stages with a bounded queue between each:
+
+    - request: ``request_workers`` threads send payloads to the server
+    - decode: ``decode_workers`` threads base64-decode the returned images
+    - write: ``write_workers`` threads store the images with the sink's
+      ``save_decoded``
+
+    While earlier results are decoded and persisted the request stage is
+    already waiting on the next responses, so the server never sits idle
+    behind disk I/O. Bounded queues keep memory flat: when writing or the
+    consumer falls behind, the stages upstream block instead of piling up
+    images.
+
+    A failing job does not stop the pipeline; its record carries the error.
+
+    Given a ``ResultManifest``, jobs it already holds are not run again:
+    their records come straight back with the stored paths and
+    ``resumed: True``, and every job saved is added to it.
+    """
+
+    def __init__(
+        self,
+        generator: Any,
+        request_workers: Optional[int] = None,
+        decode_workers: int = 1,
+        write_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        manifest: Optional[ResultManifest] = None
+    ):
+        """Initialize the pipeline.
+
+        Args:
+            generator: ImageGenerator used for requests and whose sink stores
+                the images
+            request_workers: Requests in flight at once
+            decode_workers: Threads decoding images
+            write_workers: Threads writing images
+            queue_size: Capacity of each queue between stages
+            manifest: Index of finished jobs to skip and record into
+        """
+        self.generator = generator
+        self.request_workers = request_workers or settings.MAX_CONCURRENCY
+        self.decode_workers = decode_workers
+        self.write_workers = write_workers or settings.OUTPUT_WORKERS
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.manifest = manifest
+
+    def run(
+        self,
+        jobs: Iterable[Dict[str, Any]],
+        output_dir: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate and save images for each job, yielding as jobs finish.
+
+        The job iterable is consumed lazily, so it may be a generator of
+        unbounded length. Stopping iteration early cancels the remaining jobs.
+
+        Args:
+            jobs: Keyword-argument dicts for ``ImageGenerator.build_payload``
+            output_dir: Directory to save images to
+
+        Yields:
+            One record per job, in completion order: ``index`` (position in
+            ``jobs``), ``job``, ``status`` (``ok`` or ``error``), ``paths``,
+            ``seconds`` from sending the request until the images were saved
+            (absent if it was never sent) and, on failure, ``error``
+
+        Raises:
+            Exception: Whatever iterating ``jobs`` raised, once the jobs read
+                before it have finished
+        """
+        cancelled = threading.Event()
+        requests: "queue.Queue[Any]" = queue.Queue(self.queue_size)
+        decodes: "queue.Queue[Any]" = queue.Queue(self.queue_size)
+        writes: "queue.Queue[Any]" = queue.Queue(self.queue_size)
+        results: "queue.Queue[Any]" = queue.Queue(self.queue_size)
+        feed_errors: List[BaseException] = []
+
+        def write(item: _Item):
+            # The sink's own save path, for the same durability and metadata
+            item.paths = self.generator.sink.save_decoded(
+                item.images, item.payload.get("model"), output_dir,
+                metadata=[item.payload] * len(item.images)
+            )
+            item.finished = time.monotonic()
+            if self.manifest is not None:
+                self.manifest.add(item.key, item.record())
+
+        threads = [threading.Thread(
+            target=self._feed, args=(jobs, requests, results, cancelled, feed_errors),
+            name="draw-things-pipeline-feed", daemon=True
+        )]
+        threads += self._stage("request", self._request, self.request_workers,
+                               requests, decodes, cancelled)
+        threads += self._stage("decode", self._decode, self.decode_workers,
+                               decodes, writes, cancelled)
+        threads += self._stage("write", write, self.write_workers,
+                               writes, results, cancelled)
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                yield item.record()
+        finally:
+            cancelled.set()
+            for thread in threads:
+                thread.join()
+        if feed_errors:
+            raise feed_errors[0]
+
+    def _feed(self, jobs: Iterable[Dict[str, Any]], outbox: queue.Queue, results: queue.Queue,
+              cancelled: threading.Event, errors: List[BaseException]):
+        try:
+            for index, job in enumerate(jobs):
+                item = _Item(index, job)
+                try:
+                    item.payload = self.generator.build_payload(**job)
+                except Exception as e:
+                    item.error = e
+                # Jobs the manifest already holds skip the stages entirely
+                if self.manifest is not None and item.error is None:
+                    item.key = result_key(item.payload, index)
+                    done = self.manifest.get(item.key)
+                    if done is not None:
+                        item.paths, item.resumed = done["paths"], True
+                        if not _put(results, item, cancelled):
+                            return
+                        continue
+                if not _put(outbox, item, cancelled):
+                    return
+        except Exception as e:
+            errors.append(e)
+        _put(outbox, _DONE, cancelled)
+
+    def _request(self, item: _Item):
+        item.started = time.monotonic()
+        item.images = self.generator.generate_from_payload(item.payload)
+
+    def _decode(self, item: _Item):
+        with self.generator.instrumentation.span("decode"):
+            item.images = [binascii.a2b_base64(image) for image in item.images]
+
+    def _stage(
+        self,
+        name: str,
+        func: Callable[[_Item], None],
+        workers: int,
+        inbox: queue.Queue,
+        outbox: queue.Queue,
+        cancelled: threading.Event
+    ) -> List[threading.Thread]:
+        """Create the worker threads of one stage.
+
+        Items that already failed pass straight through. The end-of-jobs
+        marker is put back for sibling workers, and the last worker to see it
+        forwards it downstream.
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                item = _get(inbox, cancelled)
+                if item is None:
+                    return
+                if item is _DONE:
+                    inbox.put(_DONE)
+                    with lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last:
+                        _put(outbox, _DONE, cancelled)
+                    return
+                if item.error is None:
+                    try:
+                        func(item)
+                    except Exception as e:
+                        item.error = e
+                if item.error is not None:
+                    item.images = []
+                if not _put(outbox, item, cancelled):
+                    return
+
+        return [
+            threading.Thread(target=work, name=f"draw-things-pipeline-{name}", daemon=True)
+            for _ in range(workers)
+        ]
+
+
+def _put(outbox: queue.Queue, item: Any, cancelled: threading.Event) -> bool:
+    """Put an item, giving up if the pipeline is cancelled."""
+    while not cancelled.is_set():
+        try:
+            outbox.put(item, timeout=_POLL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(inbox: queue.Queue, cancelled: threading.Event) -> Any:
+    """Get an item, or None once the pipeline is cancelled."""
+    while not cancelled.is_set():
+        try:
+            return inbox.get(timeout=_POLL)
+        except queue.Empty:
+            continue
+    return None
@@ -0,0 +1,300 @@
+"""
+Post-processing of saved images: derivatives and embedded metadata.
+
+Derivatives (thumbnails, WebP or JPEG copies) are rendered from the image
+bytes already decoded in memory, in a process pool, so the CPU work runs on
+every core instead of the request thread and nothing is read back from
+disk. Streamed images are never whole in memory, so theirs are rendered
+from the saved file. Rendering requires Pillow
+(``pip install 'draw-things[images]'``).
+
+Generation parameters are embedded as PNG text chunks with the standard
+library alone.
+"""
+
+import importlib.util
+import os
+import struct
+import threading
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set
+
+from ..config.settings import settings
+from .output import PNG_SIGNATURE, create_temp_file
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+# Pillow format name -> file extension
+EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data)) + kind + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def embed_png_text(data: bytes, text: Dict[str, str]) -> bytes:
+    """Return a PNG with text chunks added right after its header.
+
+    Values that fit Latin-1 are stored as ``tEXt`` chunks, anything else as
+    uncompressed ``iTXt`` (UTF-8). Data that is not a PNG is returned
+    unchanged.
+
+    Args:
+        data: PNG file contents
+        text: Keyword (1-79 Latin-1 characters) to text
+
+    Returns:
+        The PNG with one chunk per keyword
+    """
+    if not data.startswith(PNG_SIGNATURE) or data[12:16] != b"IHDR":
+        return data
+    end = len(PNG_SIGNATURE) + 12 + struct.unpack(">I", data[8:12])[0]
+    chunks = []
+    for keyword, value in text.items():
+        key = keyword.encode("latin-1")
+        try:
+            chunks.append(_chunk(b"tEXt", key + b"\0" + value.encode("latin-1")))
+        except UnicodeEncodeError:
+            chunks.append(_chunk(b"iTXt", key + b"\0\0\0\0\0" + value.encode("utf-8")))
+    return data[:end] + b"".join(chunks) + data[end:]
+
+
+def read_png_text(data: bytes) -> Dict[str, str]:
+    """Return the ``tEXt`` and uncompressed ``iTXt`` chunks of a PNG."""
+    text: Dict[str, str] = {}
+    position = len(PNG_SIGNATURE)
+    while position + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        if kind == b"tEXt":
+            key, _, value = body.partition(b"\0")
+            text[key.decode("latin-1")] = value.decode("latin-1")
+        elif kind == b"iTXt" and body.partition(b"\0")[2][:1] == b"\0":
+            key, _, rest = body.partition(b"\0")
+            _, _, rest = rest[2:].partition(b"\0")  # language tag
+            _, _, value = rest.partition(b"\0")  # translated keyword
+            text[key.decode("latin-1")] = value.decode("utf-8")
+        elif kind == b"IEND":
+            break
+        position += 12 + length
+    return text
+
+
+class Derivative:
+    """One extra file rendered from each saved image.
+
+    The file is written next to the image as ``<stem><suffix>.<ext>``, e.g.
+    ``Derivative("_thumb", "WEBP", max_size=256)`` turns ``cat.png`` into
+    ``cat_thumb.webp``.
+    """
+
+    def __init__(
+        self,
+        suffix: str,
+        format: str = "PNG",
+        max_size: Optional[int] = None,
+        quality: Optional[int] = None
+    ):
+        """Describe the derivative.
+
+        Args:
+            suffix: Added to the image's file name stem
+            format: ``PNG``, ``JPEG`` or ``WEBP``
+            max_size: Longest side in pixels; the aspect ratio is kept and
+                images are never enlarged (defaults to the full size)
+            quality: Encoder quality for ``JPEG`` and ``WEBP``
+
+        Raises:
+            ValueError: If the format is unknown or the suffix is empty
+        """
+        self.format = format.upper()
+        if self.format not in EXTENSIONS:
+            raise ValueError(f"Unknown derivative format: {format}")
+        if not suffix:
+            raise ValueError("Derivatives need a suffix so they never replace the image")
+        self.suffix = suffix
+        self.max_size = max_size
+        self.quality = quality
+
+    def path_for(self, path: str) -> str:
+        """Return the derivative's path for the image at path."""
+        return f"{os.path.splitext(path)[0]}{self.suffix}.{EXTENSIONS[self.format]}"
+
+
+def render_derivatives(
+    data: Optional[bytes],
+    path: str,
+    derivatives: Sequence[Derivative]
+) -> List[str]:
+    """Render derivatives of one image and write them atomically.
+
+    Runs in the post-processing worker processes.
+
+    Args:
+        data: Encoded image, as saved, or None to read it from path
+        path: Where the image was saved
+        derivatives: Files to render
+
+    Returns:
+        Paths of the files written, in the order of derivatives
+    """
+    from io import BytesIO
+
+    from PIL import Image
+
+    written = []
+    with Image.open(path if data is None else BytesIO(data)) as source:
+        source.load()
+        for derivative in derivatives:
+            image = source
+            if derivative.max_size:
+                image = source.copy()
+                image.thumbnail((derivative.max_size, derivative.max_size))
+            if derivative.format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            options: Dict[str, Any] = {}
+            if derivative.quality is not None:
+                options["quality"] = derivative.quality
+            target = derivative.path_for(path)
+            fd, temp_path = create_temp_file(os.path.dirname(target) or ".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, format=derivative.format, **options)
+                os.replace(temp_path, target)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            written.append(target)
+    return written
+
+
+class PostProcessor:
+    """Post-processing stage for a ``FileSystemSink``.
+
+    For every image the sink saves, the processor can embed the request
+    payload as a ``parameters`` PNG text chunk before the file is written,
+    and renders the configured derivatives from the same decoded bytes (or,
+    for streamed images, from the saved file) in a process pool. Saving
+    returns as soon as the image itself is written; ``wait`` (or closing the
+    sink) waits for the derivatives.
+
+    Example:
+        processor = PostProcessor([
+            Derivative("_thumb", "WEBP", max_size=256, quality=80),
+            Derivative("_full", "JPEG", quality=90),
+        ])
+        client = DrawThingsClient(sink=FileSystemSink(post_processor=processor))
+    """
+
+    def __init__(
+        self,
+        derivatives: Sequence[Derivative] = (),
+        embed_metadata: bool = True,
+        workers: Optional[int] = None,
+        executor: Optional["Executor"] = None
+    ):
+        """Initialize the stage.
+
+        Args:
+            derivatives: Files to render from each image
+            embed_metadata: Store the request payload in each PNG
+            workers: Rendering processes (defaults to
+                ``settings.POSTPROCESS_WORKERS``, or one per CPU)
+            executor: Executor to render on instead of a process pool of
+                its own; it is not shut down by ``close``
+
+        Raises:
+            ImportError: If derivatives are requested and Pillow is not
+                installed
+        """
+        self.derivatives = list(derivatives)
+        if self.derivatives and importlib.util.find_spec("PIL") is None:
+            raise ImportError(
+                "Image derivatives require Pillow: pip install 'draw-things[images]'"
+            )
+        self.embed_metadata = embed_metadata
+        self.workers = workers or settings.POSTPROCESS_WORKERS or os.cpu_count() or 1
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._pending: Set["Future"] = set()  # dropped as they finish
+        self._error: Optional[BaseException] = None  # first since the last wait
+        self._lock = threading.Lock()
+
+    def submit(self, data: Optional[bytes], path: str) -> Optional["Future"]:
+        """Queue the derivatives of an image saved at path.
+
+        Args:
+            data: The image's bytes, or None to read them from path
+            path: Where the image was saved
+
+        Returns:
+            Future for the list of derivative paths, or None if there are
+            no derivatives to render
+        """
+        if not self.derivatives:
+            return None
+        future = self._pool().submit(render_derivatives, data, path, self.derivatives)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: "Future"):
+        """Forget a finished render, keeping its error for ``wait``."""
+        with self._lock:
+            if future not in self._pending:
+                return
+            self._pending.remove(future)
+            if not future.cancelled() and self._error is None:
+                self._error = future.exception()
+
+    def wait(self):
+        """Wait for every queued derivative.
+
+        Finished renders are not kept, so a long-lived processor holds on
+        to nothing but the first error; use the futures ``submit`` returns
+        to collect derivative paths.
+
+        Raises:
+            Exception: The first error raised while rendering since the last
+                ``wait``, once every queued image has been processed
+        """
+        from concurrent.futures import wait
+
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+        for future in pending:
+            # Callbacks may still be running when wait returns
+            self._finished(future)
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        """Wait for queued derivatives and stop the worker processes."""
+        try:
+            self.wait()
+        finally:
+            if self._owns_executor and self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _pool(self) -> "Executor":
+        """Return the executor, starting the process pool on first use."""
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawned, not forked: the parent has writer and request
+                # threads whose locks a forked child could inherit held
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
@@ -0,0 +1,210 @@
+"""
+Progress reporting and cancellation for generations in flight.
+
+A generation request blocks until its images are ready, which takes a
+while for large renders. ``ProgressWatcher`` polls the server's progress
+endpoint on a background thread meanwhile, reporting steps and ETA, and can
+cancel the generation through the server's interrupt endpoint.
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from .image_generator import ImageGenerator
+
+
+class Progress:
+    """One progress report from the server.
+
+    Attributes:
+        fraction: Share of the job done, from 0 to 1
+        eta: Estimated seconds until the job finishes
+        step: Sampling steps done
+        steps: Sampling steps in total
+        image: Base64 preview of the image so far, if requested and sent
+        active: Whether the server is running a job
+        raw: The server's response as received
+    """
+
+    def __init__(
+        self,
+        fraction: float = 0.0,
+        eta: float = 0.0,
+        step: int = 0,
+        steps: int = 0,
+        image: Optional[str] = None,
+        active: bool = False,
+        raw: Optional[Dict[str, Any]] = None
+    ):
+        self.fraction = fraction
+        self.eta = eta
+        self.step = step
+        self.steps = steps
+        self.image = image
+        self.active = active
+        self.raw = raw or {}
+
+    @classmethod
+    def from_response(cls, result: Dict[str, Any]) -> "Progress":
+        """Parse a ``/progress`` response, tolerating missing fields."""
+        state = result.get("state") or {}
+        fraction = float(result.get("progress") or 0.0)
+        return cls(
+            fraction=fraction,
+            eta=float(result.get("eta_relative") or 0.0),
+            step=int(state.get("sampling_step") or 0),
+            steps=int(state.get("sampling_steps") or 0),
+            image=result.get("current_image"),
+            active=bool(state.get("job_count")) or fraction > 0,
+            raw=result
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Progress(step={self.step}/{self.steps}, "
+            f"fraction={self.fraction:.2f}, eta={self.eta:.1f}s)"
+        )
+
+
+class ProgressWatcher:
+    """Polls a server's progress while a generation runs.
+
+    Use it as a context manager around a blocking generation call, or pass
+    it as ``progress`` to ``DrawThingsClient.generate_image``. Each report
+    that differs from the last goes to ``on_progress`` from the polling
+    thread.
+
+    The polling interval adapts to the render: it starts at
+    ``min_interval``, settles at about one poll per sampling step once steps
+    start advancing, and backs off towards ``max_interval`` while nothing
+    changes. Servers without a progress endpoint are polled once.
+
+    The server reports on its current job only, so with several servers
+    give the URL of the one doing the work.
+    """
+
+    def __init__(
+        self,
+        generator: "ImageGenerator",
+        on_progress: Optional[Callable[[Progress], None]] = None,
+        url: Optional[str] = None,
+        preview: bool = False,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None
+    ):
+        """Initialize the watcher.
+
+        Args:
+            generator: ImageGenerator whose server to poll
+            on_progress: Called with each new report
+            url: API URL of the server (defaults to the generator's first)
+            preview: Ask for a preview of the image so far with each report
+            min_interval: Shortest seconds between polls
+            max_interval: Longest seconds between polls
+        """
+        self.generator = generator
+        self.on_progress = on_progress
+        self.url = url
+        self.preview = preview
+        self.min_interval = min_interval or settings.PROGRESS_MIN_INTERVAL
+        self.max_interval = max(max_interval or settings.PROGRESS_MAX_INTERVAL, self.min_interval)
+        self.latest: Optional[Progress] = None
+        self.supported = True
+        self._cancelled = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether ``cancel`` has been called."""
+        return self._cancelled.is_set()
+
+    @property
+    def running(self) -> bool:
+        """Whether the watcher is polling, i.e. a generation is in flight."""
+        with self._lock:
+            return self._thread is not None
+
+    def start(self):
+        """Start polling on a background thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._poll, name="draw-things-progress", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for the polling thread to finish."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def cancel(self):
+        """Cancel the generation being watched.
+
+        While a generation is in flight the server is told to interrupt it,
+        which frees the GPU straight away; a generation not yet started is
+        refused. Either way the generating call raises
+        ``GenerationCancelledError`` instead of saving images. Calling it
+        again does nothing.
+
+        Raises:
+            ImageGenerationError: If the interrupt request fails
+        """
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        if self.running:
+            self.generator.interrupt(self.url)
+
+    def __enter__(self) -> "ProgressWatcher":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _poll(self):
+        from .image_generator import ImageGenerationError
+
+        interval = self.min_interval
+        last_step: Optional[int] = None
+        last_change = time.monotonic()
+        while not self._stop.wait(interval):
+            try:
+                progress = self.generator.fetch_progress(self.url, preview=self.preview)
+            except ImageGenerationError as e:
+                if getattr(e.__cause__, "code", None) in (404, 405, 501):
+                    self.supported = False
+                    return
+                interval = min(interval * 2, self.max_interval)
+                continue
+            now = time.monotonic()
+            previous = self.latest
+            if last_step is not None and progress.step > last_step:
+                # Poll about once per step
+                per_step = (now - last_change) / (progress.step - last_step)
+                interval = min(max(per_step, self.min_interval), self.max_interval)
+            elif previous is None or progress.fraction == previous.fraction:
+                interval = min(interval * 1.5, self.max_interval)
+            if progress.active and progress.eta:
+                # Don't sleep far past the expected end of the job
+                interval = min(interval, max(progress.eta, self.min_interval))
+            if progress.step != last_step:
+                last_step, last_change = progress.step, now
+            if previous is None or (progress.step, progress.fraction) != (
+                previous.step, previous.fraction
+            ):
+                self.latest = progress
+                if self.on_progress:
+                    self.on_progress(progress)
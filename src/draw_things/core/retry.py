@@ -0,0 +1,95 @@
+"""
+Retry policy and deadlines for server calls.
+"""
+
+import random
+import time
+import urllib.error
+from typing import Optional
+
+from ..config.settings import settings
+from .backends import is_backend_failure
+
+
+def is_retryable(error: Optional[BaseException]) -> bool:
+    """Return whether an error is transient enough to try again.
+
+    Connection failures, timeouts, 5xx responses and 429 Too Many Requests
+    are; other client errors would fail the same way again.
+    """
+    if isinstance(error, urllib.error.HTTPError) and error.code == 429:
+        return True
+    return error is not None and is_backend_failure(error)
+
+
+def _retry_after(error: BaseException) -> float:
+    """Return the seconds a 429/503 response's Retry-After header asks for."""
+    headers = getattr(error, "headers", None)
+    try:
+        return max(0.0, float(headers.get("Retry-After", 0))) if headers else 0.0
+    except (TypeError, ValueError):
+        return 0.0  # an HTTP date; not worth parsing here
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    Attempt ``n`` (counting from 1) waits a random time between zero and
+    ``backoff * 2 ** (n - 1)`` seconds, capped at ``max_backoff``, before the
+    next try. Randomizing the whole interval keeps clients that failed
+    together from retrying in lockstep. A server's Retry-After header sets a
+    floor on the wait.
+    """
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None
+    ):
+        """Initialize the policy.
+
+        Args:
+            max_attempts: Total tries per request, including the first
+                (1 disables retries)
+            backoff: Base delay in seconds
+            max_backoff: Longest delay in seconds
+        """
+        self.max_attempts = max_attempts or settings.RETRY_MAX_ATTEMPTS
+        self.backoff = settings.RETRY_BACKOFF if backoff is None else backoff
+        self.max_backoff = settings.RETRY_MAX_BACKOFF if max_backoff is None else max_backoff
+
+    def should_retry(self, error: Optional[BaseException], attempt: int) -> bool:
+        """Return whether to try again after attempt number ``attempt`` failed."""
+        return attempt < self.max_attempts and is_retryable(error)
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Return the seconds to wait after attempt number ``attempt`` failed."""
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        if error is not None:
+            delay = max(delay, min(self.max_backoff, _retry_after(error)))
+        return delay
+
+
+class Deadline:
+    """A point in time by which a call, retries included, must finish."""
+
+    def __init__(self, seconds: Optional[float]):
+        """Initialize the deadline.
+
+        Args:
+            seconds: Time allowed from now, or None for no deadline
+        """
+        self.seconds = seconds
+        self._expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Return the seconds left (at least 0), or None without a deadline."""
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        """Return whether the deadline has passed."""
+        return self._expires is not None and time.monotonic() >= self._expires
@@ -0,0 +1,199 @@
+"""
+Model-affinity scheduling of generation requests.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+from ..config.settings import settings
+
+
+def model_key(payload: Dict[str, Any]) -> str:
+    """Return the server-side state a payload needs: model plus LoRA set."""
+    loras = payload.get("alwayson_scripts", {}).get("lora", {}).get("args", [])
+    names = sorted(lora.get("model", "") for lora in loras)
+    return f"{payload.get('model', '')}|{','.join(names)}"
+
+
+class _Job:
+    """A queued payload and the future its caller waits on."""
+
+    def __init__(self, payload: Dict[str, Any], key: str):
+        self.payload = payload
+        self.key = key
+        self.future: "Future[List[str]]" = Future()
+        self.enqueued = time.monotonic()
+
+
+class ModelAffinityScheduler:
+    """Queue in front of an ImageGenerator that batches work by model.
+
+    Pending jobs are grouped by model and LoRA set. The scheduler keeps
+    draining the loaded group and only switches once it is empty, so the
+    server reloads checkpoints as rarely as possible. Two fairness bounds
+    stop a busy model from starving the rest: after ``max_group_run``
+    consecutive jobs, or once another group's oldest job has waited
+    ``max_wait`` seconds, the group with the oldest waiting job goes next.
+
+    Up to ``workers`` jobs of the current group run at once; the scheduler
+    lets them finish before moving to another model.
+    """
+
+    def __init__(
+        self,
+        generator: Any,
+        workers: int = 1,
+        max_group_run: Optional[int] = None,
+        max_wait: Optional[float] = None
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            generator: ImageGenerator that runs the jobs
+            workers: Maximum jobs in flight at once
+            max_group_run: Consecutive jobs from one group before others
+                that are waiting get a turn
+            max_wait: Seconds a waiting group's oldest job may wait before it
+                preempts the current group
+        """
+        self.generator = generator
+        self.workers = workers
+        self.max_group_run = max_group_run or settings.SCHEDULER_MAX_GROUP_RUN
+        self.max_wait = settings.SCHEDULER_MAX_WAIT if max_wait is None else max_wait
+        self.jobs = 0
+        self.switches = 0
+        self.fifo_switches = 0
+        self._queues: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._current: Optional[str] = None
+        self._run = 0
+        self._in_flight = 0
+        self._last_submitted: Optional[str] = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="draw-things-scheduler"
+        )
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Dict[str, Any]) -> "Future[List[str]]":
+        """Queue a payload for generation.
+
+        Args:
+            payload: Request payload, as returned by ``build_payload``
+
+        Returns:
+            Future resolving to the payload's base64-encoded images
+        """
+        return self.submit_many([payload])[0]
+
+    def submit_many(self, payloads: List[Dict[str, Any]]) -> List["Future[List[str]]"]:
+        """Queue several payloads at once, before any of them is dispatched.
+
+        Returns:
+            One future per payload, in payload order
+
+        Raises:
+            RuntimeError: If the scheduler has been closed
+        """
+        jobs = [_Job(payload, model_key(payload)) for payload in payloads]
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            for job in jobs:
+                self._queues.setdefault(job.key, deque()).append(job)
+                # What a first-come-first-served queue would have cost
+                if self._last_submitted is not None and job.key != self._last_submitted:
+                    self.fifo_switches += 1
+                self._last_submitted = job.key
+            self._condition.notify_all()
+        return [job.future for job in jobs]
+
+    def metrics(self) -> Dict[str, int]:
+        """Return job and model-switch counters.
+
+        ``switches_avoided`` compares the switches made against those
+        first-come-first-served submission order would have needed.
+        """
+        with self._condition:
+            return {
+                "jobs": self.jobs,
+                "pending": sum(len(queue) for queue in self._queues.values()),
+                "switches": self.switches,
+                "fifo_switches": self.fifo_switches,
+                "switches_avoided": max(0, self.fifo_switches - self.switches),
+            }
+
+    def close(self):
+        """Run every queued job, then stop."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ModelAffinityScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _choose_group(self) -> str:
+        current = self._queues.get(self._current) if self._current else None
+        if current:
+            others = [queue for key, queue in self._queues.items() if key != self._current]
+            if not others:
+                return self._current
+            oldest_wait = time.monotonic() - min(queue[0].enqueued for queue in others)
+            if self._run < self.max_group_run and oldest_wait < self.max_wait:
+                return self._current
+            candidates = {key: q for key, q in self._queues.items() if key != self._current}
+        else:
+            candidates = self._queues
+        return min(candidates, key=lambda key: candidates[key][0].enqueued)
+
+    def _next_job(self) -> Optional[_Job]:
+        if not self._queues or self._in_flight >= self.workers:
+            return None
+        key = self._choose_group()
+        if key != self._current:
+            if self._in_flight:
+                return None  # let the loaded model's jobs finish first
+            if self._current is not None:
+                self.switches += 1
+            self._current = key
+            self._run = 0
+        queue = self._queues[key]
+        job = queue.popleft()
+        if not queue:
+            del self._queues[key]
+        self._run += 1
+        self._in_flight += 1
+        self.jobs += 1
+        return job
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while True:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    if self._closed and not self._queues and not self._in_flight:
+                        return
+                    # Wake periodically so max_wait is honoured while busy
+                    self._condition.wait(timeout=self.max_wait or None)
+            self._executor.submit(self._execute, job)
+
+    def _execute(self, job: _Job):
+        try:
+            job.future.set_result(self.generator.generate_from_payload(job.payload))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
@@ -0,0 +1,71 @@
+"""
+Deduplication of identical in-flight requests.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """A call in progress that later arrivals can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs a function at most once at a time per key.
+
+    Callers that arrive with a key already in flight block until the first
+    caller finishes, then receive its result or re-raise its error. Nothing
+    is remembered once the call completes.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _Call] = {}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Call func, or wait for the identical call already in flight.
+
+        Args:
+            key: Identity of the call
+            func: Function producing the result
+
+        Returns:
+            The result, and whether it was shared from another caller's call
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            shared = call is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+
+        if shared:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of executed and coalesced calls."""
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,138 @@
+"""
+Encoding of source images for img2img and inpainting requests.
+
+Requests carry their init image and mask base64-encoded. Large jobs reuse
+one source across many prompts, so ``SourceImageCache`` keeps encodings in
+memory keyed by content hash: a file is read (through ``mmap``, without
+copying it into a Python buffer) and encoded once, and later requests for
+the same unchanged file reuse the encoding without touching its contents.
+"""
+
+import base64
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from ..config.settings import settings
+
+# A file path, or the encoded image file itself
+Source = Union[str, "os.PathLike[str]", bytes]
+
+# Payload fields holding encoded source images
+SOURCE_FIELDS = ("init_images", "mask")
+
+
+def describe_source(source: Source) -> str:
+    """Return a short description of a source for logs and metadata."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<{len(source)} bytes>"
+    return os.fspath(source)
+
+
+class SourceImageCache:
+    """In-memory LRU cache of base64-encoded source images.
+
+    Encodings are keyed by the SHA-256 of the file contents, so identical
+    images share one entry whatever path or buffer they come from. Files
+    are also remembered by path, size, modification time and inode; a file
+    whose metadata has not changed is served without being read again.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Maximum total length of the cached encodings
+                (defaults to ``settings.SOURCE_CACHE_MAX_BYTES``)
+        """
+        self.max_bytes = settings.SOURCE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._encoded: "OrderedDict[str, str]" = OrderedDict()
+        self._files: Dict[Tuple[str, int, int, int], str] = {}
+        self._total_bytes = 0
+
+    def encode(self, source: Source) -> str:
+        """Return the base64 encoding of a source image.
+
+        Args:
+            source: Path of an image file, or the file contents
+
+        Raises:
+            OSError: If the file cannot be read
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return self._encode_buffer(source)
+        path = os.path.abspath(os.fspath(source))
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            file_key = (path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            with self._lock:
+                digest = self._files.get(file_key)
+                encoded = self._encoded.get(digest) if digest else None
+                if encoded is not None:
+                    self._encoded.move_to_end(digest)
+                    self.hits += 1
+                    return encoded
+            if stat.st_size == 0:
+                return self._encode_buffer(b"", file_key)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return self._encode_buffer(view, file_key)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters and the cache size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._encoded),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self):
+        """Drop every cached encoding."""
+        with self._lock:
+            self._encoded.clear()
+            self._files.clear()
+            self._total_bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._encoded)
+
+    def _encode_buffer(
+        self, data, file_key: Optional[Tuple[str, int, int, int]] = None
+    ) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            encoded = self._encoded.get(digest)
+            if encoded is not None:
+                self._encoded.move_to_end(digest)
+                self.hits += 1
+                if file_key is not None:
+                    self._files[file_key] = digest
+                return encoded
+            self.misses += 1
+        encoded = base64.b64encode(data).decode("ascii")
+        with self._lock:
+            if len(encoded) <= self.max_bytes and digest not in self._encoded:
+                self._encoded[digest] = encoded
+                self._total_bytes += len(encoded)
+                if file_key is not None:
+                    self._files[file_key] = digest
+                self._evict()
+        return encoded
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            digest, encoded = self._encoded.popitem(last=False)
+            self._total_bytes -= len(encoded)
+            self.evictions += 1
+            for file_key in [k for k, d in self._files.items() if d == digest]:
+                del self._files[file_key]
@@ -0,0 +1,197 @@
+"""
+Incremental parsing of txt2img responses.
+
+The API answers with a JSON object whose ``images`` member is an array of
+base64 strings, each several megabytes long. The helpers here walk that
+object as it arrives and decode each image chunk by chunk into a writable
+file, so the response is never held in memory as a whole.
+"""
+
+import binascii
+import json
+from typing import BinaryIO, Callable
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = b" \t\r\n"
+# JSON escapes that may legitimately appear inside a base64 string; the
+# whitespace ones are dropped before decoding.
+_BASE64_ESCAPES = {ord("/"): b"/", ord("n"): b"", ord("r"): b"", ord("t"): b""}
+
+
+def _error(message: str, position: int) -> json.JSONDecodeError:
+    return json.JSONDecodeError(message, "", position)
+
+
+class _Reader:
+    """Buffered byte reader over a file-like object with ``read(n)``."""
+
+    def __init__(self, stream, chunk_size: int):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = b""
+        self._pos = 0
+        self.offset = 0  # bytes consumed before the current buffer
+
+    @property
+    def position(self) -> int:
+        return self.offset + self._pos
+
+    def _fill(self) -> bool:
+        if self._pos < len(self._buffer):
+            return True
+        self.offset += len(self._buffer)
+        self._buffer = self._stream.read(self._chunk_size)
+        self._pos = 0
+        return bool(self._buffer)
+
+    def next_byte(self) -> int:
+        if not self._fill():
+            raise _error("Unexpected end of response", self.position)
+        byte = self._buffer[self._pos]
+        self._pos += 1
+        return byte
+
+    def next_token(self) -> int:
+        """Return the next non-whitespace byte."""
+        while True:
+            byte = self.next_byte()
+            if byte not in _WHITESPACE:
+                return byte
+
+    def expect(self, expected: bytes):
+        byte = self.next_token()
+        if byte != expected[0]:
+            raise _error(f"Expected {expected.decode()!r}", self.position - 1)
+
+    def read_string(self, sink: Callable[[bytes], None]):
+        """Stream the body of a JSON string (after its opening quote) to sink.
+
+        Escapes are resolved only for the characters that occur in base64;
+        other escapes are passed to the sink verbatim, which is harmless for
+        values that are being skipped.
+        """
+        while True:
+            if not self._fill():
+                raise _error("Unterminated string", self.position)
+            buffer, start = self._buffer, self._pos
+            end = len(buffer)
+            quote = buffer.find(b'"', start)
+            backslash = buffer.find(b"\\", start)
+            stop = min(i for i in (quote, backslash, end) if i != -1)
+            if stop > start:
+                sink(buffer[start:stop])
+            self._pos = stop
+            if stop == end:
+                continue
+            self._pos += 1
+            if stop == quote:
+                return
+            escaped = self.next_byte()
+            sink(_BASE64_ESCAPES.get(escaped, b"\\" + bytes([escaped])))
+
+    def read_key(self) -> str:
+        parts = []
+        self.read_string(parts.append)
+        return b"".join(parts).decode("utf-8")
+
+    def skip_value(self, first: int):
+        """Skip a JSON value whose first byte has already been consumed."""
+        if first == ord('"'):
+            self.read_string(lambda chunk: None)
+            return
+        if first in b"{[":
+            depth = 1
+            while depth:
+                byte = self.next_byte()
+                if byte == ord('"'):
+                    self.read_string(lambda chunk: None)
+                elif byte in b"{[":
+                    depth += 1
+                elif byte in b"}]":
+                    depth -= 1
+            return
+        # Scalar: number, true, false or null
+        while self._fill():
+            byte = self._buffer[self._pos]
+            if byte in b",}]" or byte in _WHITESPACE:
+                return
+            self._pos += 1
+
+    def drain(self):
+        while self._stream.read(self._chunk_size):
+            pass
+
+
+class _Base64Writer:
+    """Decode base64 text in arbitrary pieces, writing bytes as they complete."""
+
+    def __init__(self, output: BinaryIO):
+        self._output = output
+        self._pending = b""
+
+    def write(self, data: bytes):
+        data = self._pending + data
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._output.write(binascii.a2b_base64(data[:usable]))
+        self._pending = data[usable:]
+
+    def flush(self):
+        if self._pending:
+            padded = self._pending + b"=" * (-len(self._pending) % 4)
+            self._output.write(binascii.a2b_base64(padded))
+            self._pending = b""
+
+
+def stream_images(
+    stream,
+    open_image: Callable[[int], BinaryIO],
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Decode the ``images`` of a txt2img response straight into files.
+
+    Args:
+        stream: Readable response body
+        open_image: Called with each image's index; returns a writable binary
+            file, which is closed once the image has been written
+        chunk_size: Number of bytes to read from the stream at a time
+
+    Returns:
+        Number of images written, or 0 if the response has no ``images`` member
+
+    Raises:
+        json.JSONDecodeError: If the response is not a valid JSON object
+        binascii.Error: If an image is not valid base64
+    """
+    reader = _Reader(stream, chunk_size)
+    count = 0
+    reader.expect(b"{")
+    byte = reader.next_token()
+    while byte != ord("}"):
+        if byte != ord('"'):
+            raise _error("Expected object key", reader.position - 1)
+        key = reader.read_key()
+        reader.expect(b":")
+        first = reader.next_token()
+        if key == "images" and first == ord("["):
+            byte = reader.next_token()
+            while byte != ord("]"):
+                if byte != ord('"'):
+                    raise _error("Expected image string", reader.position - 1)
+                with open_image(count) as output:
+                    writer = _Base64Writer(output)
+                    reader.read_string(writer.write)
+                    writer.flush()
+                count += 1
+                byte = reader.next_token()
+                if byte == ord(","):
+                    byte = reader.next_token()
+        else:
+            reader.skip_value(first)
+        byte = reader.next_token()
+        if byte == ord(","):
+            byte = reader.next_token()
+    # Consume any trailing bytes so the connection can be reused
+    reader.drain()
+    return count
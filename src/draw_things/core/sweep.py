@@ -0,0 +1,261 @@
+"""
+Parallel prompt x model x seed x sampler sweeps.
+"""
+
+import hashlib
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from ..config.settings import settings
+from .manifest import ResultManifest, result_key
+
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+MANIFEST_FILENAME = "manifest.json"
+
+
+class SweepJob:
+    """One cell of a sweep grid."""
+
+    def __init__(
+        self,
+        prompt: str,
+        model: str,
+        seed: int = -1,
+        sampler: Optional[str] = None,
+        loras: Optional[List[str]] = None,
+        **params: Any
+    ):
+        """Initialize the job.
+
+        Args:
+            prompt: Text prompt for image generation
+            model: Model to use for generation
+            seed: Random seed (-1 for random)
+            sampler: Sampler to use for generation
+            loras: List of LoRA models to apply
+            **params: Further ``generate_image`` arguments shared by the sweep,
+                such as width, height or steps
+        """
+        self.prompt = prompt
+        self.model = model
+        self.seed = seed
+        self.sampler = sampler
+        self.loras = list(loras or [])
+        self.params = params
+
+    @property
+    def job_id(self) -> str:
+        """Stable identifier of the job, used to resume sweeps."""
+        canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def model_key(self) -> str:
+        """The server-side state the job needs loaded: model plus LoRA set."""
+        return json.dumps([self.model, sorted(self.loras)])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the job's parameters."""
+        job = dict(self.params)
+        job.update(
+            prompt=self.prompt, model=self.model, seed=self.seed,
+            sampler=self.sampler, loras=self.loras
+        )
+        return job
+
+    def __repr__(self) -> str:
+        return f"SweepJob({self.to_dict()!r})"
+
+
+def build_grid(
+    prompts: Sequence[str],
+    models: Sequence[str],
+    seeds: Sequence[int] = (-1,),
+    samplers: Sequence[Optional[str]] = (None,),
+    loras: Optional[List[str]] = None,
+    **params: Any
+) -> List[SweepJob]:
+    """Build every combination of prompt, model, seed and sampler.
+
+    Args:
+        prompts: Prompts to sweep
+        models: Models to sweep
+        seeds: Seeds to sweep
+        samplers: Samplers to sweep (None for the default sampler)
+        loras: LoRA models applied to every job
+        **params: Further ``generate_image`` arguments shared by every job
+
+    Returns:
+        Jobs ordered by model, so each model is loaded once
+    """
+    return [
+        SweepJob(prompt, model, seed, sampler, loras, **params)
+        for model, prompt, seed, sampler in itertools.product(
+            models, prompts, seeds, samplers
+        )
+    ]
+
+
+def order_by_model(jobs: Iterable[SweepJob]) -> List[List[SweepJob]]:
+    """Group jobs by model and LoRA set, in order of first appearance.
+
+    Switching checkpoints is the costly operation on the server, so running
+    each group to completion before the next loads every model exactly once.
+    """
+    groups: Dict[str, List[SweepJob]] = {}
+    for job in jobs:
+        groups.setdefault(job.model_key, []).append(job)
+    return list(groups.values())
+
+
+class SweepRunner:
+    """Runs sweep jobs on a worker pool with checkpointing and a manifest.
+
+    Jobs run one model group at a time; within a group up to ``workers``
+    requests are in flight. Every finished job is appended to a checkpoint
+    file in the output directory, so a crashed sweep restarted on the same
+    directory skips the jobs that already succeeded. A ``manifest.json``
+    summarizing every job is written when the sweep ends.
+
+    A ``ResultManifest`` shared between sweeps extends this across output
+    directories: jobs whose payload it already holds are not run again.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        output_dir: str,
+        workers: Optional[int] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        manifest: Optional[ResultManifest] = None
+    ):
+        """Initialize the runner.
+
+        Args:
+            client: DrawThingsClient (or compatible) used to generate images
+            output_dir: Directory for images, checkpoint and manifest
+            workers: Maximum requests in flight at once
+            on_result: Called with each job's result record as it finishes
+            manifest: Index of finished payloads to skip and record into;
+                needs a client with ``build_payload``
+        """
+        self.client = client
+        self.output_dir = Path(output_dir)
+        self.workers = workers or settings.MAX_CONCURRENCY
+        self.on_result = on_result
+        self.manifest = manifest
+        self.checkpoint_path = self.output_dir / CHECKPOINT_FILENAME
+        self.manifest_path = self.output_dir / MANIFEST_FILENAME
+        self._lock = threading.Lock()
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """Return the successful records from a previous run, by job id."""
+        records: Dict[str, Dict[str, Any]] = {}
+        if not self.checkpoint_path.exists():
+            return records
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                if record.get("status") == "ok":
+                    records[record["job_id"]] = record
+        return records
+
+    def run(self, jobs: Iterable[SweepJob]) -> List[Dict[str, Any]]:
+        """Run the jobs, skipping any completed by an earlier run.
+
+        Args:
+            jobs: Jobs to run
+
+        Returns:
+            One result record per job, in the order the jobs finished
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        started = datetime.now().isoformat()
+        done = self.completed()
+        records: List[Dict[str, Any]] = []
+
+        with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for group in order_by_model(jobs):
+                pending = []
+                for job in group:
+                    if job.job_id in done:
+                        records.append(dict(done[job.job_id], resumed=True))
+                        continue
+                    indexed = self._indexed(job)
+                    if indexed is not None:
+                        records.append(dict(
+                            indexed, job_id=job.job_id, job=job.to_dict(), resumed=True
+                        ))
+                    else:
+                        pending.append(job)
+                # Checkpoint each job as soon as it finishes, not in submission
+                # order, so a slow job can't hold finished ones back from a crash
+                futures = [executor.submit(self._run_job, job) for job in pending]
+                for future in as_completed(futures):
+                    record = future.result()
+                    with self._lock:
+                        checkpoint.write(json.dumps(record) + "\n")
+                        checkpoint.flush()
+                    records.append(record)
+                    if self.on_result:
+                        self.on_result(record)
+
+        self._write_manifest(started, records)
+        return records
+
+    @staticmethod
+    def _request(job: SweepJob) -> Dict[str, Any]:
+        request = job.to_dict()
+        if request["sampler"] is None:
+            del request["sampler"]
+        return request
+
+    def _manifest_key(self, job: SweepJob) -> str:
+        return result_key(self.client.build_payload(**self._request(job)))
+
+    def _indexed(self, job: SweepJob) -> Optional[Dict[str, Any]]:
+        """Return the manifest's record of an identical earlier job, if any."""
+        if self.manifest is None:
+            return None
+        return self.manifest.get(self._manifest_key(job))
+
+    def _run_job(self, job: SweepJob) -> Dict[str, Any]:
+        request = self._request(job)
+        request["output_dir"] = str(self.output_dir)
+        record: Dict[str, Any] = {"job_id": job.job_id, "job": job.to_dict()}
+        start = time.monotonic()
+        try:
+            record["paths"] = self.client.generate_image(**request)
+            record["status"] = "ok"
+        except Exception as e:
+            record["paths"] = []
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["seconds"] = round(time.monotonic() - start, 3)
+        if self.manifest is not None and record["status"] == "ok":
+            self.manifest.add(self._manifest_key(job), record)
+        return record
+
+    def _write_manifest(self, started: str, records: List[Dict[str, Any]]):
+        manifest = {
+            "started": started,
+            "finished": datetime.now().isoformat(),
+            "total": len(records),
+            "succeeded": sum(record["status"] == "ok" for record in records),
+            "failed": sum(record["status"] != "ok" for record in records),
+            "jobs": records,
+        }
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        temp_path.replace(self.manifest_path)
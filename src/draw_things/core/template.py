@@ -0,0 +1,90 @@
+"""
+Reusable request templates.
+
+Callers that send many requests differing only in prompt or seed pay, on
+every call, for resolving settings defaults and for serializing the whole
+payload again. A ``RequestTemplate`` does both once; each request then only
+serializes its varying fields and splices them onto the pre-encoded rest.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+from .codec import JSONCodec, get_codec
+
+# Fields that usually change from one request to the next
+VARYING_FIELDS = ("prompt", "negative_prompt", "seed")
+
+
+class RequestTemplate:
+    """A request payload with its invariant part serialized once.
+
+    Create one with ``ImageGenerator.template`` or
+    ``DrawThingsClient.template``. Templates are immutable and can be shared
+    between threads. This pays off most for img2img, where the invariant
+    part holds the base64 source image.
+
+    Example:
+        template = generator.template(model="sd_v1.5.ckpt", steps=20)
+        for seed in range(100):
+            images = generator.generate_from_template(template, prompt="A cat", seed=seed)
+    """
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        fields: Sequence[str] = VARYING_FIELDS,
+        codec: Optional[JSONCodec] = None
+    ):
+        """Pre-encode a payload.
+
+        Args:
+            payload: Complete request payload, as returned by
+                ``build_payload``; its values for ``fields`` are defaults
+            fields: Fields that may vary per request; overriding any other
+                field serializes the whole payload
+            codec: JSON codec (defaults to ``get_codec()``)
+        """
+        self.base = dict(payload)
+        self.fields = tuple(fields)
+        self.codec = codec or get_codec()
+        invariant = {key: value for key, value in self.base.items() if key not in self.fields}
+        # Drop the closing brace so the varying fields can be appended
+        self._prefix = self.codec.dumps(invariant).rstrip()[:-1]
+        self._has_invariant = bool(invariant)
+        self._keys = {field: self.codec.dumps(field) + b":" for field in self.fields}
+
+    def payload(self, **values: Any) -> Dict[str, Any]:
+        """Return the payload of one request.
+
+        Args:
+            **values: Field values for this request
+        """
+        return dict(self.base, **values) if values else dict(self.base)
+
+    def encode(self, **values: Any) -> bytes:
+        """Return the JSON request body of one request.
+
+        Equivalent to serializing ``payload(**values)``, but only the
+        varying fields are serialized.
+
+        Args:
+            **values: Field values for this request
+        """
+        if not all(key in self._keys for key in values):
+            return self.codec.dumps(self.payload(**values))
+        parts = [self._prefix]
+        separator = b"," if self._has_invariant else b""
+        for field in self.fields:
+            if field in values:
+                value = values[field]
+            elif field in self.base:
+                value = self.base[field]
+            else:
+                continue
+            parts.append(separator + self._keys[field] + self.codec.dumps(value))
+            separator = b","
+        parts.append(b"}")
+        return b"".join(parts)
+
+    def __repr__(self) -> str:
+        return f"RequestTemplate(fields={self.fields!r}, codec={self.codec.name!r})"
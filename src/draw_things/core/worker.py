@@ -0,0 +1,151 @@
+"""
+Long-lived worker that drains a durable job queue.
+
+Running one CLI process per image pays interpreter startup, imports and
+connection setup every time. A ``Worker`` keeps one warm client (and its
+keep-alive connections) and runs queued jobs on a bounded thread pool
+until it is stopped.
+"""
+
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..config.settings import settings
+from .job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Runs jobs from a ``JobQueue`` with bounded concurrency.
+
+    The worker claims a job only when one of its ``concurrency`` slots is
+    free, so jobs it cannot start yet stay pending for other workers. Each
+    job's result record (``status``, ``paths``, ``error``, ``seconds``) is
+    stored back in the queue.
+
+    ``stop`` drains gracefully: no new jobs are claimed, jobs in flight run
+    to completion and are recorded, and ``run`` returns. SIGTERM and SIGINT
+    call it once ``install_signal_handlers`` has been used.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        queue: JobQueue,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        output_dir: Optional[str] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        priority: Optional[str] = None
+    ):
+        """Initialize the worker.
+
+        Args:
+            client: DrawThingsClient (or compatible) used to generate images
+            queue: Queue to take jobs from
+            concurrency: Maximum jobs in flight at once
+            poll_interval: Seconds to wait before looking again when the
+                queue is empty
+            output_dir: Directory for images of jobs that do not name one
+            on_result: Called with each job's result record as it finishes,
+                one call at a time
+            priority: Admission priority class of jobs that do not name one,
+                e.g. ``batch`` so queued work yields to interactive callers
+                sharing the client's servers
+        """
+        self.client = client
+        self.queue = queue
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.poll_interval = (
+            settings.WORKER_POLL_INTERVAL if poll_interval is None else poll_interval
+        )
+        self.output_dir = output_dir
+        self.on_result = on_result
+        self.priority = priority
+        self.succeeded = 0
+        self.failed = 0
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, drain: bool = False) -> Dict[str, int]:
+        """Run jobs until stopped.
+
+        Args:
+            drain: Return once the queue is empty instead of waiting for
+                more jobs
+
+        Returns:
+            Number of jobs ``succeeded`` and ``failed`` during this run
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="draw-things-worker"
+        ) as executor:
+            while not self._stop.is_set():
+                if not self._slots.acquire(timeout=self.poll_interval or None):
+                    continue
+                if self._stop.is_set():  # stopped while waiting for a slot
+                    self._slots.release()
+                    break
+                job = self.queue.claim()
+                if job is None:
+                    self._slots.release()
+                    if drain:
+                        break
+                    self._stop.wait(self.poll_interval)
+                    continue
+                executor.submit(self._run_job, *job)
+        return {"succeeded": self.succeeded, "failed": self.failed}
+
+    def stop(self):
+        """Stop claiming jobs; ``run`` returns once jobs in flight finish."""
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        """Drain gracefully on SIGTERM and SIGINT (main thread only)."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.stop())
+
+    def _run_job(self, job_id: str, request: Dict[str, Any]):
+        try:
+            record = self._execute(job_id, request)
+            try:
+                self.queue.complete(job_id, record)
+            except Exception as e:
+                # The job stays running in the queue until --recover
+                logger.error(
+                    "Could not record job %s: %s", job_id, e
+                )
+                record = dict(record, status="error", error=f"Could not record result: {e}")
+            with self._lock:
+                if record["status"] == "ok":
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+                if self.on_result:
+                    self.on_result(record)
+        finally:
+            self._slots.release()
+
+    def _execute(self, job_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"job_id": job_id, "job": request}
+        request = dict(request)
+        if self.output_dir and not request.get("output_dir"):
+            request["output_dir"] = self.output_dir
+        if self.priority and not request.get("priority"):
+            request["priority"] = self.priority
+        start = time.monotonic()
+        try:
+            record["paths"] = self.client.generate_image(**request)
+            record["status"] = "ok"
+        except Exception as e:
+            record["paths"] = []
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["seconds"] = round(time.monotonic() - start, 3)
+        return record
@@ -0,0 +1,156 @@
+"""
+Tests for the asyncio client.
+"""
+
+import asyncio
+import time
+
+import pytest
+from draw_things.api.async_client import AsyncDrawThingsClient
+from draw_things.core.image_generator import GenerationCancelledError, ImageGenerationError
+
+def test_generate_image(stub_server, temp_output_dir):
+    """Test a single async image generation."""
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            return await client.generate_image(
+                prompt="test prompt",
+                model="standard",
+                output_dir=str(temp_output_dir)
+            )
+
+    saved_paths = asyncio.run(run())
+
+    assert len(saved_paths) == 1
+    assert "standard" in saved_paths[0]
+
+def test_img2img_and_inpaint(stub_server, tmp_path):
+    """Test the async img2img and inpainting wrappers."""
+    source = tmp_path / "init.png"
+    source.write_bytes(b"init image")
+
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            first = await client.img2img(source, "A cat", output_dir=str(tmp_path))
+            second = await client.inpaint(source, b"mask", "A dog", output_dir=str(tmp_path))
+            return first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(first) == len(second) == 1
+    assert stub_server.paths[-2:] == ["/api/v1/img2img"] * 2
+    assert "mask" not in stub_server.payloads[-2]
+    assert stub_server.payloads[-1]["prompt"] == "A dog" and "mask" in stub_server.payloads[-1]
+
+def test_get_available_models(stub_server):
+    """Test getting available models asynchronously."""
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            return await client.get_available_models()
+
+    assert asyncio.run(run()) == ["standard", "model1", "model2"]
+
+def test_batch_sweep_and_template(stub_server, temp_output_dir):
+    """Test the async wrappers of the batched and templated sync methods."""
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            batch = await client.generate_batch(
+                [{"prompt": "a", "seed": 1}, {"prompt": "b", "seed": 1}],
+                output_dir=str(temp_output_dir)
+            )
+            sweep = await client.seed_sweep("c", [1, 2], output_dir=str(temp_output_dir))
+            template = client.template(model="standard")
+            templated = await client.generate_from_template(
+                template, output_dir=str(temp_output_dir), prompt="d"
+            )
+            return batch, sweep, templated
+
+    batch, sweep, templated = asyncio.run(run())
+
+    assert [len(paths) for paths in batch] == [1, 1]
+    assert len(sweep) == 2
+    assert len(templated) == 1
+    assert stub_server.payloads[-1]["prompt"] == "d"
+
+def test_generate_many_runs_concurrently(stub_server, temp_output_dir):
+    """Test that batch generation overlaps requests on the server."""
+    stub_server.latency = 0.2
+    jobs = [
+        {"prompt": f"prompt {i}", "model": f"model{i}", "output_dir": str(temp_output_dir)}
+        for i in range(4)
+    ]
+
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url, max_concurrency=4) as client:
+            return await client.generate_many(jobs)
+
+    start = time.monotonic()
+    results = asyncio.run(run())
+    elapsed = time.monotonic() - start
+
+    assert [len(paths) for paths in results] == [1, 1, 1, 1]
+    assert all(f"model{i}" in paths[0] for i, paths in enumerate(results))
+    assert stub_server.max_in_flight == 4
+    assert elapsed < 0.6
+
+def test_concurrency_limit(stub_server, temp_output_dir):
+    """Test that no more than max_concurrency requests are in flight."""
+    stub_server.latency = 0.05
+    jobs = [{"prompt": "test prompt", "output_dir": str(temp_output_dir)}] * 6
+
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url, max_concurrency=2) as client:
+            return await client.generate_many(jobs)
+
+    asyncio.run(run())
+
+    assert stub_server.max_in_flight == 2
+
+def test_generate_many_return_exceptions():
+    """Test that failures are returned in place when requested."""
+    async def run():
+        async with AsyncDrawThingsClient(api_url="http://127.0.0.1:9/api/v1/txt2img") as client:
+            return await client.generate_many(
+                [{"prompt": "test prompt"}], return_exceptions=True
+            )
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[0], ImageGenerationError)
+
+def test_generate_with_progress(stub_server, temp_output_dir):
+    """Test iterating over progress reports and awaiting the paths."""
+    stub_server.latency = 0.5
+
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            generation = client.generate_with_progress(
+                "A cat", steps=10, output_dir=str(temp_output_dir)
+            )
+            generation.watcher.min_interval = 0.02
+            reports = [progress async for progress in generation]
+            return reports, await generation
+
+    reports, paths = asyncio.run(run())
+
+    assert reports and all(report.steps == 10 for report in reports if report.active)
+    assert len(paths) == 1
+
+def test_cancel_generation(stub_server, temp_output_dir):
+    """Test that cancelling makes the generation raise promptly."""
+    stub_server.latency = 10.0
+
+    async def run():
+        async with AsyncDrawThingsClient(api_url=stub_server.url) as client:
+            generation = client.generate_with_progress("A cat", output_dir=str(temp_output_dir))
+            generation.watcher.min_interval = 0.02
+            async for _ in generation:
+                await generation.cancel()
+                break
+            await generation
+
+    start = time.monotonic()
+    with pytest.raises(GenerationCancelledError):
+        asyncio.run(run())
+    assert time.monotonic() - start < 5
+    assert stub_server.interrupts == 1
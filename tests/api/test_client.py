@@ -4,7 +4,8 @@ Tests for the API client.
 
 import pytest
 from draw_things.api.client import DrawThingsClient
-from draw_things.core.image_generator import ImageGenerationError
+from draw_things.core.admission import AdmissionController, PriorityClass
+from draw_things.core.image_generator import AdmissionRejectedError, ImageGenerationError
 
 def test_client_initialization():
     """Test client initialization."""
@@ -44,4 +45,38 @@ def test_custom_api_url():
     custom_url = "http://custom-url/api"
     client = DrawThingsClient(api_url=custom_url)
 
-    assert client._generator.api_url == custom_url
\ No newline at end of file
+    assert client._generator.api_url == custom_url
+
+def test_img2img_reuses_encoded_source(stub_server, tmp_path):
+    """Test img2img and inpainting through the client with one init image."""
+    source = tmp_path / "init.png"
+    source.write_bytes(b"init image")
+
+    with DrawThingsClient(stub_server.url) as client:
+        first = client.img2img(source, "A cat", seed=1, output_dir=str(tmp_path))
+        second = client.inpaint(source, b"mask", "A dog", seed=2, output_dir=str(tmp_path))
+        stats = client._generator.sources.stats()
+
+    assert len(first) == len(second) == 1
+    assert stub_server.paths[-2:] == ["/api/v1/img2img"] * 2
+    assert "mask" in stub_server.payloads[-1]
+    assert (stats["misses"], stats["hits"]) == (2, 1)  # init image, then mask
+
+def test_generate_image_priority(stub_server, tmp_path):
+    """Test that the client admits each call in its priority class."""
+    controller = AdmissionController(
+        [PriorityClass("interactive", 0), PriorityClass("batch", 1, max_queue=0)],
+        max_in_flight=1
+    )
+
+    with DrawThingsClient(stub_server.url, admission=controller) as client:
+        client.generate_image("A cat", output_dir=str(tmp_path))
+        client.generate_image("A bird", output_dir=str(tmp_path), priority="batch")
+        with controller.admit("interactive"):
+            # Batch work would have to wait, and its queue holds none
+            with pytest.raises(AdmissionRejectedError):
+                client.generate_image("A dog", output_dir=str(tmp_path), priority="batch")
+
+    metrics = controller.metrics()
+    assert (metrics["batch"]["admitted"], metrics["batch"]["rejected"]) == (1, 1)
+    assert len(stub_server.payloads) == 2
@@ -0,0 +1,25 @@
+"""
+Tests for the codec benchmark.
+"""
+
+import json
+
+from benchmarks.codec import main, measure_decode, measure_encode
+
+def test_measure_encode_and_decode():
+    """Test that every codec is measured against the stdlib baseline."""
+    encode = measure_encode(iterations=10, codecs=["json"])
+    decode = measure_decode(image_size=1024, iterations=2, codecs=["json"])
+
+    for result in (encode, decode):
+        assert result["baseline_us"] > 0
+        assert result["json"]["us"] > 0
+        assert result["json"]["saved_us"] == round(result["baseline_us"] - result["json"]["us"], 3)
+
+def test_main_prints_report(capsys):
+    """Test the command-line report."""
+    main(["--image-size", "1024", "--encode-iterations", "10", "--decode-iterations", "2"])
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["image_size"] == 1024
+    assert "json" in report["encode"] and "json" in report["decode"]
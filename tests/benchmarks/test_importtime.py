@@ -0,0 +1,57 @@
+"""
+Tests for the startup-time budget.
+"""
+
+import os
+
+import draw_things
+import pytest
+
+from benchmarks.importtime import CHECKS, main, measure, run_checks
+
+def test_startup_avoids_heavy_modules():
+    """Test that no check imports a module it should not."""
+    results = run_checks(runs=1)
+
+    for name, result in results.items():
+        assert result["forbidden"] == [], name
+    assert "draw_things.config.settings" not in results["package"]["modules"]
+    assert "draw_things.core.image_generator" in results["client"]["modules"]
+
+@pytest.mark.skipif(
+    not os.environ.get("DRAW_THINGS_STARTUP_BUDGET"),
+    reason="wall-clock budgets; set DRAW_THINGS_STARTUP_BUDGET=1 to check them"
+)
+def test_startup_within_budget():
+    """Test that every check stays within its time budget."""
+    results = run_checks(runs=3)
+
+    for name, result in results.items():
+        assert result["ms"] <= result["budget_ms"], name
+
+def test_measure_reports_new_modules_only():
+    """Test that modules a bare interpreter loads are not counted."""
+    result = measure("import json", runs=1)
+
+    assert "json" in result["modules"]
+    assert "sys" not in result["modules"]
+    assert result["ms"] > 0
+
+def test_main_fails_over_budget(capsys):
+    """Test that the command exits non-zero when a check is over budget."""
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--check", "package", "--runs", "1", "--scale", "0"])
+
+    assert excinfo.value.code == 1
+    assert '"passed": false' in capsys.readouterr().out
+
+def test_lazy_attributes():
+    """Test that public names load on first access and unknown ones fail."""
+    from draw_things.api.client import DrawThingsClient
+
+    assert draw_things.DrawThingsClient is DrawThingsClient
+    assert "DrawThingsClient" in dir(draw_things)
+    assert set(draw_things.__all__) >= {"DrawThingsClient", "AsyncDrawThingsClient", "settings"}
+    with pytest.raises(AttributeError):
+        draw_things.missing
+    assert set(CHECKS) == {"package", "client", "cli"}
@@ -0,0 +1,59 @@
+"""
+Tests for the benchmark suite.
+"""
+
+import json
+
+from benchmarks.suite import compare, main, percentile, run_suite
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 50) == 0.0
+
+def test_run_suite_measures_every_scenario():
+    """Test that a short run reports every metric for every scenario."""
+    report = run_suite(requests=3, concurrency=2, image_size=1000)
+
+    assert report["meta"]["image_size"] == 1000
+    for name, result in report["results"].items():
+        assert result["errors"] == 0, name
+        assert result["rps"] > 0
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["peak_memory_bytes"] > 0
+    assert report["results"]["generate_images"]["bytes_written_per_request"] == 0
+    assert report["results"]["save_images"]["bytes_received_per_request"] == 0
+    assert report["results"]["generate_image"]["bytes_written_per_request"] == 1000
+    batch, unbatched = report["results"]["generate_batch"], report["results"]["generate_unbatched"]
+    assert batch["images_per_call"] == unbatched["images_per_call"] == 8
+    assert batch["ips"] > 0
+    assert batch["bytes_written_per_request"] == unbatched["bytes_written_per_request"] == 8000
+
+def test_cli_writes_json_and_compares(tmp_path):
+    """Test that the CLI writes JSON and diffs it against a baseline."""
+    baseline = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    args = ["--scenario", "generate_images", "--requests", "2"]
+
+    main(args + ["--output", str(baseline)])
+    main(args + ["--output", str(current), "--compare", str(baseline)])
+
+    report = json.loads(current.read_text())
+    change = report["comparison"]["generate_images"]["rps"]
+    assert change["baseline"] == json.loads(baseline.read_text())["results"]["generate_images"]["rps"]
+    assert change["current"] == report["results"]["generate_images"]["rps"]
+
+def test_compare_skips_new_scenarios():
+    """Test that scenarios missing from the baseline are left out."""
+    result = {"rps": 10.0, "p50_ms": 2.0}
+    baseline = {"results": {"a": {"rps": 5.0, "p50_ms": 2.0}}}
+    current = {"results": {"a": result, "b": result}}
+
+    changes = compare(baseline, current)
+
+    assert list(changes) == ["a"]
+    assert changes["a"]["rps"]["change"] == 1.0
+    assert changes["a"]["p50_ms"]["change"] == 0.0
@@ -5,7 +5,7 @@ Pytest configuration and fixtures.
 import json
 import pytest
 from unittest.mock import patch, MagicMock
-from pathlib import Path
+from .mock_server import MockDrawThingsServer
 from .utils import SAMPLE_BASE64_IMAGE
 
 @pytest.fixture
@@ -18,13 +18,16 @@ def mock_api_response():
 
 @pytest.fixture
 def mock_urlopen(mock_api_response):
-    """Fixture mocking urllib.request.urlopen."""
+    """Fixture mocking the generator's pooled urlopen."""
     mock_response = MagicMock()
     mock_response.read.return_value = json.dumps(mock_api_response).encode('utf-8')
     mock_context = MagicMock()
     mock_context.__enter__.return_value = mock_response
 
-    with patch('urllib.request.urlopen', return_value=mock_context) as mock:
+    with patch(
+        'draw_things.core.connection_pool.ConnectionPool.urlopen',
+        return_value=mock_context
+    ) as mock:
         yield mock
 
 @pytest.fixture
@@ -32,4 +35,10 @@ def temp_output_dir(tmp_path):
     """Fixture providing a temporary directory for test outputs."""
     output_dir = tmp_path / "output"
     output_dir.mkdir()
-    return output_dir
\ No newline at end of file
+    return output_dir
+
+@pytest.fixture
+def stub_server():
+    """Fixture providing a local stub Draw Things HTTP server."""
+    with MockDrawThingsServer() as server:
+        yield server
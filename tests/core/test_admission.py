@@ -0,0 +1,213 @@
+"""
+Tests for priority-aware admission control.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from draw_things.core.admission import AdmissionController, PriorityClass, TokenBucket
+from draw_things.core.image_generator import AdmissionRejectedError, ImageGenerator
+
+def _hold(controller, priority, admitted, release):
+    """Hold a slot of controller from a thread until release is set."""
+    def run():
+        with controller.admit(priority):
+            admitted.append(priority)
+            release.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def _wait_pending(controller, priority, count):
+    deadline = time.monotonic() + 5
+    while controller.metrics()[priority]["pending"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def test_token_bucket_bursts_then_paces():
+    """Test that a full bucket allows a burst, then one token per 1/rate."""
+    bucket = TokenBucket(rate=10, burst=2)
+    now = time.monotonic()
+
+    assert bucket.take(now) == 0 and bucket.take(now) == 0
+    assert bucket.take(now) == pytest.approx(0.1)
+    assert bucket.take(now + 0.1) == 0
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+def test_higher_priority_goes_first():
+    """Test that a waiting interactive request overtakes earlier batch ones."""
+    controller = AdmissionController(max_in_flight=1)
+    admitted, release = [], threading.Event()
+    threads = [_hold(controller, "batch", admitted, release)]
+    while not admitted:
+        time.sleep(0.001)
+    threads += [_hold(controller, "batch", admitted, release) for _ in range(2)]
+    _wait_pending(controller, "batch", 2)
+    threads.append(_hold(controller, "interactive", admitted, release))
+    _wait_pending(controller, "interactive", 1)
+
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == ["batch", "interactive", "batch", "batch"]
+
+def test_batch_leaves_headroom_for_interactive():
+    """Test that batch work leaves a slot free that interactive work can use."""
+    controller = AdmissionController(max_in_flight=2)
+    admitted, release = [], threading.Event()
+    threads = [_hold(controller, "batch", admitted, release) for _ in range(3)]
+    _wait_pending(controller, "batch", 2)
+
+    with controller.admit("interactive", timeout=1):
+        assert controller.metrics()["interactive"]["in_flight"] == 1
+    assert admitted == ["batch"]
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert controller.metrics()["batch"]["admitted"] == 3
+
+def test_single_slot_is_shared():
+    """Test that headroom never shuts a class out of a single slot."""
+    controller = AdmissionController(max_in_flight=1)
+
+    with controller.admit("batch", timeout=1):
+        pass
+
+def test_full_queue_rejects_new_work():
+    """Test that requests beyond max_queue fail fast with backpressure."""
+    controller = AdmissionController(
+        [PriorityClass("interactive", 0), PriorityClass("batch", 1, max_queue=1)],
+        max_in_flight=1
+    )
+    admitted, release = [], threading.Event()
+    threads = [_hold(controller, "batch", admitted, release) for _ in range(2)]
+    _wait_pending(controller, "batch", 1)
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejectedError, match="already waiting"):
+        with controller.admit("batch"):
+            pass
+    assert time.monotonic() - start < 0.5
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    metrics = controller.metrics()["batch"]
+    assert (metrics["admitted"], metrics["rejected"], metrics["pending"]) == (2, 1, 0)
+
+def test_admission_timeout():
+    """Test that a request not admitted in time is withdrawn from the queue."""
+    controller = AdmissionController(max_in_flight=1)
+    admitted, release = [], threading.Event()
+    thread = _hold(controller, "interactive", admitted, release)
+    while not admitted:
+        time.sleep(0.001)
+
+    with pytest.raises(AdmissionRejectedError, match="not admitted within"):
+        with controller.admit("interactive", timeout=0.05):
+            pass
+
+    release.set()
+    thread.join()
+    assert controller.metrics()["interactive"]["pending"] == 0
+
+def test_rate_limit_paces_class():
+    """Test that a rate-limited class is admitted at its rate and others are not held up."""
+    controller = AdmissionController([
+        PriorityClass("interactive", 0),
+        PriorityClass("batch", 1, rate=20, burst=1),
+    ])
+    start = time.monotonic()
+    for _ in range(5):
+        with controller.admit("batch"):
+            pass
+    elapsed = time.monotonic() - start
+
+    interactive_start = time.monotonic()
+    with controller.admit("interactive"):
+        pass
+
+    assert elapsed == pytest.approx(0.2, abs=0.1)
+    assert time.monotonic() - interactive_start < 0.05
+
+def test_unknown_priority():
+    """Test that unknown class names are rejected."""
+    controller = AdmissionController()
+    with pytest.raises(ValueError):
+        with controller.admit("urgent"):
+            pass
+    with pytest.raises(ValueError):
+        AdmissionController(default="urgent")
+
+def test_empty_queue_admits_free_slot():
+    """Test that max_queue only bounds requests that have to wait."""
+    controller = AdmissionController([PriorityClass("x", 0, max_queue=0)], max_in_flight=4)
+
+    with controller.admit("x"), controller.admit("x"):
+        assert controller.metrics()["x"]["in_flight"] == 2
+    assert controller.metrics()["x"]["rejected"] == 0
+
+def test_request_capacity_applies_without_controller_limit():
+    """Test that each request's capacity limits it when the controller has none."""
+    controller = AdmissionController()
+    admitted, release = [], threading.Event()
+    thread = _hold(controller, "interactive", admitted, release)
+    while not admitted:
+        time.sleep(0.001)
+
+    with controller.admit("interactive", timeout=1, capacity=2):
+        pass
+    with pytest.raises(AdmissionRejectedError):
+        with controller.admit("interactive", timeout=0.05, capacity=1):
+            pass
+
+    release.set()
+    thread.join()
+    assert controller.max_in_flight is None
+
+def test_generator_takes_backend_capacity(stub_server):
+    """Test that generators bring their backends' capacity to a shared controller."""
+    controller = AdmissionController()
+    generator = ImageGenerator(
+        [stub_server.url, stub_server.url], backend_max_in_flight=2, admission=controller
+    )
+    unbounded = ImageGenerator([stub_server.url] * 3, admission=controller)
+
+    generator.generate_images(prompt="test")
+
+    assert (generator.admission_capacity, unbounded.admission_capacity) == (4, 3)
+    assert controller.max_in_flight is None
+    assert controller.metrics()["interactive"]["admitted"] == 1
+
+def test_interactive_latency_bounded_under_batch_flood(stub_server):
+    """Test that interactive requests wait for at most one batch render."""
+    stub_server.latency = 0.05
+    generator = ImageGenerator(
+        stub_server.url, backend_max_in_flight=1, admission=AdmissionController()
+    )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        flood = [
+            executor.submit(generator.generate_images, prompt="batch", priority="batch")
+            for _ in range(16)
+        ]
+        time.sleep(0.1)
+        latencies = []
+        for _ in range(3):
+            start = time.monotonic()
+            generator.generate_images(prompt="interactive", priority="interactive")
+            latencies.append(time.monotonic() - start)
+        for future in flood:
+            future.result()
+
+    # One batch render to drain plus its own, with scheduling slack
+    assert max(latencies) < 0.05 * 2 + 0.1
+    assert stub_server.max_in_flight == 1
+    prompts = [payload["prompt"] for payload in stub_server.payloads]
+    assert prompts.index("interactive") < len(prompts) - 4
@@ -0,0 +1,207 @@
+"""
+Tests for load balancing across several servers.
+"""
+
+import contextlib
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.backends import BackendBusyError, BackendPool, NoHealthyBackendError
+from draw_things.core.image_generator import (
+    AdmissionRejectedError, CircuitOpenError, ImageGenerator, ImageGenerationError
+)
+from tests.mock_server import MockDrawThingsServer
+
+DEAD_URL = "http://127.0.0.1:9/api/v1/txt2img"
+
+@contextlib.contextmanager
+def stub_servers(*latencies, serialize=False):
+    """Start one stub server per latency."""
+    with contextlib.ExitStack() as stack:
+        servers = []
+        for latency in latencies:
+            server = stack.enter_context(MockDrawThingsServer())
+            server.latency = latency
+            server.serialize = serialize
+            servers.append(server)
+        yield servers
+
+def _requests(server):
+    return len(server.payloads)
+
+def test_least_outstanding_spreads_concurrent_load():
+    """Test that concurrent requests are spread over idle backends."""
+    with stub_servers(0.1, 0.1, 0.1) as servers:
+        generator = ImageGenerator([server.url for server in servers])
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda _: generator.generate_images(prompt="test"), range(3)))
+
+    assert [_requests(server) for server in servers] == [1, 1, 1]
+
+def test_latency_policy_prefers_fast_backend():
+    """Test that the latency policy routes most work to the fastest server."""
+    with stub_servers(0.005, 0.05, 0.1) as servers:
+        generator = ImageGenerator(
+            [server.url for server in servers], backend_policy="latency"
+        )
+        for _ in range(20):
+            generator.generate_images(prompt="test")
+
+    fast, medium, slow = (_requests(server) for server in servers)
+    assert fast >= 15
+    assert slow <= 2
+
+def test_throughput_scales_with_backends():
+    """Test that three single-GPU servers finish a batch about three times faster."""
+    def run(servers):
+        generator = ImageGenerator([server.url for server in servers])
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(lambda _: generator.generate_images(prompt="test"), range(12)))
+        return time.monotonic() - start
+
+    with stub_servers(0.05, serialize=True) as servers:
+        single = run(servers)
+    with stub_servers(0.05, 0.05, 0.05, serialize=True) as servers:
+        triple = run(servers)
+
+    assert single / triple > 2
+
+def test_failing_backend_is_ejected(stub_server):
+    """Test that a dead server stops receiving traffic after repeated failures."""
+    generator = ImageGenerator([DEAD_URL, stub_server.url])
+    generator.backends.failure_threshold = 2
+
+    failures = 0
+    for _ in range(10):
+        try:
+            generator.generate_images(prompt="test")
+        except ImageGenerationError:
+            failures += 1
+
+    dead = generator.backends.backends[0]
+    assert failures == 2
+    assert dead.failures == 2
+    assert not dead.is_healthy()
+    assert generator.backends.healthy() == [generator.backends.backends[1]]
+
+def test_ejected_backend_returns_after_ejection_time():
+    """Test that an ejected backend is eligible again once ejection expires."""
+    pool = BackendPool(["http://a/txt2img", "http://b/txt2img"], failure_threshold=1,
+                       ejection_time=0.05)
+    with pytest.raises(urllib.error.URLError):
+        with pool.acquire() as backend:
+            raise urllib.error.URLError("connection refused")
+
+    assert backend not in pool.healthy()
+    time.sleep(0.06)
+    assert backend in pool.healthy()
+
+def test_client_errors_do_not_eject():
+    """Test that 4xx responses don't count as backend failures."""
+    pool = BackendPool(["http://a/txt2img"], failure_threshold=1)
+    with pytest.raises(urllib.error.HTTPError):
+        with pool.acquire():
+            raise urllib.error.HTTPError("http://a/txt2img", 400, "Bad Request", {}, None)
+
+    assert pool.healthy() == pool.backends
+
+def test_all_ejected_fails_fast():
+    """Test that requests fail without a connection attempt when every backend is down."""
+    pool = BackendPool(["http://a/txt2img", "http://b/txt2img"], failure_threshold=1)
+    for backend, delay in zip(pool.backends, (10.0, 5.0)):
+        backend.ejected_until = time.monotonic() + delay
+
+    with pytest.raises(NoHealthyBackendError, match="retrying in 5"):
+        pool.select()
+
+def test_half_open_allows_one_trial_request():
+    """Test that a backend back from ejection takes a single trial request."""
+    pool = BackendPool(["http://a/txt2img"], failure_threshold=2, ejection_time=0.05)
+    for _ in range(2):
+        with pytest.raises(urllib.error.URLError):
+            with pool.acquire():
+                raise urllib.error.URLError("connection refused")
+    with pytest.raises(NoHealthyBackendError):
+        pool.select()
+    time.sleep(0.06)
+
+    with pool.acquire() as backend:
+        # The trial is in flight: everyone else still fails fast
+        with pytest.raises(NoHealthyBackendError):
+            pool.select()
+    assert backend.consecutive_failures == 0
+    assert pool.select() is backend
+
+def test_failed_trial_reopens_circuit():
+    """Test that a failing trial request ejects the backend again."""
+    pool = BackendPool(["http://a/txt2img"], failure_threshold=2, ejection_time=0.05)
+    pool.backends[0].consecutive_failures = 2
+    with pytest.raises(urllib.error.URLError):
+        with pool.acquire():
+            raise urllib.error.URLError("connection refused")
+
+    with pytest.raises(NoHealthyBackendError):
+        pool.select()
+
+def test_generator_raises_circuit_open(stub_server):
+    """Test that the generator fails fast once its only backend is ejected."""
+    generator = ImageGenerator(DEAD_URL)
+    generator.backends.failure_threshold = 1
+
+    with pytest.raises(ImageGenerationError, match="URL Error"):
+        generator.generate_images(prompt="test")
+    with pytest.raises(CircuitOpenError):
+        generator.generate_images(prompt="test")
+    generator.close()
+
+def test_unknown_policy():
+    """Test that an unknown routing policy is rejected."""
+    with pytest.raises(ValueError):
+        BackendPool(["http://a/txt2img"], policy="random")
+    with pytest.raises(ValueError):
+        BackendPool(["http://a/txt2img"], max_in_flight=0)
+
+def test_max_in_flight_per_backend():
+    """Test that requests beyond a backend's limit wait for a free slot."""
+    with stub_servers(0.05, 0.05) as servers:
+        generator = ImageGenerator(
+            [server.url for server in servers], backend_max_in_flight=1
+        )
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(lambda _: generator.generate_images(prompt="test"), range(6)))
+        elapsed = time.monotonic() - start
+
+    assert generator.backends.capacity == 2
+    assert [server.max_in_flight for server in servers] == [1, 1]
+    assert [_requests(server) for server in servers] == [3, 3]
+    assert elapsed >= 0.15
+
+def test_wait_for_backend_times_out(stub_server):
+    """Test that waiting for a free backend gives up after the timeout."""
+    pool = BackendPool(["http://a/txt2img"], max_in_flight=1)
+    with pool.acquire():
+        start = time.monotonic()
+        with pytest.raises(BackendBusyError):
+            with pool.acquire(timeout=0.05):
+                pass
+        assert time.monotonic() - start >= 0.05
+    assert pool.backends[0].outstanding == 0
+
+    generator = ImageGenerator(stub_server.url, backend_max_in_flight=1)
+    with generator.backends.acquire():
+        with pytest.raises(ImageGenerationError, match="free slot") as exc_info:
+            generator.generate_images(prompt="test", timeout=0.05)
+    assert isinstance(exc_info.value.__cause__, AdmissionRejectedError)
+    assert stub_server.payloads == []
+
+def test_client_accepts_url_list(temp_output_dir):
+    """Test that the client balances over a list of URLs."""
+    with stub_servers(0.0, 0.0) as servers:
+        client = DrawThingsClient(api_url=[server.url for server in servers])
+        assert client._generator.api_url == servers[0].url
+        assert len(client.get_available_models()) == 3
@@ -0,0 +1,163 @@
+"""
+Tests for packing requests into batched server calls.
+"""
+
+import base64
+from concurrent.futures import wait
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.batching import MicroBatcher, pack_payloads, pack_seeds, unpack_images
+from draw_things.core.image_generator import ImageGenerator, ImageGenerationError
+
+def _payload(seed=-1, prompt="test prompt", **extra):
+    payload = {"prompt": prompt, "seed": seed, "batch_size": 1, "n_iter": 1}
+    payload.update(extra)
+    return payload
+
+def test_random_seeds_pack_together():
+    """Test that identical random-seed requests share one call."""
+    packs = pack_payloads([_payload(), _payload(), _payload()], max_batch_size=4)
+
+    assert len(packs) == 1
+    payload, indices = packs[0]
+    assert (payload["batch_size"], payload["n_iter"]) == (3, 1)
+    assert indices == [0, 1, 2]
+
+def test_consecutive_fixed_seeds_pack_together():
+    """Test that consecutive seeds form one batch starting at the lowest seed."""
+    packs = pack_payloads([_payload(seed=11), _payload(seed=10), _payload(seed=20)])
+
+    assert sorted((p["seed"], p["batch_size"], idx) for p, idx in packs) == [
+        (10, 2, [1, 0]), (20, 1, [2])
+    ]
+
+def test_incompatible_requests_are_separate():
+    """Test that requests differing beyond the seed are not packed."""
+    packs = pack_payloads([_payload(), _payload(prompt="other"), _payload(width=512)])
+
+    assert len(packs) == 3
+
+def test_large_groups_use_n_iter():
+    """Test that groups beyond max_batch_size use n_iter plus a remainder call."""
+    packs = pack_payloads([_payload()] * 10, max_batch_size=4)
+
+    assert [(p["batch_size"], p["n_iter"]) for p, _ in packs] == [(4, 2), (2, 1)]
+    assert packs[1][1] == [8, 9]
+
+def test_unpack_images():
+    """Test that images are returned to requests in seed order."""
+    payloads = [_payload(seed=2), _payload(seed=1), _payload(prompt="other")]
+    packs = pack_payloads(payloads)
+    results = [["seed1", "seed2"] if len(idx) == 2 else ["other"] for _, idx in packs]
+
+    assert unpack_images(packs, results, 3) == [["seed2"], ["seed1"], ["other"]]
+
+def test_unpack_short_response():
+    """Test that a response missing images is an error."""
+    packs = pack_payloads([_payload(), _payload()])
+
+    with pytest.raises(ValueError):
+        unpack_images(packs, [["only one"]], 2)
+
+def test_generate_batch_single_round_trip(stub_server):
+    """Test that a compatible batch costs one POST."""
+    generator = ImageGenerator(stub_server.url)
+    payloads = [generator.build_payload(prompt="test", seed=seed) for seed in (5, 6, 7)]
+
+    results = generator.generate_batch(payloads)
+
+    assert [len(images) for images in results] == [1, 1, 1]
+    assert len(stub_server.payloads) == 1
+    assert stub_server.payloads[0]["batch_size"] == 3
+    assert stub_server.payloads[0]["seed"] == 5
+
+def test_client_generate_batch(stub_server, temp_output_dir):
+    """Test that the client saves each request's images separately."""
+    client = DrawThingsClient(api_url=stub_server.url)
+
+    saved = client.generate_batch(
+        [{"prompt": "test", "model": "model1"}, {"prompt": "test", "model": "model2"}],
+        output_dir=str(temp_output_dir)
+    )
+
+    assert len(saved) == 2
+    assert "model1" in saved[0][0] and "model2" in saved[1][0]
+
+def test_pack_seeds():
+    """Test that seed variations pack like the equivalent payloads."""
+    template = _payload(seed=-1)
+    seeds = [3, 0, 1, 2, 9, 4, 10]
+
+    packs = pack_seeds(template, seeds, max_batch_size=2)
+
+    assert [(p["seed"], p["batch_size"], p["n_iter"], idx) for p, idx in packs] == [
+        (0, 2, 2, [1, 2, 3, 0]), (4, 1, 1, [5]), (9, 2, 1, [4, 6])
+    ]
+    assert template["seed"] == -1
+    assert packs == pack_payloads([dict(template, seed=seed) for seed in seeds], 2)
+
+def test_seed_sweep_returns_images_in_seed_order(stub_server):
+    """Test that a sweep costs one round trip per batch and keeps seed order."""
+    stub_server.images = [base64.b64encode(c).decode() for c in (b"a", b"b", b"c")]
+    generator = ImageGenerator(stub_server.url)
+
+    images = generator.generate_seed_sweep(generator.build_payload(prompt="test"), [12, 10, 11])
+
+    assert [base64.b64decode(image) for image in images] == [b"c", b"a", b"b"]
+    assert len(stub_server.payloads) == 1
+    assert (stub_server.payloads[0]["seed"], stub_server.payloads[0]["batch_size"]) == (10, 3)
+    with pytest.raises(ValueError):
+        generator.generate_seed_sweep(generator.build_payload(prompt="test"), [1, -1])
+
+def test_client_seed_sweep_names_are_reproducible(stub_server, tmp_path):
+    """Test that rerunning a sweep writes the same seed-named files."""
+    client = DrawThingsClient(api_url=stub_server.url)
+
+    first = client.seed_sweep("test", range(100, 106), output_dir=str(tmp_path), model="model1")
+    again = client.seed_sweep("test", range(100, 106), output_dir=str(tmp_path), model="model1")
+    other = client.seed_sweep("other", [100], output_dir=str(tmp_path), model="model1")
+
+    assert first == again
+    assert [path.rsplit("_", 1)[1] for path in first] == [f"seed{n}.png" for n in range(100, 106)]
+    assert all(path.startswith(str(tmp_path / "model1_")) for path in first)
+    assert other[0] not in first
+    assert len(list(tmp_path.iterdir())) == 7
+    assert len(stub_server.payloads) == 5  # 4 + 2 twice, then 1
+
+def test_micro_batcher_groups_requests_in_window(stub_server):
+    """Test that requests arriving within the window share one call."""
+    generator = ImageGenerator(stub_server.url)
+    payload = generator.build_payload(prompt="test")
+
+    with MicroBatcher(generator.generate_batch, window_ms=50, max_batch_size=8) as batcher:
+        futures = [batcher.submit(payload) for _ in range(5)]
+        results = [future.result(timeout=5) for future in futures]
+
+    assert all(len(images) == 1 for images in results)
+    assert len(stub_server.payloads) == 1
+    assert batcher.batches_sent == 1
+
+def test_micro_batcher_propagates_errors():
+    """Test that a failed batched call fails every waiting request."""
+    generator = ImageGenerator("http://127.0.0.1:9/api/v1/txt2img")
+
+    with MicroBatcher(generator.generate_batch, window_ms=10) as batcher:
+        futures = [batcher.submit(generator.build_payload(prompt="test")) for _ in range(2)]
+        wait(futures, timeout=5)
+
+    assert all(isinstance(f.exception(), ImageGenerationError) for f in futures)
+
+def test_batching_sends_one_call_for_n_images(stub_server):
+    """Test that eight images cost one server call batched and eight unbatched."""
+    generator = ImageGenerator(stub_server.url)
+    payloads = [generator.build_payload(prompt="test") for _ in range(8)]
+
+    for payload in payloads:
+        generator.generate_from_payload(payload)
+    assert len(stub_server.payloads) == 8
+
+    results = generator.generate_batch(payloads, max_batch_size=8)
+    assert len(stub_server.payloads) == 9
+    assert stub_server.payloads[-1]["batch_size"] * stub_server.payloads[-1]["n_iter"] == 8
+    assert [len(images) for images in results] == [1] * 8
@@ -0,0 +1,102 @@
+"""
+Tests for the content-addressed result cache.
+"""
+
+import logging
+from unittest.mock import patch
+
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.cache import ResultCache, payload_key
+from draw_things.core.image_generator import ImageGenerator
+from tests.utils import SAMPLE_BASE64_IMAGE
+
+def _payload(seed=42, prompt="test prompt"):
+    return {"prompt": prompt, "seed": seed, "width": 512}
+
+def test_payload_key_is_canonical():
+    """Test that key order doesn't change the payload hash."""
+    assert payload_key({"a": 1, "b": [1, 2]}) == payload_key({"b": [1, 2], "a": 1})
+    assert payload_key(_payload(seed=1)) != payload_key(_payload(seed=2))
+
+def test_hit_and_miss(tmp_path):
+    """Test that stored results are returned and counted."""
+    cache = ResultCache(str(tmp_path))
+
+    assert cache.get(_payload()) is None
+    cache.put(_payload(), [SAMPLE_BASE64_IMAGE])
+
+    assert cache.get(_payload()) == [SAMPLE_BASE64_IMAGE]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_random_seed_bypasses(tmp_path):
+    """Test that seed -1 is never cached."""
+    cache = ResultCache(str(tmp_path))
+
+    cache.put(_payload(seed=-1), [SAMPLE_BASE64_IMAGE])
+
+    assert cache.get(_payload(seed=-1)) is None
+    assert len(cache) == 0
+    assert cache.stats()["bypassed"] == 1
+    assert cache.stats()["misses"] == 0
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used entry is evicted past the cap."""
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    cache.put(_payload(seed=1), ["one"])
+    cache.put(_payload(seed=2), ["two"])
+    cache.get(_payload(seed=1))
+    cache.put(_payload(seed=3), ["three"])
+
+    assert _payload(seed=1) in cache
+    assert _payload(seed=2) not in cache
+    assert _payload(seed=3) in cache
+    assert cache.stats()["evictions"] == 1
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+def test_byte_cap(tmp_path):
+    """Test that the total size cap evicts entries."""
+    cache = ResultCache(str(tmp_path), max_bytes=100)
+    cache.put(_payload(seed=1), ["x" * 60])
+    cache.put(_payload(seed=2), ["y" * 60])
+
+    assert len(cache) == 1
+    assert _payload(seed=2) in cache
+
+def test_entries_survive_restart(tmp_path):
+    """Test that a new cache instance picks up existing entries."""
+    ResultCache(str(tmp_path)).put(_payload(), [SAMPLE_BASE64_IMAGE])
+
+    assert ResultCache(str(tmp_path)).get(_payload()) == [SAMPLE_BASE64_IMAGE]
+
+def test_generator_serves_repeats_from_cache(stub_server, tmp_path):
+    """Test that a repeated fixed-seed generation skips the server."""
+    generator = ImageGenerator(stub_server.url, cache=ResultCache(str(tmp_path)))
+
+    first = generator.generate_images(prompt="test prompt", seed=7)
+    second = generator.generate_images(prompt="test prompt", seed=7)
+    generator.generate_images(prompt="test prompt", seed=7, model="model1")
+
+    assert first == second
+    assert len(stub_server.payloads) == 2
+    assert generator.cache.stats()["hits"] == 1
+
+def test_client_random_seed_always_generates(stub_server, tmp_path, temp_output_dir):
+    """Test that random-seed client calls never hit the cache."""
+    client = DrawThingsClient(api_url=stub_server.url, cache=ResultCache(str(tmp_path)))
+
+    for _ in range(2):
+        client.generate_image(prompt="test prompt", output_dir=str(temp_output_dir))
+
+    assert len(stub_server.payloads) == 2
+
+def test_cache_write_failure_keeps_result(stub_server, tmp_path, caplog):
+    """Test that a failed cache write is logged instead of failing the generation."""
+    generator = ImageGenerator(stub_server.url, cache=ResultCache(str(tmp_path)))
+
+    with patch.object(ResultCache, "put", side_effect=OSError("No space left on device")):
+        with caplog.at_level(logging.WARNING):
+            images = generator.generate_images(prompt="test", seed=42)
+
+    assert images == [SAMPLE_BASE64_IMAGE]
+    assert "No space left on device" in caplog.text
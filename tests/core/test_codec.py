@@ -0,0 +1,51 @@
+"""
+Tests for the JSON codecs.
+"""
+
+import json
+
+import pytest
+from draw_things.config.settings import settings
+from draw_things.core import codec as codec_module
+from draw_things.core.codec import available_codecs, get_codec
+
+PAYLOAD = {"prompt": "Café ☕", "seed": 42, "loras": [], "cfg_scale": 7.5, "restore_faces": False}
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_codecs_round_trip(name):
+    """Test that every installed codec agrees with the standard library."""
+    codec = get_codec(name)
+
+    assert codec.name == name
+    assert json.loads(codec.dumps(PAYLOAD)) == PAYLOAD
+    assert codec.loads(json.dumps(PAYLOAD).encode("utf-8")) == PAYLOAD
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_codecs_raise_json_decode_error(name):
+    """Test that invalid JSON raises json.JSONDecodeError whatever the codec."""
+    with pytest.raises(json.JSONDecodeError):
+        get_codec(name).loads(b'{"images": [')
+
+def test_auto_picks_fastest_installed(monkeypatch):
+    """Test that auto falls back to the standard library."""
+    assert get_codec("auto").name == available_codecs()[0]
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    assert get_codec("auto").name == "json"
+
+def test_setting_selects_codec(monkeypatch):
+    """Test that JSON_CODEC picks the default codec."""
+    monkeypatch.setattr(settings, "JSON_CODEC", "json")
+    assert get_codec().name == "json"
+
+def test_unknown_and_missing_codecs(monkeypatch):
+    """Test that bad names and missing libraries are reported."""
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+    def missing():
+        raise ImportError("No module named 'orjson'")
+
+    monkeypatch.setattr(codec_module, "_instances", {})
+    monkeypatch.setitem(codec_module._CLASSES, "orjson", missing)
+    with pytest.raises(ImportError, match=r"draw-things\[fast-json\]"):
+        get_codec("orjson")
@@ -0,0 +1,84 @@
+"""
+Tests for the keep-alive connection pool.
+"""
+
+import time
+import urllib.error
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.connection_pool import ConnectionPool
+from draw_things.core.image_generator import ImageGenerator
+
+def test_generator_reuses_socket(stub_server):
+    """Test that consecutive generator calls share one TCP connection."""
+    generator = ImageGenerator(stub_server.url)
+
+    for _ in range(3):
+        generator.generate_images(prompt="test prompt")
+    generator.get_available_models()
+
+    assert len(stub_server.client_ports) == 4
+    assert len(set(stub_server.client_ports)) == 1
+    assert generator.pool.connections_created == 1
+    assert generator.pool.connections_reused == 3
+    generator.close()
+
+def test_client_calls_share_pool(stub_server, temp_output_dir):
+    """Test that all client calls go through the generator's pool."""
+    with DrawThingsClient(api_url=stub_server.url) as client:
+        client.get_available_models()
+        client.generate_image(prompt="test prompt", output_dir=str(temp_output_dir))
+        client.generate_image(prompt="test prompt", output_dir=str(temp_output_dir))
+
+    assert len(set(stub_server.client_ports)) == 1
+
+def test_idle_timeout_discards_connection(stub_server):
+    """Test that connections idle past the timeout are not reused."""
+    pool = ConnectionPool(idle_timeout=0.05)
+    generator = ImageGenerator(stub_server.url, pool=pool)
+
+    generator.fetch_models()
+    time.sleep(0.1)
+    generator.fetch_models()
+
+    assert len(set(stub_server.client_ports)) == 2
+    assert pool.connections_reused == 0
+
+def test_pool_size_limits_idle_connections(stub_server):
+    """Test that the pool keeps at most maxsize idle connections per host."""
+    pool = ConnectionPool(maxsize=1)
+    models_url = stub_server.url.replace("/txt2img", "/sd-models")
+
+    first = pool.urlopen(models_url)
+    second = pool.urlopen(models_url)
+    for response in (first, second):
+        response.read()
+        response.close()
+
+    assert pool.idle_count() == 1
+
+def test_stale_connection_is_replaced(stub_server):
+    """Test that a connection closed by the server is transparently replaced."""
+    stub_server.drop_keepalive = True
+    pool = ConnectionPool()
+    models_url = stub_server.url.replace("/txt2img", "/sd-models")
+
+    with pool.urlopen(models_url) as response:
+        response.read()
+    time.sleep(0.05)
+    with pool.urlopen(models_url) as response:
+        assert response.status == 200
+        response.read()
+
+    assert pool.connections_created == 2
+
+def test_http_error_status(stub_server):
+    """Test that error statuses raise HTTPError like urlopen."""
+    pool = ConnectionPool()
+    missing_url = stub_server.url.replace("/txt2img", "/missing")
+
+    with pytest.raises(urllib.error.HTTPError) as exc_info:
+        pool.urlopen(missing_url)
+
+    assert exc_info.value.code == 404
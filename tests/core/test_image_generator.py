@@ -2,9 +2,10 @@
 Tests for the core image generator.
 """
 
+import base64
 import pytest
 from pathlib import Path
-from draw_things.core.image_generator import ImageGenerator, ImageGenerationError
+from draw_things.core.image_generator import ImageGenerator, ImageGenerationError, _endpoint_url
 from tests.utils import SAMPLE_BASE64_IMAGE
 
 def test_generate_images(mock_urlopen):
@@ -65,4 +66,36 @@ def test_save_images_error():
     with pytest.raises(ImageGenerationError) as exc_info:
         generator.save_images(images=[])
 
-    assert "No images to save" in str(exc_info.value)
\ No newline at end of file
+    assert "No images to save" in str(exc_info.value)
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://host:7860/api/v1/txt2img", "http://host:7860/api/v1/sd-models"),
+    ("http://host:7860/api/v1/txt2img/", "http://host:7860/api/v1/sd-models"),
+    ("http://proxy/generate", "http://proxy/sd-models"),
+    ("http://txt2img.local/txt2img?key=txt2img", "http://txt2img.local/sd-models?key=txt2img"),
+])
+def test_endpoint_url(url, expected):
+    """Test that only the endpoint segment of the configured URL changes."""
+    assert _endpoint_url(url, "sd-models") == expected
+
+def test_img2img_payload_goes_to_img2img(stub_server, tmp_path):
+    """Test that payloads with an init image are sent to /img2img."""
+    source = tmp_path / "init.png"
+    source.write_bytes(b"init image")
+    with ImageGenerator(stub_server.url) as generator:
+        payload = generator.build_img2img_payload(
+            source, "A cat", mask=b"mask", strength=0.4, seed=1
+        )
+        generator.generate_from_payload(payload)
+        generator.generate_from_payload(generator.build_payload(prompt="A dog", seed=1))
+
+    assert [path.rsplit("/", 1)[1] for path in stub_server.paths] == ["img2img", "txt2img"]
+    sent = stub_server.payloads[0]
+    assert sent["init_images"] == [base64.b64encode(b"init image").decode()]
+    assert sent["mask"] == base64.b64encode(b"mask").decode()
+    assert sent["denoising_strength"] == 0.4
+
+def test_img2img_missing_source(tmp_path):
+    """Test that an unreadable init image raises ImageGenerationError."""
+    with pytest.raises(ImageGenerationError):
+        ImageGenerator().build_img2img_payload(tmp_path / "missing.png", "A cat")
@@ -0,0 +1,125 @@
+"""
+Tests for per-stage instrumentation.
+"""
+
+import binascii
+import urllib.request
+
+import pytest
+from draw_things.core.image_generator import ImageGenerationError, ImageGenerator
+from draw_things.core.instrumentation import (
+    NULL_INSTRUMENTATION, Metrics, OpenTelemetryInstrumentation
+)
+
+def test_disabled_by_default():
+    """Test that generators record nothing unless given instrumentation."""
+    generator = ImageGenerator("http://test.local/api/v1/txt2img")
+
+    assert generator.instrumentation is NULL_INSTRUMENTATION
+    assert generator.sink.instrumentation is NULL_INSTRUMENTATION
+    generator.close()
+
+def test_generate_and_save_stages(stub_server, tmp_path):
+    """Test that each stage of a buffered request and save is timed."""
+    metrics = Metrics()
+    with ImageGenerator(stub_server.url, instrumentation=metrics) as generator:
+        images = generator.generate_images(prompt="test")
+        generator.save_images(images, "model", str(tmp_path))
+
+    snapshot = metrics.snapshot()
+    assert set(snapshot["stages"]) == {"server", "transfer", "parse", "decode", "write"}
+    assert all(stage["count"] == 1 for stage in snapshot["stages"].values())
+    assert snapshot["bytes"]["received"] == len(stub_server.txt2img_body)
+    assert snapshot["bytes"]["written"] == 70  # the 1x1 PNG
+    assert snapshot["errors"] == {}
+
+def test_streaming_stages(stub_server, tmp_path):
+    """Test that streamed responses are timed as one stream stage."""
+    metrics = Metrics()
+    with ImageGenerator(stub_server.url, instrumentation=metrics) as generator:
+        generator.generate_images_to_files(
+            generator.build_payload(prompt="test"), output_dir=str(tmp_path)
+        )
+
+    snapshot = metrics.snapshot()
+    assert set(snapshot["stages"]) == {"server", "stream"}
+    assert snapshot["bytes"]["written"] == 70
+
+def test_errors_counted_by_class(stub_server, tmp_path):
+    """Test that failures are counted by their original exception class."""
+    metrics = Metrics()
+    generator = ImageGenerator(
+        stub_server.url.replace("txt2img", "missing"), instrumentation=metrics
+    )
+
+    with pytest.raises(ImageGenerationError):
+        generator.generate_images(prompt="test")
+    with pytest.raises(ImageGenerationError):
+        generator.save_images(["not base64!"], output_dir=str(tmp_path))
+    generator.close()
+
+    assert metrics.snapshot()["errors"] == {"HTTPError": 1, "Error": 1}
+
+def test_histogram_buckets_and_listeners():
+    """Test that durations land in cumulative buckets and reach listeners."""
+    metrics = Metrics(buckets=(0.1, 1.0))
+    seen = []
+    metrics.add_listener(lambda stage, seconds: seen.append((stage, seconds)))
+
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        metrics.observe("server", seconds)
+
+    stage = metrics.snapshot()["stages"]["server"]
+    assert stage["buckets"] == {0.1: 2, 1.0: 3, float("inf"): 4}
+    assert stage["count"] == 4
+    assert stage["sum"] == pytest.approx(2.65)
+    assert seen[-1] == ("server", 2.0)
+
+def test_prometheus_text():
+    """Test the Prometheus exposition format, also over HTTP."""
+    metrics = Metrics(buckets=(1.0,))
+    metrics.observe("parse", 0.5)
+    metrics.add_bytes("received", 100)
+    metrics.count_error("URLError")
+
+    text = metrics.render_prometheus()
+
+    assert 'draw_things_stage_seconds_bucket{stage="parse",le="1.0"} 1' in text
+    assert 'draw_things_stage_seconds_bucket{stage="parse",le="+Inf"} 1' in text
+    assert 'draw_things_stage_seconds_count{stage="parse"} 1' in text
+    assert 'draw_things_bytes_total{direction="received"} 100' in text
+    assert 'draw_things_errors_total{class="URLError"} 1' in text
+
+    server = metrics.serve_prometheus(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.read().decode("utf-8") == text
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_opentelemetry_requires_package():
+    """Test that the OpenTelemetry exporter explains its missing dependency."""
+    try:
+        import opentelemetry  # noqa: F401
+    except ImportError:
+        with pytest.raises(ImportError, match="opentelemetry-api"):
+            OpenTelemetryInstrumentation()
+    else:
+        pytest.skip("opentelemetry is installed")
+
+def test_streaming_errors_counted_once(stub_server, tmp_path):
+    """Test that a streamed decode failure is counted once and keeps its cause."""
+    stub_server.images = ["not base64!"]
+    metrics = Metrics()
+    generator = ImageGenerator(stub_server.url, instrumentation=metrics)
+
+    with pytest.raises(ImageGenerationError, match="Error decoding image") as exc_info:
+        generator.generate_images_to_files(
+            generator.build_payload(prompt="test"), output_dir=str(tmp_path)
+        )
+    generator.close()
+
+    assert metrics.snapshot()["errors"] == {"Error": 1}
+    assert isinstance(exc_info.value.__cause__, binascii.Error)
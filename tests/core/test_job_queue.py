@@ -0,0 +1,87 @@
+"""
+Tests for the durable job queues.
+"""
+
+import json
+import threading
+
+import pytest
+from draw_things.core.job_queue import SQLiteJobQueue, SpoolJobQueue, open_queue
+
+@pytest.fixture(params=["sqlite", "spool"])
+def queue(request, tmp_path):
+    """Fixture providing each queue backend."""
+    if request.param == "sqlite":
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    else:
+        queue = SpoolJobQueue(str(tmp_path / "spool"))
+    yield queue
+    queue.close()
+
+def test_fifo_claim_and_complete(queue):
+    """Test that jobs are claimed oldest first and their results kept."""
+    first = queue.put({"prompt": "a"})
+    second = queue.put({"prompt": "b"})
+
+    assert queue.claim() == (first, {"prompt": "a"})
+    assert queue.counts() == {"pending": 1, "running": 1, "done": 0, "failed": 0}
+
+    queue.complete(first, {"status": "ok", "paths": ["a.png"]})
+    assert queue.claim() == (second, {"prompt": "b"})
+    queue.complete(second, {"status": "error", "error": "boom"})
+
+    assert queue.claim() is None
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 1, "failed": 1}
+    assert queue.result(first)["paths"] == ["a.png"]
+    assert queue.result(second)["error"] == "boom"
+
+def test_recover_requeues_running_jobs(queue):
+    """Test that jobs left running by a dead worker can be requeued."""
+    job_id = queue.put({"prompt": "a"})
+    queue.claim()
+
+    assert queue.recover() == 1
+    assert queue.claim() == (job_id, {"prompt": "a"})
+
+def test_concurrent_claims_take_each_job_once(queue):
+    """Test that racing claimers never take the same job twice."""
+    for i in range(50):
+        queue.put({"i": i})
+    claimed = []
+    lock = threading.Lock()
+
+    def drain():
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job[1]["i"])
+
+    threads = [threading.Thread(target=drain) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == list(range(50))
+
+def test_spool_accepts_dropped_files_and_rejects_invalid_ones(tmp_path):
+    """Test that any producer can queue jobs by writing JSON files."""
+    queue = SpoolJobQueue(str(tmp_path))
+    (tmp_path / "001.json").write_text("not json")
+    (tmp_path / "002.json").write_text(json.dumps({"prompt": "a"}))
+    (tmp_path / ".003.json").write_text(json.dumps({"prompt": "being written"}))
+
+    assert queue.claim() == ("002", {"prompt": "a"})
+    assert queue.claim() is None
+    assert "Invalid job file" in queue.result("001")["error"]
+
+def test_open_queue(tmp_path):
+    """Test that the location picks the backend."""
+    with open_queue(str(tmp_path / "jobs.db")) as queue:
+        assert isinstance(queue, SQLiteJobQueue)
+    with open_queue(str(tmp_path / "spool")) as queue:
+        assert isinstance(queue, SpoolJobQueue)
+    with open_queue(str(tmp_path)) as queue:
+        assert isinstance(queue, SpoolJobQueue)
@@ -0,0 +1,56 @@
+"""
+Tests for the result manifest.
+"""
+
+import time
+
+from draw_things.core.manifest import ResultManifest, result_key
+
+def test_result_key():
+    """Test that fixed seeds key by content and random seeds by position."""
+    payload = {"prompt": "a", "seed": 42}
+
+    assert result_key(payload, 0) == result_key({"seed": 42, "prompt": "a"}, 7)
+    assert result_key({"prompt": "a", "seed": -1}, 0) != result_key({"prompt": "a", "seed": -1}, 1)
+    assert result_key({"prompt": "a", "seed": -1}, 3) == result_key({"prompt": "a", "seed": -1}, 3)
+
+def test_add_get_and_persistence(tmp_path):
+    """Test that records survive reopening the manifest."""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    path = str(tmp_path / "runs" / "manifest.db")
+
+    with ResultManifest(path) as manifest:
+        manifest.add("k", {"status": "ok", "paths": [str(image)]})
+        assert "k" in manifest
+        assert "missing" not in manifest
+
+    with ResultManifest(path) as manifest:
+        assert manifest.get("k")["paths"] == [str(image)]
+        assert len(manifest) == 1
+
+def test_entries_with_deleted_images_are_redone(tmp_path):
+    """Test that a record whose images are gone no longer counts as done."""
+    image = tmp_path / "a.png"
+    image.write_bytes(b"png")
+    with ResultManifest(str(tmp_path / "manifest.db")) as manifest:
+        manifest.add("k", {"paths": [str(image)]})
+        image.unlink()
+
+        assert manifest.get("k") is None
+
+def test_lookups_are_indexed(tmp_path):
+    """Test that a lookup stays fast in a large manifest."""
+    with ResultManifest(str(tmp_path / "manifest.db")) as manifest:
+        with manifest._lock:
+            manifest._connection.executemany(
+                "INSERT INTO results (key, record, finished) VALUES (?, '{}', 0)",
+                ((f"key{n}",) for n in range(200000))
+            )
+
+        start = time.perf_counter()
+        for n in range(0, 200000, 200):
+            assert f"key{n}" in manifest
+        per_lookup = (time.perf_counter() - start) / 1000
+
+    assert per_lookup < 0.001
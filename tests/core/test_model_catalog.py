@@ -0,0 +1,129 @@
+"""
+Tests for the cached model catalog.
+"""
+
+import logging
+import time
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.image_generator import ImageGenerator, UnknownModelError
+from draw_things.core.model_catalog import ModelCatalog
+
+def _model_requests(server):
+    return len(server.client_ports) - len(server.payloads)
+
+def test_models_are_cached(stub_server):
+    """Test that repeated lookups within the TTL hit the server once."""
+    generator = ImageGenerator(stub_server.url)
+
+    for _ in range(3):
+        assert generator.get_available_models() == ["standard", "model1", "model2"]
+
+    assert _model_requests(stub_server) == 1
+
+def test_full_metadata_and_lookup(stub_server):
+    """Test that models can be found by title, model name or file name."""
+    stub_server.models = ["sdxl.ckpt"]
+    catalog = ModelCatalog(ImageGenerator(stub_server.url))
+
+    model = catalog.get("sdxl.ckpt")
+    assert model["filename"] == "/models/sdxl.ckpt"
+    assert catalog.get("sdxl") is model
+    assert catalog.get("/models/sdxl.ckpt") is model
+    assert "missing.ckpt" not in catalog
+
+def test_conditional_refresh(stub_server):
+    """Test that an expired but unchanged list is revalidated with a 304."""
+    catalog = ModelCatalog(ImageGenerator(stub_server.url), ttl=0)
+
+    catalog.titles()
+    changed = catalog.refresh()
+
+    assert changed is False
+    assert catalog.fetches == 2
+    assert catalog.not_modified == 1
+    assert catalog.titles() == ["standard", "model1", "model2"]
+
+def test_refresh_picks_up_new_models(stub_server):
+    """Test that a changed list replaces the cached one."""
+    catalog = ModelCatalog(ImageGenerator(stub_server.url), ttl=0)
+    catalog.titles()
+    stub_server.models = ["new.ckpt"]
+
+    assert catalog.refresh() is True
+    assert "new.ckpt" in catalog
+
+def test_background_refresher(stub_server):
+    """Test that the background thread keeps the catalog current."""
+    catalog = ModelCatalog(ImageGenerator(stub_server.url), ttl=60, refresh_interval=0.02)
+    catalog.start()
+    try:
+        catalog.titles()
+        stub_server.models = ["added.ckpt"]
+        deadline = time.monotonic() + 2
+        while "added.ckpt" not in catalog._index and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        catalog.stop()
+
+    assert catalog.get("added.ckpt") is not None
+
+def test_validate_unknown_model(stub_server):
+    """Test that validation rejects unknown names with suggestions."""
+    catalog = ModelCatalog(ImageGenerator(stub_server.url))
+
+    with pytest.raises(UnknownModelError) as exc_info:
+        catalog.validate("model3")
+
+    assert "did you mean" in str(exc_info.value)
+
+def test_unknown_models_recheck_at_most_once_per_interval(stub_server):
+    """Test that a stream of unknown names costs one forced refresh per interval."""
+    catalog = ModelCatalog(ImageGenerator(stub_server.url), recheck_interval=0.05)
+    catalog.titles()
+    stub_server.models = ["added.ckpt"]
+
+    for _ in range(5):
+        with pytest.raises(UnknownModelError):
+            catalog.validate("added.ckpt")
+    assert catalog.fetches == 1
+
+    time.sleep(0.05)
+    assert catalog.validate("added.ckpt")["title"] == "added.ckpt"
+    assert catalog.fetches == 2
+
+def test_background_refresh_failure_is_logged(caplog):
+    """Test that a failing background refresh is logged and the loop goes on."""
+    catalog = ModelCatalog(ImageGenerator("http://127.0.0.1:9/api/v1/txt2img"),
+                           refresh_interval=0.01)
+
+    with caplog.at_level(logging.WARNING, logger="draw_things.core.model_catalog"):
+        catalog.start()
+        deadline = time.monotonic() + 2
+        while len(caplog.records) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        catalog.stop()
+
+    assert len(caplog.records) >= 2
+    assert "Could not refresh model catalog" in caplog.records[0].getMessage()
+
+def test_generator_validates_before_post(stub_server):
+    """Test that an unknown model never reaches txt2img."""
+    generator = ImageGenerator(stub_server.url, validate_models=True)
+
+    with pytest.raises(UnknownModelError):
+        generator.generate_images(prompt="test", model="nonexistent.ckpt")
+    generator.generate_images(prompt="test", model="model1")
+
+    assert [payload["model"] for payload in stub_server.payloads] == ["model1"]
+
+def test_client_validates_models(stub_server, tmp_path):
+    """Test that the client can turn on the model check."""
+    client = DrawThingsClient(stub_server.url, validate_models=True, catalog_ttl=5)
+
+    with pytest.raises(UnknownModelError):
+        client.generate_image("test", model="nonexistent.ckpt", output_dir=str(tmp_path))
+
+    assert client._generator.catalog.ttl == 5
+    assert stub_server.payloads == []
@@ -0,0 +1,182 @@
+"""
+Tests for the output sinks.
+"""
+
+import base64
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+from draw_things.core.image_generator import ImageGenerationError, ImageGenerator
+from draw_things.core.output import FileSystemSink, OutputSink
+
+def _image(n):
+    return base64.b64encode(f"image {n}".encode()).decode()
+
+def _leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+def test_save_keeps_image_order(tmp_path):
+    """Test that a parallel batch save returns paths in image order."""
+    sink = FileSystemSink(max_workers=4)
+    images = [_image(n) for n in range(8)]
+
+    paths = sink.save(images, "model", str(tmp_path))
+    sink.close()
+
+    assert [open(path, "rb").read() for path in paths] == [
+        f"image {n}".encode() for n in range(8)
+    ]
+    assert all(os.path.basename(path).startswith("model_image_") for path in paths)
+    assert _leftovers(tmp_path) == []
+
+def test_explicit_names_replace_existing_files(tmp_path):
+    """Test that named saves bypass the naming scheme and overwrite atomically."""
+    sink = FileSystemSink()
+
+    sink.save([_image(0), _image(1)], "model", str(tmp_path), names=["a.png", "b.png"])
+    paths = sink.save([_image(2)], "model", str(tmp_path), names=["a.png"])
+    sink.close()
+
+    assert paths == [str(tmp_path / "a.png")]
+    assert sorted(os.listdir(tmp_path)) == ["a.png", "b.png"]
+    assert (tmp_path / "a.png").read_bytes() == b"image 2"
+    with pytest.raises(ValueError):
+        sink.save([_image(0)], names=["a.png", "b.png"])
+
+def test_concurrent_saves_never_collide(tmp_path):
+    """Test that many saves in the same second each get their own file."""
+    sinks = [FileSystemSink(max_workers=2) for _ in range(4)]
+    paths = []
+    lock = threading.Lock()
+
+    def save(sink, n):
+        saved = sink.save([_image(n), _image(n + 100)], "model", str(tmp_path))
+        with lock:
+            paths.extend(saved)
+
+    threads = [
+        threading.Thread(target=save, args=(sinks[n % 4], n)) for n in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sink in sinks:
+        sink.close()
+
+    assert len(set(paths)) == 40
+    assert len(os.listdir(tmp_path)) == 40
+
+def test_hash_naming_deduplicates(tmp_path):
+    """Test that identical images share one content-addressed file."""
+    sink = FileSystemSink(naming="hash")
+
+    first = sink.save([_image(1), _image(1)], "model", str(tmp_path))
+    second = sink.save([_image(2)], "model", str(tmp_path))
+
+    assert first[0] == first[1]
+    assert second[0] != first[0]
+    assert len(os.listdir(tmp_path)) == 2
+
+def test_hash_naming_extends_on_prefix_clash(tmp_path):
+    """Test that a different image under the same short hash gets the full hash."""
+    sink = FileSystemSink(naming="hash")
+    path = sink.save([_image(1)], None, str(tmp_path))[0]
+    # Another image squatting on the name image 2 would take
+    digest = os.path.basename(sink.save([_image(2)], None, str(tmp_path))[0])[:16]
+    os.unlink(tmp_path / f"{digest}.png")
+    os.link(path, tmp_path / f"{digest}.png")
+
+    clashed = sink.save([_image(2)], None, str(tmp_path))[0]
+
+    assert len(os.path.basename(clashed)) == 64 + len(".png")
+    assert open(clashed, "rb").read() == b"image 2"
+
+def test_unknown_naming_scheme():
+    """Test that an unknown naming scheme is rejected."""
+    with pytest.raises(ValueError):
+        FileSystemSink(naming="random")
+
+def test_publishes_without_hard_links(tmp_path):
+    """Test that filesystems without hard links still get unique names."""
+    sink = FileSystemSink()
+
+    with patch("draw_things.core.output.os.link", side_effect=PermissionError("denied")):
+        paths = sink.save([_image(n) for n in range(3)], "model", str(tmp_path))
+
+    assert len(set(paths)) == 3
+    assert open(paths[2], "rb").read() == b"image 2"
+    assert _leftovers(tmp_path) == []
+
+def test_failed_write_leaves_nothing(tmp_path):
+    """Test that an image that can't be published leaves no files behind."""
+    sink = FileSystemSink()
+
+    with patch("draw_things.core.output.os.link", side_effect=PermissionError("denied")), \
+            patch("draw_things.core.output.os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            sink.save([_image(1)], "model", str(tmp_path))
+
+    assert os.listdir(tmp_path) == []
+
+def test_discarded_image_is_not_published(tmp_path):
+    """Test that a streamed image is only visible once closed without error."""
+    sink = FileSystemSink()
+
+    with pytest.raises(RuntimeError):
+        with sink.open_image("model", str(tmp_path)) as f:
+            f.write(b"partial")
+            assert os.listdir(tmp_path) == [os.path.basename(f._temp_path)]
+            raise RuntimeError("connection lost")
+
+    assert os.listdir(tmp_path) == []
+
+def test_fsync_batches_directory_sync(tmp_path):
+    """Test that fsync syncs each image and the directory once per batch."""
+    sink = FileSystemSink(fsync=True)
+
+    with patch("draw_things.core.output.os.fsync") as fsync:
+        sink.save([_image(n) for n in range(3)], "model", str(tmp_path))
+
+    assert fsync.call_count == 4
+
+def test_save_decoded_defaults_to_save():
+    """Test that sinks implementing only save also accept decoded images."""
+    class ListSink(OutputSink):
+        def save(self, images, model_name=None, output_dir=None, names=None, metadata=None):
+            self.saved = (images, model_name, metadata)
+            return ["stored"]
+
+    sink = ListSink()
+
+    assert sink.save_decoded([b"image 1"], "model", metadata=[{"seed": 1}]) == ["stored"]
+    assert sink.saved == ([_image(1)], "model", [{"seed": 1}])
+
+def test_generator_save_errors(tmp_path):
+    """Test that sink failures surface as ImageGenerationError."""
+    generator = ImageGenerator("http://test.local/api/v1/txt2img")
+
+    with pytest.raises(ImageGenerationError, match="Error decoding image"):
+        generator.save_images(["not base64!"], output_dir=str(tmp_path))
+    with patch("draw_things.core.output._claim", side_effect=OSError("disk full")):
+        with pytest.raises(ImageGenerationError, match="Error saving image"):
+            generator.save_images([_image(1)], output_dir=str(tmp_path))
+    generator.close()
+
+def test_saved_images_honour_umask(tmp_path):
+    """Test that published images get the usual 0666-less-umask mode."""
+    old = os.umask(0o022)
+    try:
+        sink = FileSystemSink()
+        path = sink.save([_image(1)], "model", str(tmp_path))[0]
+        with sink.open_image("model", str(tmp_path)) as f:
+            f.write(b"streamed")
+        streamed = f.path
+        sink.close()
+    finally:
+        os.umask(old)
+
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert os.stat(streamed).st_mode & 0o777 == 0o644
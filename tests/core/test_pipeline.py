@@ -0,0 +1,151 @@
+"""
+Tests for the pipelined generate/save path.
+"""
+
+import base64
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.image_generator import ImageGenerator
+from draw_things.core.manifest import ResultManifest
+from draw_things.core.output import FileSystemSink
+from draw_things.core.pipeline import GenerationPipeline
+from draw_things.core.postprocess import PostProcessor, read_png_text
+from tests.utils import make_png
+
+class SlowSink(FileSystemSink):
+    """Sink whose writes are slow, recording what the server was doing meanwhile."""
+
+    def __init__(self, server, delay):
+        super().__init__()
+        self.server = server
+        self.delay = delay
+        self.in_flight_during_writes = []
+
+    def save_decoded(self, images, *args, **kwargs):
+        time.sleep(self.delay)
+        self.in_flight_during_writes.append(self.server.in_flight)
+        return super().save_decoded(images, *args, **kwargs)
+
+def test_pipeline_saves_every_job(stub_server, tmp_path):
+    """Test that every job yields a record with its saved images."""
+    jobs = [{"prompt": f"prompt {n}", "model": "model1"} for n in range(10)]
+    with DrawThingsClient(stub_server.url) as client:
+        records = list(client.generate_pipelined(jobs, output_dir=str(tmp_path)))
+
+    assert sorted(record["index"] for record in records) == list(range(10))
+    assert all(record["status"] == "ok" for record in records)
+    assert all(os.path.exists(record["paths"][0]) for record in records)
+    assert len(os.listdir(tmp_path)) == 10
+
+def test_pipeline_saves_like_save_images(stub_server, tmp_path):
+    """Test that pipelined writes get the sink's fsync and embedded payload."""
+    stub_server.images = [base64.b64encode(make_png()).decode()]
+    sink = FileSystemSink(fsync=True, post_processor=PostProcessor())
+    generator = ImageGenerator(stub_server.url, sink=sink)
+
+    with patch("draw_things.core.output.os.fsync") as fsync:
+        records = list(GenerationPipeline(generator).run(
+            [{"prompt": "A cat", "seed": 5}], output_dir=str(tmp_path)
+        ))
+    generator.close()
+
+    assert records[0]["status"] == "ok"
+    assert fsync.call_count == 2  # the image, then its directory
+    with open(records[0]["paths"][0], "rb") as f:
+        assert '"seed": 5' in read_png_text(f.read())["parameters"]
+
+def test_requests_overlap_disk_writes(stub_server, tmp_path):
+    """Test that the next request is in flight while earlier images are written."""
+    stub_server.latency = 0.05
+    sink = SlowSink(stub_server, delay=0.05)
+    generator = ImageGenerator(stub_server.url, sink=sink)
+    pipeline = GenerationPipeline(generator, request_workers=1, write_workers=1)
+
+    start = time.monotonic()
+    records = list(pipeline.run(
+        ({"prompt": f"prompt {n}"} for n in range(8)), output_dir=str(tmp_path)
+    ))
+    elapsed = time.monotonic() - start
+    generator.close()
+
+    assert len(records) == 8
+    assert max(sink.in_flight_during_writes) == 1
+    # Serial would be 8 x (request + write) = 0.8s
+    assert elapsed < 0.7
+
+def test_failed_job_does_not_stop_pipeline(stub_server, tmp_path):
+    """Test that a failing job yields an error record and the rest complete."""
+    jobs = [{"prompt": "ok"}, {"prompt": "bad", "unknown_arg": 1}, {"prompt": "ok"}]
+    generator = ImageGenerator(stub_server.url)
+    records = sorted(
+        GenerationPipeline(generator).run(jobs, output_dir=str(tmp_path)),
+        key=lambda record: record["index"]
+    )
+    generator.close()
+
+    assert [record["status"] for record in records] == ["ok", "error", "ok"]
+    assert "unknown_arg" in records[1]["error"]
+    assert records[1]["paths"] == []
+
+def test_bounded_queues_limit_read_ahead(stub_server, tmp_path):
+    """Test that a slow consumer stops the pipeline from reading ahead."""
+    consumed = []
+
+    def jobs():
+        for n in range(100):
+            consumed.append(n)
+            yield {"prompt": f"prompt {n}"}
+
+    generator = ImageGenerator(stub_server.url)
+    pipeline = GenerationPipeline(
+        generator, request_workers=1, write_workers=1, queue_size=2
+    )
+    results = pipeline.run(jobs(), output_dir=str(tmp_path))
+    next(results)
+    time.sleep(0.2)
+
+    # Only the jobs held in the queues and by workers have been read
+    assert len(consumed) < 20
+    results.close()
+    generator.close()
+    assert not [t for t in threading.enumerate() if t.name.startswith("draw-things-pipeline")]
+
+def test_job_source_error_is_raised(stub_server, tmp_path):
+    """Test that an error reading jobs is raised after the earlier jobs finish."""
+    def jobs():
+        yield {"prompt": "first"}
+        raise ValueError("bad job file")
+
+    generator = ImageGenerator(stub_server.url)
+    records = []
+    with pytest.raises(ValueError, match="bad job file"):
+        for record in GenerationPipeline(generator).run(jobs(), output_dir=str(tmp_path)):
+            records.append(record)
+    generator.close()
+
+    assert [record["status"] for record in records] == ["ok"]
+
+def test_manifest_skips_finished_jobs(stub_server, tmp_path):
+    """Test that a rerun with a manifest only runs what did not finish."""
+    jobs = [{"prompt": f"prompt {n}", "seed": n} for n in range(4)]
+    output_dir = str(tmp_path / "out")
+
+    with ResultManifest(str(tmp_path / "manifest.db")) as manifest, \
+            DrawThingsClient(stub_server.url) as client:
+        first = list(client.generate_pipelined(jobs[:3], output_dir=output_dir, manifest=manifest))
+        requests = len(stub_server.payloads)
+        second = list(client.generate_pipelined(jobs, output_dir=output_dir, manifest=manifest))
+
+    assert len(stub_server.payloads) == requests + 1
+    assert sorted(record["index"] for record in second if record.get("resumed")) == [0, 1, 2]
+    first_paths = {record["index"]: record["paths"] for record in first}
+    assert all(
+        record["paths"] == first_paths[record["index"]]
+        for record in second if record.get("resumed")
+    )
+    assert len(os.listdir(output_dir)) == 4
@@ -0,0 +1,175 @@
+"""
+Tests for the post-processing stage.
+"""
+
+import base64
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.image_generator import ImageGenerator
+from draw_things.core.output import FileSystemSink
+from draw_things.core.postprocess import (
+    Derivative, PostProcessor, embed_png_text, read_png_text
+)
+from tests.utils import make_png
+
+def _chunks(data):
+    position, chunks = 8, []
+    while position < len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        crc = struct.unpack(">I", data[position + 8 + length:position + 12 + length])[0]
+        assert crc == zlib.crc32(kind + body)
+        chunks.append(kind)
+        position += 12 + length
+    return chunks
+
+def test_embed_png_text_round_trips():
+    """Test that text chunks follow the header and can be read back."""
+    data = embed_png_text(make_png(), {"parameters": '{"seed": 1}', "Title": "Café ☕"})
+
+    assert _chunks(data) == [b"IHDR", b"tEXt", b"iTXt", b"IDAT", b"IEND"]
+    assert read_png_text(data) == {"parameters": '{"seed": 1}', "Title": "Café ☕"}
+
+def test_embed_png_text_leaves_other_data_alone():
+    """Test that data that is not a PNG is returned unchanged."""
+    assert embed_png_text(b"image 1", {"parameters": "{}"}) == b"image 1"
+
+def test_sink_embeds_payload(tmp_path):
+    """Test that saved PNGs carry their payload in a parameters chunk."""
+    generator = ImageGenerator(
+        sink=FileSystemSink(post_processor=PostProcessor(), naming="hash")
+    )
+    payload = {"prompt": "A cat", "seed": 42}
+    image = base64.b64encode(make_png()).decode()
+
+    path = generator.save_images([image], "model", str(tmp_path), metadata=[payload])[0]
+    generator.close()
+
+    with open(path, "rb") as f:
+        assert json.loads(read_png_text(f.read())["parameters"]) == payload
+
+def test_sink_skips_embedding_when_disabled(tmp_path):
+    """Test that embed_metadata=False writes the decoded bytes as they are."""
+    sink = FileSystemSink(post_processor=PostProcessor(embed_metadata=False))
+
+    path = sink.save([base64.b64encode(make_png()).decode()], None, str(tmp_path),
+                     metadata=[{"seed": 1}])[0]
+    sink.close()
+
+    with open(path, "rb") as f:
+        assert f.read() == make_png()
+
+def test_streamed_file_embeds_payload_across_writes(tmp_path):
+    """Test that a PNG written in small pieces gets its payload after the header."""
+    sink = FileSystemSink(post_processor=PostProcessor())
+    data = make_png()
+
+    with sink.open_image(None, str(tmp_path), metadata={"seed": 7}) as f:
+        for start in range(0, len(data), 5):
+            f.write(data[start:start + 5])
+    sink.close()
+
+    with open(f.path, "rb") as saved:
+        saved_data = saved.read()
+    assert _chunks(saved_data) == [b"IHDR", b"tEXt", b"IDAT", b"IEND"]
+    assert json.loads(read_png_text(saved_data)["parameters"]) == {"seed": 7}
+
+def test_streamed_generation_is_post_processed(stub_server, tmp_path):
+    """Test that stream=True embeds the payload and renders derivatives."""
+    Image = pytest.importorskip("PIL.Image")
+    stub_server.images = [base64.b64encode(make_png()).decode()]
+    processor = PostProcessor([Derivative("_thumb", "WEBP", max_size=2)], workers=1)
+    sink = FileSystemSink(post_processor=processor)
+
+    with DrawThingsClient(stub_server.url, stream=True, sink=sink) as client:
+        path = client.generate_image("A cat", seed=3, output_dir=str(tmp_path))[0]
+        processor.wait()
+
+    with open(path, "rb") as f:
+        assert json.loads(read_png_text(f.read())["parameters"])["seed"] == 3
+    with Image.open(Derivative("_thumb", "WEBP").path_for(path)) as thumbnail:
+        assert thumbnail.size == (2, 1)
+
+def test_metadata_must_match_images(tmp_path):
+    """Test that a metadata list of the wrong length is rejected."""
+    with pytest.raises(ValueError):
+        FileSystemSink().save([base64.b64encode(make_png()).decode()], None, str(tmp_path),
+                              metadata=[{}, {}])
+
+def test_derivative_validation():
+    """Test that unknown formats and empty suffixes are rejected."""
+    with pytest.raises(ValueError):
+        Derivative("_thumb", "GIF")
+    with pytest.raises(ValueError):
+        Derivative("", "PNG")
+    assert Derivative("_thumb", "webp").path_for("out/cat.png") == "out/cat_thumb.webp"
+
+def test_derivatives_require_pillow(monkeypatch):
+    """Test that derivatives without Pillow fail with an install hint."""
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+
+    with pytest.raises(ImportError, match=r"draw-things\[images\]"):
+        PostProcessor([Derivative("_thumb", max_size=64)])
+    PostProcessor()  # metadata alone needs nothing
+
+def test_derivatives_render_in_process_pool(tmp_path):
+    """Test that thumbnails and format variants are written beside the image."""
+    Image = pytest.importorskip("PIL.Image")
+    processor = PostProcessor([
+        Derivative("_thumb", "WEBP", max_size=2, quality=80),
+        Derivative("_full", "JPEG", quality=90),
+    ], workers=2)
+    sink = FileSystemSink(post_processor=processor)
+    images = [base64.b64encode(make_png()).decode() for _ in range(2)]
+
+    paths = sink.save(images, "model", str(tmp_path), metadata=[{"seed": 1}] * 2)
+    processor.wait()
+    assert processor._pending == set()
+    sink.close()
+
+    stems = [os.path.splitext(path)[0] for path in paths]
+    expected = [f"{stem}{end}" for stem in stems for end in ("_thumb.webp", "_full.jpg")]
+    assert all(os.path.exists(path) for path in expected)
+    with Image.open(expected[0]) as thumbnail:
+        assert (thumbnail.format, thumbnail.size) == ("WEBP", (2, 1))
+    with Image.open(expected[1]) as full:
+        assert (full.format, full.size) == ("JPEG", (4, 2))
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".")]
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(expected[0]).st_mode & 0o777 == 0o666 & ~umask
+
+def test_render_errors_surface_from_wait(tmp_path):
+    """Test that a failed render is raised once pending work is done."""
+    pytest.importorskip("PIL")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        processor = PostProcessor([Derivative("_thumb", max_size=2)], executor=executor)
+        sink = FileSystemSink(post_processor=processor)
+        sink.save([base64.b64encode(b"not an image").decode()], None, str(tmp_path))
+
+        with pytest.raises(Exception):
+            processor.wait()
+        sink.close()
+
+def test_finished_renders_are_not_kept(tmp_path):
+    """Test that renders are forgotten as they finish and only the error waits."""
+    pytest.importorskip("PIL")
+    image = tmp_path / "cat.png"
+    image.write_bytes(make_png())
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        processor = PostProcessor([Derivative("_thumb", max_size=2)], executor=executor)
+        done = processor.submit(make_png(), str(image))
+        processor.submit(b"not an image", str(tmp_path / "bad.png"))
+    # Shutting the executor down waited for the renders and their callbacks
+
+    assert processor._pending == set()
+    assert done.result() == [str(tmp_path / "cat_thumb.png")]
+    with pytest.raises(Exception):
+        processor.wait()
+    processor.wait()  # the error was reported once
@@ -0,0 +1,111 @@
+"""
+Tests for progress polling and cancellation.
+"""
+
+import os
+import threading
+import time
+import urllib.error
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.image_generator import (
+    GenerationCancelledError, ImageGenerationError, ImageGenerator
+)
+from draw_things.core.progress import Progress, ProgressWatcher
+
+def test_progress_from_response():
+    """Test parsing full and sparse progress responses."""
+    progress = Progress.from_response({
+        "progress": 0.5, "eta_relative": 3.0, "current_image": "abc",
+        "state": {"sampling_step": 16, "sampling_steps": 32, "job_count": 1},
+    })
+    assert (progress.step, progress.steps, progress.fraction, progress.eta) == (16, 32, 0.5, 3.0)
+    assert progress.image == "abc" and progress.active
+
+    idle = Progress.from_response({})
+    assert (idle.step, idle.steps, idle.active, idle.image) == (0, 0, False, None)
+
+def test_fetch_progress_and_preview(stub_server):
+    """Test that previews are only sent when asked for."""
+    with ImageGenerator(stub_server.url) as generator:
+        assert not generator.fetch_progress().active
+        stub_server.latency = 0.5
+        worker = threading.Thread(target=generator.generate_images, kwargs={"prompt": "A cat"})
+        worker.start()
+        time.sleep(0.1)
+        without = generator.fetch_progress()
+        with_preview = generator.fetch_progress(preview=True)
+        worker.join()
+
+    assert without.active and with_preview.image
+    assert stub_server.paths[-2].endswith("/progress?skip_current_image=true")
+
+def test_watcher_reports_steps(stub_server, tmp_path):
+    """Test that reports arrive while a generation runs, steps increasing."""
+    stub_server.latency = 0.6
+    reports = []
+    with DrawThingsClient(stub_server.url) as client:
+        watcher = ProgressWatcher(client._generator, on_progress=reports.append,
+                                  min_interval=0.02, max_interval=0.1)
+        paths = client.generate_image("A cat", steps=10, output_dir=str(tmp_path),
+                                      progress=watcher)
+
+    assert len(paths) == 1
+    steps = [report.step for report in reports if report.active]
+    assert len(steps) >= 2
+    assert steps == sorted(steps) and steps[-1] > steps[0]
+    assert not watcher.running
+
+def test_cancel_interrupts_server(stub_server, tmp_path):
+    """Test that cancelling frees the server early and saves nothing."""
+    stub_server.latency = 10.0
+    errors = []
+    with DrawThingsClient(stub_server.url) as client:
+        started = threading.Event()
+        watcher = client.watch(on_progress=lambda progress: started.set())
+        watcher.min_interval = 0.02
+
+        def generate():
+            try:
+                client.generate_image("A cat", output_dir=str(tmp_path), progress=watcher)
+            except ImageGenerationError as e:
+                errors.append(e)
+
+        start = time.monotonic()
+        worker = threading.Thread(target=generate)
+        worker.start()
+        assert started.wait(5)
+        watcher.cancel()
+        worker.join()
+
+    assert time.monotonic() - start < 5
+    assert stub_server.interrupts == 1
+    assert [type(e) for e in errors] == [GenerationCancelledError]
+    assert os.listdir(tmp_path) == []
+
+def test_cancel_before_start(stub_server):
+    """Test that a cancelled watcher stops the call before any request."""
+    with DrawThingsClient(stub_server.url) as client:
+        watcher = client.watch()
+        watcher.cancel()
+        with pytest.raises(GenerationCancelledError):
+            client.generate_image("A cat", progress=watcher)
+
+    assert stub_server.payloads == [] and stub_server.interrupts == 0
+
+def test_watcher_stops_when_unsupported():
+    """Test that a server without a progress endpoint is polled once."""
+    generator = ImageGenerator("http://a/api/v1/txt2img")
+    calls = []
+
+    def missing(url=None, preview=False):
+        calls.append(url)
+        error = urllib.error.HTTPError("http://a/progress", 404, "Not Found", {}, None)
+        raise ImageGenerationError("HTTP Error: 404") from error
+
+    generator.fetch_progress = missing
+    with ProgressWatcher(generator, min_interval=0.01) as watcher:
+        time.sleep(0.1)
+
+    assert len(calls) == 1 and not watcher.supported
@@ -0,0 +1,150 @@
+"""
+Tests for retries, deadlines and timeouts.
+"""
+
+import time
+import urllib.error
+from unittest.mock import patch
+
+import pytest
+from draw_things.core.image_generator import (
+    DeadlineExceededError, ImageGenerationError, ImageGenerator
+)
+from draw_things.core.retry import Deadline, RetryPolicy, is_retryable
+
+def _http_error(code, headers=None):
+    return urllib.error.HTTPError("http://a/txt2img", code, "Error", headers or {}, None)
+
+def test_retryable_errors():
+    """Test which failures are worth retrying."""
+    assert is_retryable(_http_error(503))
+    assert is_retryable(_http_error(429))
+    assert is_retryable(urllib.error.URLError("timed out"))
+    assert not is_retryable(_http_error(400))
+    assert not is_retryable(ValueError("bad"))
+    assert not is_retryable(None)
+
+def test_backoff_is_jittered_and_capped():
+    """Test full-jitter exponential backoff."""
+    policy = RetryPolicy(max_attempts=10, backoff=1.0, max_backoff=4.0)
+
+    delays = [policy.delay(5) for _ in range(200)]
+
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 100
+    assert all(policy.delay(1) <= 1.0 for _ in range(50))
+
+def test_retry_after_sets_floor():
+    """Test that the server's Retry-After header is honoured."""
+    policy = RetryPolicy(backoff=0.0, max_backoff=10.0)
+
+    assert policy.delay(1, _http_error(429, {"Retry-After": "3"})) == 3.0
+    assert policy.delay(1, _http_error(429, {"Retry-After": "Wed, 21 Oct 2015"})) == 0.0
+
+def test_should_retry_respects_attempts():
+    """Test that retries stop after max_attempts tries."""
+    policy = RetryPolicy(max_attempts=3)
+    error = _http_error(500)
+
+    assert policy.should_retry(error, 1)
+    assert policy.should_retry(error, 2)
+    assert not policy.should_retry(error, 3)
+
+def test_deadline():
+    """Test the remaining time of a deadline."""
+    assert Deadline(None).remaining() is None
+    assert not Deadline(None).expired()
+    deadline = Deadline(0.05)
+    assert 0 < deadline.remaining() <= 0.05
+    time.sleep(0.06)
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+
+def _flaky_urlopen(generator, error, failures=1):
+    """Make the generator's pool fail the first requests with error."""
+    real_urlopen = generator.pool.urlopen
+    calls = []
+
+    def urlopen(*args, **kwargs):
+        calls.append(kwargs.get("timeout"))
+        if len(calls) <= failures:
+            raise error
+        return real_urlopen(*args, **kwargs)
+
+    return patch.object(generator.pool, "urlopen", side_effect=urlopen), calls
+
+def test_fixed_seed_request_is_retried(stub_server):
+    """Test that a fixed-seed request survives a transient failure."""
+    generator = ImageGenerator(stub_server.url, retry=RetryPolicy(backoff=0.0))
+    flaky, calls = _flaky_urlopen(generator, _http_error(503))
+
+    with flaky:
+        images = generator.generate_images(prompt="test", seed=42)
+
+    assert len(images) == 1
+    assert len(calls) == 2
+    generator.close()
+
+def test_random_seed_request_is_not_retried():
+    """Test that non-idempotent random-seed requests fail on the first error."""
+    generator = ImageGenerator("http://a/api/v1/txt2img", retry=RetryPolicy(backoff=0.0))
+
+    with patch.object(generator.pool, "urlopen", side_effect=_http_error(503)) as urlopen:
+        with pytest.raises(ImageGenerationError, match="503"):
+            generator.generate_images(prompt="test", seed=-1)
+
+    assert urlopen.call_count == 1
+    generator.close()
+
+def test_retries_give_up_after_max_attempts():
+    """Test that a persistently failing fixed-seed request stops retrying."""
+    generator = ImageGenerator(
+        "http://a/api/v1/txt2img", retry=RetryPolicy(max_attempts=3, backoff=0.0)
+    )
+    generator.backends.failure_threshold = 10
+
+    with patch.object(generator.pool, "urlopen", side_effect=_http_error(500)) as urlopen:
+        with pytest.raises(ImageGenerationError, match="500"):
+            generator.generate_images(prompt="test", seed=1)
+
+    assert urlopen.call_count == 3
+    generator.close()
+
+def test_hung_server_times_out(stub_server):
+    """Test that a server that never answers can't block a caller forever."""
+    stub_server.latency = 1.0
+    generator = ImageGenerator(stub_server.url, timeout=0.1)
+
+    start = time.monotonic()
+    with pytest.raises(ImageGenerationError, match="timed out"):
+        generator.generate_images(prompt="test")
+
+    assert time.monotonic() - start < 0.5
+    generator.close()
+
+def test_deadline_bounds_retries(stub_server):
+    """Test that the per-request deadline covers every retry."""
+    stub_server.latency = 1.0
+    generator = ImageGenerator(stub_server.url, retry=RetryPolicy(max_attempts=100, backoff=0.01))
+    generator.backends.failure_threshold = 100
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        generator.generate_images(prompt="test", seed=7, timeout=0.3)
+
+    assert time.monotonic() - start < 0.6
+    generator.close()
+
+def test_streaming_request_is_retried(stub_server, tmp_path):
+    """Test that streamed fixed-seed requests are retried too."""
+    generator = ImageGenerator(stub_server.url, retry=RetryPolicy(backoff=0.0))
+    flaky, calls = _flaky_urlopen(generator, urllib.error.URLError("connection reset"))
+
+    with flaky:
+        paths = generator.generate_images_to_files(
+            generator.build_payload(prompt="test", seed=3), output_dir=str(tmp_path)
+        )
+
+    assert len(paths) == 1
+    assert len(calls) == 2
+    generator.close()
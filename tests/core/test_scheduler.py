@@ -0,0 +1,78 @@
+"""
+Tests for the model-affinity scheduler.
+"""
+
+from draw_things.core.image_generator import ImageGenerator, ImageGenerationError
+from draw_things.core.scheduler import ModelAffinityScheduler, model_key
+
+def _payloads(generator, models, **kwargs):
+    return [generator.build_payload(prompt="test", model=model, **kwargs) for model in models]
+
+def _served_models(server):
+    return [payload["model"] for payload in server.payloads]
+
+def test_model_key_includes_loras():
+    """Test that the LoRA set is part of the model group."""
+    generator = ImageGenerator()
+    plain = generator.build_payload(prompt="test", model="m1")
+    with_lora = generator.build_payload(prompt="test", model="m1", loras=["b", "a"])
+    reordered = generator.build_payload(prompt="test", model="m1", loras=["a", "b"])
+
+    assert model_key(plain) != model_key(with_lora)
+    assert model_key(with_lora) == model_key(reordered)
+
+def test_interleaved_jobs_are_grouped(stub_server):
+    """Test that interleaved models are drained one group at a time."""
+    generator = ImageGenerator(stub_server.url)
+
+    with ModelAffinityScheduler(generator) as scheduler:
+        futures = scheduler.submit_many(_payloads(generator, ["m1", "m2"] * 4))
+        results = [future.result(timeout=5) for future in futures]
+
+    assert all(len(images) == 1 for images in results)
+    assert _served_models(stub_server) == ["m1"] * 4 + ["m2"] * 4
+    assert scheduler.metrics() == {
+        "jobs": 8, "pending": 0, "switches": 1, "fifo_switches": 7, "switches_avoided": 6
+    }
+
+def test_group_run_fairness_bound(stub_server):
+    """Test that a busy model yields after max_group_run jobs."""
+    generator = ImageGenerator(stub_server.url)
+
+    with ModelAffinityScheduler(generator, max_group_run=2) as scheduler:
+        scheduler.submit_many(_payloads(generator, ["m1"] * 4 + ["m2"] * 2))
+
+    assert _served_models(stub_server) == ["m1", "m1", "m2", "m2", "m1", "m1"]
+
+def test_max_wait_fairness_bound(stub_server):
+    """Test that a group waiting past max_wait preempts the current one."""
+    stub_server.latency = 0.03
+    generator = ImageGenerator(stub_server.url)
+
+    with ModelAffinityScheduler(generator, max_wait=0.05) as scheduler:
+        scheduler.submit_many(_payloads(generator, ["m1"] * 8 + ["m2"]))
+
+    assert _served_models(stub_server).index("m2") < 8
+
+def test_workers_drain_before_switching(stub_server):
+    """Test that concurrent workers never mix models on the server."""
+    stub_server.latency = 0.02
+    generator = ImageGenerator(stub_server.url)
+
+    with ModelAffinityScheduler(generator, workers=3) as scheduler:
+        scheduler.submit_many(_payloads(generator, ["m1", "m2", "m3"] * 3))
+
+    served = _served_models(stub_server)
+    assert sorted(served[:3]) == ["m1"] * 3
+    assert sorted(served[3:6]) == ["m2"] * 3
+    assert stub_server.max_in_flight == 3
+    assert scheduler.metrics()["switches"] == 2
+
+def test_errors_reach_the_caller():
+    """Test that a failed generation fails only its own future."""
+    generator = ImageGenerator("http://127.0.0.1:9/api/v1/txt2img")
+
+    with ModelAffinityScheduler(generator) as scheduler:
+        future = scheduler.submit(generator.build_payload(prompt="test"))
+
+    assert isinstance(future.exception(timeout=5), ImageGenerationError)
@@ -0,0 +1,105 @@
+"""
+Tests for coalescing identical in-flight requests.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from draw_things.core.cache import ResultCache
+from draw_things.core.image_generator import ImageGenerator
+from draw_things.core.singleflight import SingleFlight
+from tests.utils import SAMPLE_BASE64_IMAGE
+
+def test_concurrent_calls_share_one_execution():
+    """Test that callers arriving mid-flight get the leader's result."""
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        release.wait()
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(flight.do, "key", work) for _ in range(5)]
+        while flight.stats()["coalesced"] < 4:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(executions) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert all(result == "result" for result, _ in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 4}
+
+def test_error_propagates_to_waiters():
+    """Test that every coalesced caller sees the leader's error."""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flight.do, "key", fail) for _ in range(3)]
+        while flight.stats()["coalesced"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+def test_completed_calls_are_not_remembered():
+    """Test that a call after completion runs again."""
+    flight = SingleFlight()
+
+    flight.do("key", lambda: 1)
+    result, shared = flight.do("key", lambda: 2)
+
+    assert (result, shared) == (2, False)
+    assert flight.stats()["calls"] == 2
+
+def _burst(generator, count, **kwargs):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [
+            executor.submit(generator.generate_images, prompt="popular prompt", **kwargs)
+            for _ in range(count)
+        ]
+        return [future.result() for future in futures]
+
+def test_generator_coalesces_fixed_seed_burst(stub_server):
+    """Test that a burst of identical fixed-seed requests sends one POST."""
+    stub_server.latency = 0.2
+    generator = ImageGenerator(stub_server.url, coalesce=True)
+
+    results = _burst(generator, 5, seed=42)
+
+    assert len(stub_server.payloads) == 1
+    assert all(images == [SAMPLE_BASE64_IMAGE] for images in results)
+    assert generator.stats() == {"upstream_calls": 1, "coalesced": 4}
+
+def test_generator_does_not_coalesce_random_seeds(stub_server):
+    """Test that random-seed requests each reach the server."""
+    stub_server.latency = 0.1
+    generator = ImageGenerator(stub_server.url, coalesce=True)
+
+    _burst(generator, 3, seed=-1)
+
+    assert len(stub_server.payloads) == 3
+
+def test_generator_stats_include_cache(stub_server, tmp_path):
+    """Test that cache hits and coalescing are reported together."""
+    generator = ImageGenerator(
+        stub_server.url, cache=ResultCache(str(tmp_path)), coalesce=True
+    )
+
+    generator.generate_images(prompt="popular prompt", seed=1)
+    generator.generate_images(prompt="popular prompt", seed=1)
+
+    assert generator.stats() == {
+        "cache_hits": 1, "cache_misses": 1, "upstream_calls": 1, "coalesced": 0
+    }
@@ -0,0 +1,76 @@
+"""
+Tests for the source image cache.
+"""
+
+import base64
+import mmap
+import os
+from unittest.mock import patch
+
+import pytest
+from draw_things.core.sources import SourceImageCache, describe_source
+
+def _write(path, data):
+    path.write_bytes(data)
+    return path
+
+def test_encodes_files_and_bytes(tmp_path):
+    """Test that paths and buffers encode to the same base64."""
+    cache = SourceImageCache()
+    path = _write(tmp_path / "init.png", b"source image")
+
+    assert cache.encode(path) == base64.b64encode(b"source image").decode()
+    assert cache.encode(str(path)) == cache.encode(b"source image")
+    assert cache.encode(_write(tmp_path / "empty.png", b"")) == ""
+
+def test_unchanged_file_is_not_read_again(tmp_path):
+    """Test that a repeat request skips mapping and hashing the file."""
+    cache = SourceImageCache()
+    path = _write(tmp_path / "init.png", b"x" * 4096)
+    first = cache.encode(path)
+
+    with patch.object(mmap, "mmap", side_effect=AssertionError("file read again")):
+        assert cache.encode(path) is first
+    assert cache.stats()["hits"] == 1
+
+def test_identical_content_shares_an_entry(tmp_path):
+    """Test that copies of one image are encoded once."""
+    cache = SourceImageCache()
+    a = _write(tmp_path / "a.png", b"same image")
+    b = _write(tmp_path / "b.png", b"same image")
+
+    assert cache.encode(a) is cache.encode(b)
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 1
+
+def test_changed_file_is_encoded_again(tmp_path):
+    """Test that rewriting a file invalidates its encoding."""
+    cache = SourceImageCache()
+    path = _write(tmp_path / "init.png", b"first")
+    cache.encode(path)
+    _write(path, b"second image")
+    os.utime(path, ns=(0, 1))  # make sure the mtime moves on coarse clocks
+
+    assert cache.encode(path) == base64.b64encode(b"second image").decode()
+    assert cache.stats()["misses"] == 2
+
+def test_evicts_least_recently_used(tmp_path):
+    """Test that the cache stays within max_bytes."""
+    cache = SourceImageCache(max_bytes=20)
+    cache.encode(b"a" * 9)  # 12 base64 characters
+    cache.encode(b"b" * 9)
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 12
+    cache.encode(b"b" * 9)
+    assert cache.stats()["hits"] == 1
+
+def test_missing_file_raises(tmp_path):
+    """Test that unreadable sources raise OSError."""
+    with pytest.raises(OSError):
+        SourceImageCache().encode(tmp_path / "missing.png")
+
+def test_describe_source(tmp_path):
+    """Test that sources are described by path or size."""
+    assert describe_source(tmp_path / "a.png") == str(tmp_path / "a.png")
+    assert describe_source(b"1234") == "<4 bytes>"
@@ -0,0 +1,130 @@
+"""
+Tests for incremental response parsing.
+"""
+
+import base64
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.image_generator import ImageGenerator, ImageGenerationError
+from draw_things.core.streaming import stream_images
+from tests.utils import SAMPLE_BASE64_IMAGE
+
+class _Collector:
+    """open_image callback that keeps written images in memory."""
+
+    def __init__(self):
+        self.images = []
+
+    def __call__(self, index):
+        output = io.BytesIO()
+        output.close = lambda: self.images.append(output.getvalue())
+        return output
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+def test_stream_images(chunk_size):
+    """Test decoding images surrounded by other members at any chunk size."""
+    first, second = os.urandom(301), os.urandom(1024)
+    body = json.dumps({
+        "parameters": {"prompt": "a \"quoted\" [prompt]", "loras": [{"w": 1.5}]},
+        "images": [base64.b64encode(first).decode(), base64.b64encode(second).decode()],
+        "info": "{\"seed\": 42}",
+        "done": True,
+    }).encode()
+    collector = _Collector()
+
+    count = stream_images(io.BytesIO(body), collector, chunk_size=chunk_size)
+
+    assert count == 2
+    assert collector.images == [first, second]
+
+def test_stream_images_escaped_slashes():
+    """Test that JSON-escaped slashes in base64 are decoded."""
+    data = b"\xff\xff\xff" * 10
+    encoded = base64.b64encode(data).decode()
+    assert "/" in encoded
+    body = '{"images": ["%s"]}' % encoded.replace("/", "\\/")
+    collector = _Collector()
+
+    stream_images(io.BytesIO(body.encode()), collector)
+
+    assert collector.images == [data]
+
+def test_stream_images_without_images():
+    """Test that a response without images yields nothing."""
+    assert stream_images(io.BytesIO(b'{"error": "busy"}'), _Collector()) == 0
+
+def test_stream_images_malformed():
+    """Test that truncated JSON raises a decode error."""
+    with pytest.raises(json.JSONDecodeError):
+        stream_images(io.BytesIO(b'{"images": ["iVBO'), _Collector())
+
+def test_generate_images_to_files(stub_server, temp_output_dir):
+    """Test streaming a generation straight to disk."""
+    generator = ImageGenerator(stub_server.url)
+
+    saved_paths = generator.generate_images_to_files(
+        generator.build_payload(prompt="test prompt"),
+        model_name="standard",
+        output_dir=str(temp_output_dir)
+    )
+
+    assert len(saved_paths) == 1
+    assert "standard" in saved_paths[0]
+    with open(saved_paths[0], "rb") as f:
+        assert f.read() == base64.b64decode(SAMPLE_BASE64_IMAGE)
+    # The body was fully consumed, so the connection went back to the pool
+    assert generator.pool.idle_count() == 1
+
+def test_generate_images_to_files_bad_base64(stub_server, temp_output_dir):
+    """Test that undecodable images raise and leave no partial files."""
+    stub_server.images = ["not base64!"]
+    generator = ImageGenerator(stub_server.url)
+
+    with pytest.raises(ImageGenerationError) as exc_info:
+        generator.generate_images_to_files(
+            generator.build_payload(prompt="test prompt"),
+            output_dir=str(temp_output_dir)
+        )
+
+    assert "Error decoding image" in str(exc_info.value)
+    assert list(temp_output_dir.iterdir()) == []
+
+def test_client_stream_option(stub_server, temp_output_dir):
+    """Test that a streaming client saves through the streaming path."""
+    client = DrawThingsClient(api_url=stub_server.url, stream=True)
+
+    saved_paths = client.generate_image(prompt="test prompt", output_dir=str(temp_output_dir))
+
+    assert len(saved_paths) == 1
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("image_bytes", [1024 * 1024, 8 * 1024 * 1024])
+def test_streaming_peak_memory_is_flat(stub_server, temp_output_dir, image_bytes):
+    """Benchmark peak memory: streaming stays flat while buffering grows with size."""
+    stub_server.images = [base64.b64encode(os.urandom(image_bytes)).decode()] * 2
+    generator = ImageGenerator(stub_server.url)
+    payload = generator.build_payload(prompt="test prompt")
+
+    streamed_peak = _peak_memory(
+        lambda: generator.generate_images_to_files(payload, output_dir=str(temp_output_dir))
+    )
+    buffered_peak = _peak_memory(
+        lambda: generator.save_images(
+            generator.generate_from_payload(payload), output_dir=str(temp_output_dir)
+        )
+    )
+
+    assert streamed_peak < 1024 * 1024
+    assert buffered_peak > 2 * image_bytes
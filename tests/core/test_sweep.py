@@ -0,0 +1,133 @@
+"""
+Tests for the sweep engine.
+"""
+
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+from draw_things.core.manifest import ResultManifest
+from draw_things.core.sweep import SweepJob, SweepRunner, build_grid, order_by_model
+
+def test_build_grid():
+    """Test that the grid covers every combination, grouped by model."""
+    jobs = build_grid(["a", "b"], ["m1", "m2"], seeds=[1, 2, 3], samplers=["s1", "s2"])
+
+    assert len(jobs) == 24
+    assert [job.model for job in jobs[:12]] == ["m1"] * 12
+    assert len({job.job_id for job in jobs}) == 24
+
+def test_job_id_is_stable():
+    """Test that identical jobs share an id across runs."""
+    assert SweepJob("a", "m1", 1, width=512).job_id == SweepJob("a", "m1", 1, width=512).job_id
+    assert SweepJob("a", "m1", 1).job_id != SweepJob("a", "m1", 2).job_id
+
+def test_order_by_model_groups_interleaved_jobs():
+    """Test that interleaved jobs are regrouped to minimize model switches."""
+    jobs = [SweepJob("p", model) for model in ["m1", "m2", "m1", "m3", "m2"]]
+
+    groups = order_by_model(jobs)
+
+    assert [[job.model for job in group] for group in groups] == [
+        ["m1", "m1"], ["m2", "m2"], ["m3"]
+    ]
+
+def test_loras_are_part_of_the_model_group():
+    """Test that the same model with different LoRAs forms separate groups."""
+    jobs = [SweepJob("p", "m1", loras=["x"]), SweepJob("p", "m1"), SweepJob("p", "m1", loras=["x"])]
+
+    assert [len(group) for group in order_by_model(jobs)] == [2, 1]
+
+def test_runner_runs_one_model_at_a_time(tmp_path):
+    """Test that workers never mix models on the server."""
+    lock = threading.Lock()
+    active = []
+    overlaps = []
+
+    def generate_image(**request):
+        with lock:
+            active.append(request["model"])
+            if len(set(active)) > 1:
+                overlaps.append(list(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(request["model"])
+        return [f"{request['model']}.png"]
+
+    client = MagicMock()
+    client.generate_image.side_effect = generate_image
+    jobs = build_grid(["a", "b", "c"], ["m1", "m2"], seeds=[1, 2])
+
+    records = SweepRunner(client, str(tmp_path), workers=4).run(jobs)
+
+    assert len(records) == 12
+    assert overlaps == []
+
+def test_runner_records_failures_in_manifest(tmp_path):
+    """Test that failures are recorded rather than aborting the sweep."""
+    client = MagicMock()
+    client.generate_image.side_effect = [["ok.png"], RuntimeError("server exploded")]
+
+    SweepRunner(client, str(tmp_path), workers=1).run(build_grid(["a"], ["m1", "m2"]))
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert (manifest["succeeded"], manifest["failed"]) == (1, 1)
+    assert manifest["jobs"][1]["error"] == "server exploded"
+
+def test_runner_resumes_after_crash(tmp_path):
+    """Test that a rerun skips succeeded jobs and retries failed ones."""
+    client = MagicMock()
+    client.generate_image.side_effect = [["one.png"], RuntimeError("crash"), ["two.png"]]
+    jobs = build_grid(["a"], ["m1", "m2"])
+
+    SweepRunner(client, str(tmp_path)).run(jobs)
+    records = SweepRunner(client, str(tmp_path)).run(jobs)
+
+    assert client.generate_image.call_count == 3
+    assert [record["paths"] for record in records] == [["one.png"], ["two.png"]]
+    assert records[0]["resumed"] is True
+
+def test_manifest_skips_jobs_across_output_dirs(tmp_path):
+    """Test that a sweep into a fresh directory skips jobs a manifest holds."""
+    def generate_image(**request):
+        path = tmp_path / f"{request['model']}-{request['seed']}.png"
+        path.touch()
+        return [str(path)]
+
+    client = MagicMock()
+    client.build_payload.side_effect = lambda **request: request
+    client.generate_image.side_effect = generate_image
+    jobs = build_grid(["a"], ["m1", "m2"], seeds=[1, 2])
+
+    with ResultManifest(str(tmp_path / "manifest.db")) as manifest:
+        SweepRunner(client, str(tmp_path / "run1"), manifest=manifest).run(jobs[:3])
+        records = SweepRunner(client, str(tmp_path / "run2"), manifest=manifest).run(jobs)
+
+    assert client.generate_image.call_count == 4
+    assert [record.get("resumed", False) for record in records] == [True, True, True, False]
+    assert records[0]["paths"] == [str(tmp_path / "m1-1.png")]
+
+def test_runner_checkpoints_jobs_as_they_finish(tmp_path):
+    """Test that a finished job is checkpointed while an earlier one still runs."""
+    checkpointed = threading.Event()
+
+    def generate_image(**request):
+        if request["prompt"] == "slow":
+            assert checkpointed.wait(5)
+        return [request["prompt"] + ".png"]
+
+    def on_result(record):
+        if record["job"]["prompt"] == "fast":
+            lines = (tmp_path / "checkpoint.jsonl").read_text().splitlines()
+            assert json.loads(lines[-1])["job"]["prompt"] == "fast"
+            checkpointed.set()
+
+    client = MagicMock()
+    client.generate_image.side_effect = generate_image
+    runner = SweepRunner(client, str(tmp_path), workers=2, on_result=on_result)
+
+    records = runner.run([SweepJob("slow", "m1"), SweepJob("fast", "m1")])
+
+    assert [record["job"]["prompt"] for record in records] == ["fast", "slow"]
+    assert all(record["status"] == "ok" for record in records)
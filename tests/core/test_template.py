@@ -0,0 +1,53 @@
+"""
+Tests for request templates.
+"""
+
+import json
+
+import pytest
+from draw_things.api.client import DrawThingsClient
+from draw_things.core.codec import available_codecs, get_codec
+from draw_things.core.image_generator import ImageGenerator
+from draw_things.core.template import RequestTemplate
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_encode_matches_payload(name):
+    """Test that spliced bodies parse to the same payload as a full rebuild."""
+    generator = ImageGenerator(codec=get_codec(name))
+    template = generator.template(model="standard", steps=20)
+
+    body = template.encode(prompt="A cat", seed=7)
+
+    assert json.loads(body) == generator.build_payload(
+        prompt="A cat", model="standard", steps=20, seed=7
+    )
+    assert json.loads(template.encode()) == template.payload()
+
+def test_overriding_other_fields_serializes_everything():
+    """Test that fields outside the varying set still end up in the body."""
+    template = RequestTemplate({"prompt": "", "steps": 20}, fields=("prompt",))
+
+    assert json.loads(template.encode(steps=30, prompt="A")) == {"prompt": "A", "steps": 30}
+    assert template.payload(prompt="A") == {"prompt": "A", "steps": 20}
+    assert template.base == {"prompt": "", "steps": 20}
+
+def test_only_varying_fields():
+    """Test templates whose payload is all varying fields."""
+    template = RequestTemplate({"prompt": "A", "seed": 1})
+
+    assert json.loads(template.encode(seed=2)) == {"prompt": "A", "seed": 2}
+    assert json.loads(RequestTemplate({}).encode(prompt="B")) == {"prompt": "B"}
+
+def test_generate_from_template_sends_encoded_body(stub_server, tmp_path):
+    """Test that template requests reach the server with the right payload."""
+    with DrawThingsClient(stub_server.url) as client:
+        template = client.template(model="standard", steps=20)
+        for seed in (1, 2):
+            paths = client.generate_from_template(
+                template, prompt="A cat", seed=seed, output_dir=str(tmp_path)
+            )
+            assert len(paths) == 1
+
+    assert [payload["seed"] for payload in stub_server.payloads] == [1, 2]
+    assert all(payload["steps"] == 20 and payload["prompt"] == "A cat"
+               for payload in stub_server.payloads)
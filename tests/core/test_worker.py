@@ -0,0 +1,147 @@
+"""
+Tests for the job queue worker.
+"""
+
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from draw_things.core.job_queue import SQLiteJobQueue
+from draw_things.core.worker import Worker
+
+ROOT = Path(__file__).resolve().parents[2]
+
+def test_drain_runs_every_job(tmp_path):
+    """Test that a draining worker runs the backlog, recording each result."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    ok = queue.put({"prompt": "a"})
+    bad = queue.put({"prompt": "fail"})
+    client = MagicMock()
+    client.generate_image.side_effect = lambda **request: (
+        [f"{request['output_dir']}/a.png"] if request["prompt"] != "fail"
+        else (_ for _ in ()).throw(RuntimeError("boom"))
+    )
+    seen = []
+
+    worker = Worker(client, queue, concurrency=2, output_dir="out", on_result=seen.append)
+    totals = worker.run(drain=True)
+
+    assert totals == {"succeeded": 1, "failed": 1}
+    assert queue.result(ok)["paths"] == ["out/a.png"]
+    assert queue.result(bad)["error"] == "boom"
+    assert {record["job_id"] for record in seen} == {ok, bad}
+
+def test_concurrency_is_bounded(tmp_path):
+    """Test that no more than concurrency jobs run at once."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    for i in range(12):
+        queue.put({"prompt": str(i)})
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def generate_image(**request):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return []
+
+    client = MagicMock()
+    client.generate_image.side_effect = generate_image
+
+    Worker(client, queue, concurrency=3).run(drain=True)
+
+    assert peak[0] == 3
+    assert queue.counts()["done"] == 12
+
+def test_default_priority(tmp_path):
+    """Test that jobs without a priority get the worker's."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    queue.put({"prompt": "a"})
+    queue.put({"prompt": "b", "priority": "interactive"})
+    client = MagicMock()
+    client.generate_image.return_value = []
+
+    Worker(client, queue, concurrency=1, priority="batch").run(drain=True)
+
+    priorities = [call.kwargs["priority"] for call in client.generate_image.call_args_list]
+    assert priorities == ["batch", "interactive"]
+
+def test_unrecorded_job_counts_as_failed(tmp_path, caplog):
+    """Test that a failure to store a result is logged and counted."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    queue.put({"prompt": "a"})
+    queue.complete = MagicMock(side_effect=sqlite3.OperationalError("database is locked"))
+    client = MagicMock()
+    client.generate_image.return_value = ["a.png"]
+    records = []
+
+    with caplog.at_level(logging.ERROR):
+        counts = Worker(client, queue, on_result=records.append).run(drain=True)
+
+    assert counts == {"succeeded": 0, "failed": 1}
+    assert "database is locked" in records[0]["error"]
+    assert "database is locked" in caplog.text
+    assert queue.counts()["running"] == 1
+
+def test_stop_finishes_jobs_in_flight(tmp_path):
+    """Test that stopping lets running jobs finish and leaves the rest queued."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    for i in range(5):
+        queue.put({"prompt": str(i)})
+    started = threading.Event()
+    release = threading.Event()
+
+    def generate_image(**request):
+        started.set()
+        release.wait(5)
+        return []
+
+    client = MagicMock()
+    client.generate_image.side_effect = generate_image
+    worker = Worker(client, queue, concurrency=1, poll_interval=0.01)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    started.wait(5)
+
+    worker.stop()
+    release.set()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert queue.counts() == {"pending": 4, "running": 0, "done": 1, "failed": 0}
+
+def test_sigterm_drains_daemon(stub_server, tmp_path):
+    """Test that the worker process exits cleanly on SIGTERM after its jobs."""
+    spool = tmp_path / "spool"
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+    subprocess.run(
+        [sys.executable, "-m", "draw_things", "enqueue", str(spool)],
+        input='{"prompt": "a"}\n{"prompt": "b"}\n', universal_newlines=True,
+        env=env, check=True, stdout=subprocess.PIPE
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "draw_things", "worker", str(spool),
+         "--api-url", stub_server.url, "--output-dir", str(tmp_path / "out"),
+         "--poll-interval", "0.05"],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    records = [json.loads(process.stdout.readline()) for _ in range(2)]
+
+    process.send_signal(signal.SIGTERM)
+    _, stderr = process.communicate(timeout=10)
+
+    assert process.returncode == 0
+    assert all(record["status"] == "ok" for record in records)
+    assert "2 succeeded, 0 failed" in stderr
+    assert len(list((tmp_path / "out").glob("*.png"))) == 2
@@ -0,0 +1,252 @@
+"""
+Local mock of the Draw Things HTTP API.
+
+Run it standalone to point the client or CLI at a fake server::
+
+    python -m tests.mock_server --port 7860 --latency 0.5 --image-size 1048576
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .utils import SAMPLE_BASE64_IMAGE
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Request handler speaking just enough of the Draw Things HTTP API."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count_sent(len(data))
+        self._finish()
+
+    def _finish(self):
+        if self.server.drop_keepalive:
+            # Hang up without announcing it, like a server whose keep-alive
+            # timeout expired between requests.
+            self.close_connection = True
+
+    def do_GET(self):
+        server = self.server
+        server.record(self)
+        if self.path.endswith("/sd-models"):
+            etag = f'"{hash(tuple(server.models))}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data = json.dumps([
+                {"title": title, "model_name": title.rsplit(".", 1)[0], "filename": f"/models/{title}"}
+                for title in server.models
+            ]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data)
+            server.count_sent(len(data))
+            self._finish()
+        elif self.path.split("?")[0].endswith("/progress"):
+            self._send_json(server.progress())
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server.record(self, payload)
+        if self.path.endswith(("/txt2img", "/img2img")):
+            count = payload.get("batch_size", 1) * payload.get("n_iter", 1)
+            latency = server.latency + server.image_latency * count
+            steps = payload.get("steps", 20)
+            with server.track_in_flight():
+                if server.serialize:
+                    # One GPU: generations queue behind each other
+                    with server.gpu:
+                        server.generate(latency, steps)
+                else:
+                    server.generate(latency, steps)
+            if count == 1:
+                self._send_json(server.txt2img_body)
+            else:
+                self._send_json({"images": (server.images * count)[:count]})
+        elif self.path.endswith("/interrupt"):
+            server.interrupt()
+            self._send_json({})
+        else:
+            self.send_error(404)
+
+
+class MockDrawThingsServer(ThreadingHTTPServer):
+    """Local keep-alive HTTP server standing in for Draw Things.
+
+    Serves ``/sd-models``, ``/txt2img`` and ``/img2img`` with configurable
+    latency and image size, plus ``/progress`` and ``/interrupt`` for the
+    generation in flight. Records the client port and path of every
+    request so callers can tell whether connections were reused, and counts
+    the response bytes sent.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, models=("standard", "model1", "model2"), port=0):
+        super().__init__(("127.0.0.1", port), _MockHandler)
+        self.models = list(models)
+        self.images = [SAMPLE_BASE64_IMAGE]
+        self.drop_keepalive = False
+        self.latency = 0.0
+        self.image_latency = 0.0
+        self.serialize = False
+        self.gpu = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.client_ports = []
+        self.paths = []
+        self.payloads = []
+        self.bytes_sent = 0
+        self.interrupts = 0
+        self._current = None  # (start, latency, steps) of the generation in flight
+        self._interrupted = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def images(self):
+        """Base64 images returned by txt2img."""
+        return self._images
+
+    @images.setter
+    def images(self, images):
+        # Encoded once up front so serving large images allocates nothing
+        self._images = list(images)
+        self.txt2img_body = json.dumps({"images": self._images}).encode("utf-8")
+
+    @property
+    def image_size(self) -> int:
+        """Decoded size in bytes of each image returned by txt2img."""
+        return len(base64.b64decode(self._images[0])) if self._images else 0
+
+    @image_size.setter
+    def image_size(self, size: int):
+        # Random bytes: incompressible, and the client never parses the PNG
+        self.images = [base64.b64encode(os.urandom(size)).decode("ascii")]
+
+    @property
+    def url(self) -> str:
+        """URL of the stub txt2img endpoint."""
+        return f"http://127.0.0.1:{self.server_address[1]}/api/v1/txt2img"
+
+    def record(self, handler, payload=None):
+        with self._lock:
+            self.client_ports.append(handler.client_address[1])
+            self.paths.append(handler.path)
+            if payload is not None:
+                self.payloads.append(payload)
+
+    def count_sent(self, size: int):
+        with self._lock:
+            self.bytes_sent += size
+
+    def generate(self, latency: float, steps: int):
+        """Stand in for a generation: wait latency seconds, or until interrupted."""
+        with self._lock:
+            self._interrupted.clear()
+            self._current = (time.monotonic(), latency, steps)
+        try:
+            self._interrupted.wait(latency)
+        finally:
+            with self._lock:
+                self._current = None
+
+    def interrupt(self):
+        """End the generation in flight early."""
+        with self._lock:
+            self.interrupts += 1
+            self._interrupted.set()
+
+    def progress(self):
+        """Progress of the generation in flight, in the shape of ``/progress``."""
+        with self._lock:
+            current = self._current
+        if current is None:
+            return {"progress": 0.0, "eta_relative": 0.0, "current_image": None,
+                    "state": {"sampling_step": 0, "sampling_steps": 0, "job_count": 0}}
+        start, latency, steps = current
+        elapsed = time.monotonic() - start
+        fraction = min(elapsed / latency, 1.0) if latency else 1.0
+        return {
+            "progress": fraction,
+            "eta_relative": max(latency - elapsed, 0.0),
+            "current_image": self._images[0] if self._images else None,
+            "state": {"sampling_step": int(fraction * steps), "sampling_steps": steps,
+                      "job_count": 1},
+        }
+
+    @contextlib.contextmanager
+    def track_in_flight(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    """Serve the mock API until interrupted."""
+    parser = argparse.ArgumentParser(description="Mock Draw Things HTTP server")
+    parser.add_argument("--port", type=int, default=7860, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per txt2img request")
+    parser.add_argument("--image-size", type=int, help="Bytes per generated image")
+    parser.add_argument("--models", type=str, nargs="+", help="Model titles to list")
+    args = parser.parse_args(argv)
+
+    server = MockDrawThingsServer(models=args.models or ("standard",), port=args.port)
+    server.latency = args.latency
+    if args.image_size:
+        server.image_size = args.image_size
+    print(f"Mock Draw Things server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
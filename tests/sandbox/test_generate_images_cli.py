@@ -2,23 +2,28 @@
 Tests for the generate_images_cli.py script.
 """
 
+import io
+import json
 import sys
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 import pytest
 
+from draw_things import DrawThingsClient, settings
 from sandbox.scripts.generate_images_cli import (
     generate_images_for_models,
     main,
+    read_jobs,
+    run_jobs,
     DEFAULT_PROMPT,
     DEFAULT_WIDTH,
     DEFAULT_HEIGHT,
     DEFAULT_STEPS,
     DEFAULT_SEED,
+    DEFAULT_MODEL,
     DEFAULT_LORAS,
 )
-from tests.utils import SAMPLE_BASE64_IMAGE
 
 @pytest.fixture
 def mock_client():
@@ -47,12 +52,37 @@ def test_generate_images_for_models(mock_client, tmp_path):
     assert mock_client.generate_image.call_count == 3
     assert len(saved_paths) == 3
 
+def test_generate_images_for_models_sweep_and_resume(mock_client, tmp_path):
+    """Test sweeping a grid and resuming it without regenerating."""
+    sweep = dict(
+        client=mock_client,
+        prompt=DEFAULT_PROMPT,
+        width=DEFAULT_WIDTH,
+        height=DEFAULT_HEIGHT,
+        steps=DEFAULT_STEPS,
+        seed=DEFAULT_SEED,
+        loras=DEFAULT_LORAS,
+        seeds=[1, 2],
+        workers=2,
+        output_dir=str(tmp_path),
+    )
+
+    saved_paths = generate_images_for_models(**sweep)
+    assert len(saved_paths) == 6
+    assert mock_client.generate_image.call_count == 6
+    assert (tmp_path / "manifest.json").exists()
+
+    mock_client.generate_image.reset_mock()
+    generate_images_for_models(**sweep)
+    assert mock_client.generate_image.call_count == 0
+
 def test_cli_list_models(mock_client, capsys):
     """Test the --models flag."""
     with patch.object(sys, 'argv', ['script.py', '--models']):
         main()
         captured = capsys.readouterr()
         assert "Available models: ['standard', 'model1', 'model2']" in captured.out
+    mock_client.close.assert_called_once()
 
 def test_cli_generate_single_image(mock_client, capsys):
     """Test generating a single image with custom parameters."""
@@ -114,6 +144,76 @@ def test_cli_error_handling(mock_client, capsys):
         captured = capsys.readouterr()
         assert "Generated images saved to: []" in captured.out
 
+def test_read_jobs_is_lazy_and_skips_bad_lines(capsys):
+    """Test that job lines are parsed one at a time and bad ones skipped."""
+    def lines():
+        yield '{"prompt": "a", "seed": 1}\n'
+        yield '\n'
+        yield 'not json\n'
+        yield '["not", "an object"]\n'
+        raise AssertionError("read past the first job")
+
+    jobs = read_jobs(lines())
+    assert next(jobs) == {"prompt": "a", "seed": 1}
+    with pytest.raises(AssertionError):
+        next(jobs)
+    assert "Skipping line 3" in capsys.readouterr().err
+
+def test_run_jobs_writes_results(stub_server, tmp_path):
+    """Test that every job line yields a result record with timings and paths."""
+    lines = [json.dumps({"prompt": f"job {i}", "seed": i}) + "\n" for i in range(6)]
+    lines.append(json.dumps({"prompt": "bad", "unknown_arg": 1}) + "\n")
+    results = io.StringIO()
+
+    with DrawThingsClient(stub_server.url) as client:
+        totals = run_jobs(client, iter(lines), results, workers=3, output_dir=str(tmp_path))
+
+    records = [json.loads(line) for line in results.getvalue().splitlines()]
+    assert totals["succeeded"] == 6 and totals["failed"] == 1
+    assert sorted(record["index"] for record in records) == list(range(7))
+    ok = [record for record in records if record["status"] == "ok"]
+    assert all(Path(record["paths"][0]).exists() and record["seconds"] >= 0 for record in ok)
+    assert "unknown_arg" in next(r for r in records if r["status"] == "error")["error"]
+
+def test_cli_jobs_from_stdin(stub_server, tmp_path, capsys):
+    """Test --jobs - reading stdin and --results writing a file."""
+    stdin = io.StringIO('{"prompt": "a"}\n{"prompt": "b"}\n')
+    results = tmp_path / "results.jsonl"
+    argv = ['script.py', '--jobs', '-', '--results', str(results),
+            '--output-dir', str(tmp_path), '--workers', '2']
+
+    with patch.object(sys, 'argv', argv), patch.object(sys, 'stdin', stdin), \
+            patch.object(settings, 'API_URL', stub_server.url):
+        main()
+
+    assert len(results.read_text().splitlines()) == 2
+    assert "Ran 2 jobs" in capsys.readouterr().err
+
+def test_cli_jobs_manifest_resumes(stub_server, tmp_path, capsys):
+    """Test that rerunning a job file with --manifest skips finished jobs."""
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text('{"prompt": "a", "seed": 1}\n{"prompt": "b", "seed": 2}\n')
+    argv = ['script.py', '--jobs', str(jobs), '--manifest', str(tmp_path / "manifest.db"),
+            '--results', str(tmp_path / "results.jsonl"), '--output-dir', str(tmp_path / "out")]
+
+    with patch.object(sys, 'argv', argv), patch.object(settings, 'API_URL', stub_server.url):
+        main()
+        main()
+
+    assert len(stub_server.payloads) == 2
+    assert "0 succeeded, 0 failed, 2 already done" in capsys.readouterr().err
+
+def test_cli_seed_sweep(mock_client, capsys):
+    """Test the --seed-sweep flag over consecutive seeds."""
+    mock_client.seed_sweep.return_value = ["a.png", "b.png", "c.png"]
+
+    with patch.object(sys, 'argv', ['script.py', '--prompt', 'cat', '--seed', '7', '--seed-sweep', '3']):
+        main()
+
+    kwargs = mock_client.seed_sweep.call_args.kwargs
+    assert (kwargs["prompt"], list(kwargs["seeds"])) == ("cat", [7, 8, 9])
+    assert "Seed 9: c.png" in capsys.readouterr().out
+
 def test_example_commands(mock_client):
     """Test the example commands from the docstring."""
     # Test example 1: Generate a single image